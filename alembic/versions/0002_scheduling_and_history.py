@@ -0,0 +1,135 @@
+"""scheduling and history
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:36:10.214873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('organizations', sa.Column('rate_limits', sa.JSON(), nullable=True))
+    
+    op.add_column('clusters', sa.Column('total_extra_resources', sa.JSON(), nullable=True))
+    op.add_column('clusters', sa.Column('available_extra_resources', sa.JSON(), nullable=True))
+    # Existing clusters are not overcommitted; the default only backfills them
+    op.add_column('clusters', sa.Column('overcommit_ratio', sa.Float(), server_default='1.0', nullable=False))
+    op.alter_column('clusters', 'overcommit_ratio', server_default=None)
+    op.add_column('clusters', sa.Column('version', sa.BigInteger(), nullable=True))
+    op.create_index(op.f('ix_clusters_version'), 'clusters', ['version'], unique=False)
+    
+    op.add_column('deployments', sa.Column('required_extra_resources', sa.JSON(), nullable=True))
+    op.add_column('deployments', sa.Column('deadline', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('deployments', sa.Column('expected_duration_seconds', sa.Integer(), nullable=True))
+    op.add_column('deployments', sa.Column('version', sa.BigInteger(), nullable=True))
+    op.create_index(op.f('ix_deployments_version'), 'deployments', ['version'], unique=False)
+    # Parents may move to deployment_archive, so the dependency is an indexed id without a foreign key
+    op.drop_constraint('deployments_depends_on_deployment_id_fkey', 'deployments', type_='foreignkey')
+    op.create_index(op.f('ix_deployments_depends_on_deployment_id'), 'deployments', ['depends_on_deployment_id'], unique=False)
+    
+    # The enum types already exist from the initial schema
+    op.create_table('deployment_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('docker_image', sa.String(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('required_ram_gb', sa.Float(), nullable=False),
+    sa.Column('required_cpu_cores', sa.Float(), nullable=False),
+    sa.Column('required_gpu_count', sa.Integer(), nullable=False),
+    sa.Column('required_extra_resources', sa.JSON(), nullable=True),
+    sa.Column('priority', postgresql.ENUM('LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='deploymentpriority', create_type=False), nullable=True),
+    sa.Column('status', postgresql.ENUM('PENDING', 'QUEUED', 'RUNNING', 'COMPLETED', 'FAILED', 'PREEMPTED', name='deploymentstatus', create_type=False), nullable=True),
+    sa.Column('depends_on_deployment_id', sa.Integer(), nullable=True),
+    sa.Column('deadline', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('expected_duration_seconds', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('scheduled_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id', 'completed_at'),
+    postgresql_partition_by='RANGE (completed_at)'
+    )
+    op.create_index(op.f('ix_deployment_archive_cluster_id'), 'deployment_archive', ['cluster_id'], unique=False)
+    op.create_index(op.f('ix_deployment_archive_user_id'), 'deployment_archive', ['user_id'], unique=False)
+    op.create_table('scheduler_events',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('deployment_id', sa.Integer(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('event_type', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_scheduler_events_cluster_id_id', 'scheduler_events', ['cluster_id', 'id'], unique=False)
+    op.create_index(op.f('ix_scheduler_events_deployment_id'), 'scheduler_events', ['deployment_id'], unique=False)
+    op.create_table('scheduler_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('last_event_id', sa.BigInteger(), nullable=False),
+    sa.Column('state', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_scheduler_snapshots_id'), 'scheduler_snapshots', ['id'], unique=False)
+    op.create_table('utilization_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.Column('resolution', sa.String(length=4), nullable=False),
+    sa.Column('bucket_start', sa.BigInteger(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=False),
+    sa.Column('ram_avg', sa.Float(), nullable=False),
+    sa.Column('ram_max', sa.Float(), nullable=False),
+    sa.Column('cpu_avg', sa.Float(), nullable=False),
+    sa.Column('cpu_max', sa.Float(), nullable=False),
+    sa.Column('gpu_avg', sa.Float(), nullable=False),
+    sa.Column('gpu_max', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cluster_id', 'resolution', 'bucket_start', name='uq_utilization_rollup_bucket')
+    )
+    op.create_index(op.f('ix_utilization_rollups_id'), 'utilization_rollups', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_utilization_rollups_id'), table_name='utilization_rollups')
+    op.drop_table('utilization_rollups')
+    op.drop_index(op.f('ix_scheduler_snapshots_id'), table_name='scheduler_snapshots')
+    op.drop_table('scheduler_snapshots')
+    op.drop_index(op.f('ix_scheduler_events_deployment_id'), table_name='scheduler_events')
+    op.drop_index('ix_scheduler_events_cluster_id_id', table_name='scheduler_events')
+    op.drop_table('scheduler_events')
+    op.drop_index(op.f('ix_deployment_archive_user_id'), table_name='deployment_archive')
+    op.drop_index(op.f('ix_deployment_archive_cluster_id'), table_name='deployment_archive')
+    op.drop_table('deployment_archive')
+    
+    op.drop_index(op.f('ix_deployments_depends_on_deployment_id'), table_name='deployments')
+    op.create_foreign_key(
+        'deployments_depends_on_deployment_id_fkey', 'deployments', 'deployments',
+        ['depends_on_deployment_id'], ['id']
+    )
+    op.drop_index(op.f('ix_deployments_version'), table_name='deployments')
+    op.drop_column('deployments', 'version')
+    op.drop_column('deployments', 'expected_duration_seconds')
+    op.drop_column('deployments', 'deadline')
+    op.drop_column('deployments', 'required_extra_resources')
+    
+    op.drop_index(op.f('ix_clusters_version'), table_name='clusters')
+    op.drop_column('clusters', 'version')
+    op.drop_column('clusters', 'overcommit_ratio')
+    op.drop_column('clusters', 'available_extra_resources')
+    op.drop_column('clusters', 'total_extra_resources')
+    
+    op.drop_column('organizations', 'rate_limits')
@@ -0,0 +1,41 @@
+"""service credentials
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 10:40:32.987020
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('service_credentials',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key_id', sa.String(), nullable=False),
+    sa.Column('secret', sa.String(), nullable=False),
+    sa.Column('cluster_id', sa.Integer(), nullable=False),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['cluster_id'], ['clusters.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_service_credentials_cluster_id'), 'service_credentials', ['cluster_id'], unique=False)
+    op.create_index(op.f('ix_service_credentials_id'), 'service_credentials', ['id'], unique=False)
+    op.create_index(op.f('ix_service_credentials_key_id'), 'service_credentials', ['key_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_service_credentials_key_id'), table_name='service_credentials')
+    op.drop_index(op.f('ix_service_credentials_id'), table_name='service_credentials')
+    op.drop_index(op.f('ix_service_credentials_cluster_id'), table_name='service_credentials')
+    op.drop_table('service_credentials')
@@ -0,0 +1,26 @@
+"""deployment preemption count
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:42:35.454308
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('deployment_archive', sa.Column('preemption_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('deployments', sa.Column('preemption_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    op.drop_column('deployments', 'preemption_count')
+    op.drop_column('deployment_archive', 'preemption_count')
@@ -0,0 +1,26 @@
+"""deployment inherited priority
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 10:44:23.468597
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('deployment_archive', sa.Column('inherited_priority', sa.Enum('LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='deploymentpriority'), nullable=True))
+    op.add_column('deployments', sa.Column('inherited_priority', sa.Enum('LOW', 'MEDIUM', 'HIGH', 'CRITICAL', name='deploymentpriority'), nullable=True))
+
+
+def downgrade():
+    op.drop_column('deployments', 'inherited_priority')
+    op.drop_column('deployment_archive', 'inherited_priority')
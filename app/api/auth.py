@@ -1,13 +1,15 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from ..core.database import get_db
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..core.database import ReplicaSessionLocal, get_db, replica_configured
 from ..core.security import verify_password, get_password_hash, create_access_token, verify_token
 from ..core.config import settings
 from ..models.user import User
 from ..models.organization import Organization
 from ..schemas.user import UserCreate, User as UserSchema, Token
+from ..services.cache import entity_key, user_cache, invite_code_cache
+from ..services.read_routing import read_your_writes
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -22,13 +24,40 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     username = verify_token(token)
     if username is None:
         raise credentials_exception
+    # Lets commits on this session be attributed to the user for read-your-writes routing
+    db.info["username"] = username
+    
+    values = user_cache.get(username)
+    if values is not None:
+        # Re-attach the cached row without a query so lazy loads and updates still work
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
     
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
     
+    user_cache.set(
+        username,
+        {column.key: getattr(user, column.key) for column in User.__table__.columns},
+        tags=[entity_key(user)]
+    )
     return user
 
+def get_read_db(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Session for read-only routes: the replica, unless the caller wrote recently"""
+    username = verify_token(token)
+    if not replica_configured() or username is None or read_your_writes.recent(username):
+        yield db
+        return
+    
+    replica = ReplicaSessionLocal(info={"replica": True})
+    try:
+        yield replica
+    finally:
+        replica.close()
+
 @router.post("/register", response_model=UserSchema)
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Check if user already exists
@@ -41,12 +70,15 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Handle organization invite
     organization_id = None
     if user_data.invite_code:
-        organization = db.query(Organization).filter(
-            Organization.invite_code == user_data.invite_code
-        ).first()
-        if not organization:
-            raise HTTPException(status_code=400, detail="Invalid invite code")
-        organization_id = organization.id
+        organization_id = invite_code_cache.get(user_data.invite_code)
+        if organization_id is None:
+            organization = db.query(Organization).filter(
+                Organization.invite_code == user_data.invite_code
+            ).first()
+            if not organization:
+                raise HTTPException(status_code=400, detail="Invalid invite code")
+            organization_id = organization.id
+            invite_code_cache.set(user_data.invite_code, organization_id, tags=[entity_key(organization)])
     
     # Create user
     hashed_password = get_password_hash(user_data.password)
@@ -1,11 +1,28 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..core.database import get_db
 from ..models.user import User
 from ..models.cluster import Cluster
-from ..schemas.cluster import ClusterCreate, Cluster as ClusterSchema, ClusterResources
-from .auth import get_current_user
+from ..models.credential import ServiceCredential
+from ..schemas.cluster import (
+    ClusterCreate, ClusterResize, ClusterResizeResult, Cluster as ClusterSchema, ClusterResources, ImageLocalityStats,
+    QueueReconciliationStats, PreemptionStats, UtilizationHistory, ServiceCredential as ServiceCredentialSchema,
+    IssuedServiceCredential
+)
+from ..services.scheduler import DeploymentScheduler
+from ..services.fast_reads import clusters_query
+from ..services.reconciler import QueueReconciler
+from ..services.service_auth import issue_credential, revoke_credential
+from ..services.versions import version_clock, clusters_scope, cluster_scope
+from ..services.resources import validate_extra_resources, required_vector
+from ..services.timeseries import RESOLUTIONS, utilization_history
+from ..services.simulation import SimulatedDeployment, ClusterSnapshot, CapacitySimulator
+from ..schemas.simulation import SimulationRequest, SimulationResult
+from .auth import get_current_user, get_read_db
+from .responses import list_response, make_etag, not_modified, vouched_etag
 
 router = APIRouter()
 
@@ -16,6 +33,14 @@ def check_admin_access(current_user: User):
             detail="Not enough permissions"
         )
 
+# Stricter than check_admin_access: service credentials act for the whole cluster, so developers may not mint them
+def require_admin(current_user: User):
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
 @router.post("/", response_model=ClusterSchema)
 async def create_cluster(
     cluster_data: ClusterCreate,
@@ -27,6 +52,11 @@ async def create_cluster(
     if not current_user.organization_id:
         raise HTTPException(status_code=400, detail="User must belong to an organization")
     
+    try:
+        validate_extra_resources(cluster_data.total_extra_resources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     cluster = Cluster(
         **cluster_data.dict(),
         organization_id=current_user.organization_id
@@ -40,23 +70,52 @@ async def create_cluster(
 
 @router.get("/", response_model=List[ClusterSchema])
 async def list_clusters(
+    format: str = "json",
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if not current_user.organization_id:
         raise HTTPException(status_code=400, detail="User must belong to an organization")
     
-    clusters = db.query(Cluster).filter(
-        Cluster.organization_id == current_user.organization_id
-    ).all()
-    
-    return clusters
+    version = version_clock.current(clusters_scope(current_user.organization_id))
+    etag = make_etag(version, format, since or 0)
+    return not_modified(if_none_match, version, etag) or list_response(
+        db, clusters_query(current_user.organization_id, since), format, vouched_etag(db, version, etag)
+    )
+
+@router.get("/image-locality/stats", response_model=ImageLocalityStats)
+async def get_image_locality_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Counters span every organization
+    check_admin_access(current_user)
+    scheduler = DeploymentScheduler(db)
+    return scheduler.image_locality.stats()
+
+@router.get("/queues/reconciliation", response_model=QueueReconciliationStats)
+async def get_queue_reconciliation_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_admin_access(current_user)
+    return QueueReconciler(DeploymentScheduler(db)).stats()
+
+@router.get("/preemption/stats", response_model=PreemptionStats)
+async def get_preemption_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    check_admin_access(current_user)
+    return DeploymentScheduler(db).preemption_metrics.stats()
 
 @router.get("/{cluster_id}", response_model=ClusterSchema)
 async def get_cluster(
     cluster_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     cluster = db.query(Cluster).filter(
         Cluster.id == cluster_id,
@@ -71,9 +130,20 @@ async def get_cluster(
 @router.get("/{cluster_id}/resources", response_model=ClusterResources)
 async def get_cluster_resources(
     cluster_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    # Scoped by organization, so other organizations never match a version
+    version = version_clock.current(cluster_scope(current_user.organization_id, cluster_id))
+    etag = make_etag(version)
+    cached = not_modified(if_none_match, version, etag)
+    if cached:
+        return cached
+    if vouched_etag(db, version, etag):
+        response.headers["ETag"] = etag
+    
     cluster = db.query(Cluster).filter(
         Cluster.id == cluster_id,
         Cluster.organization_id == current_user.organization_id
@@ -93,9 +163,159 @@ async def get_cluster_resources(
         available_ram_gb=cluster.available_ram_gb,
         available_cpu_cores=cluster.available_cpu_cores,
         available_gpu_count=cluster.available_gpu_count,
+        total_extra_resources=cluster.total_extra_resources or {},
+        available_extra_resources=cluster.available_extra_resources or {},
         utilization_percentage=utilization
     )
 
+@router.patch("/{cluster_id}/capacity", response_model=ClusterResizeResult)
+async def resize_cluster(
+    cluster_id: int,
+    resize: ClusterResize,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Machines added or removed: growth drains the queue, shrink preempts the cheapest running work
+    check_admin_access(current_user)
+    
+    cluster = db.query(Cluster).filter(
+        Cluster.id == cluster_id,
+        Cluster.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    try:
+        validate_extra_resources(resize.total_extra_resources)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    victims = DeploymentScheduler(db).resize_cluster(
+        cluster.id, resize.total_ram_gb, resize.total_cpu_cores, resize.total_gpu_count, resize.total_extra_resources
+    )
+    db.refresh(cluster)
+    return {"cluster": cluster, "preempted_deployment_ids": [d.id for d in victims]}
+
+@router.post("/{cluster_id}/simulate", response_model=SimulationResult)
+async def simulate_cluster(
+    cluster_id: int,
+    request: SimulationRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    cluster = db.query(Cluster).filter(
+        Cluster.id == cluster_id,
+        Cluster.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    if len(request.jobs) > settings.SIMULATION_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SIMULATION_MAX_JOBS} jobs can be simulated")
+    
+    now = datetime.now(timezone.utc)
+    jobs = []
+    for index, job in enumerate(request.jobs):
+        try:
+            validate_extra_resources(job.required_extra_resources)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        jobs.append(SimulatedDeployment(
+            id=-(index + 1),
+            name=job.name,
+            resource_vector=required_vector(job),
+            priority=job.priority,
+            created_at=now,
+            expected_duration_seconds=job.expected_duration_seconds,
+            deadline=job.deadline,
+            job_index=index
+        ))
+    
+    simulator = CapacitySimulator(DeploymentScheduler(db), ClusterSnapshot.load(db, cluster))
+    return simulator.run(jobs)
+
+@router.get("/{cluster_id}/utilization", response_model=UtilizationHistory)
+async def get_cluster_utilization(
+    cluster_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    cluster = db.query(Cluster).filter(
+        Cluster.id == cluster_id,
+        Cluster.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    
+    if resolution is not None and resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Resolution must be one of {', '.join(RESOLUTIONS)}")
+    
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    return utilization_history(db, cluster_id, start.timestamp(), end.timestamp(), resolution)
+
+def get_admin_cluster(db: Session, cluster_id: int, current_user: User) -> Cluster:
+    require_admin(current_user)
+    
+    cluster = db.query(Cluster).filter(
+        Cluster.id == cluster_id,
+        Cluster.organization_id == current_user.organization_id
+    ).first()
+    
+    if not cluster:
+        raise HTTPException(status_code=404, detail="Cluster not found")
+    return cluster
+
+@router.post("/{cluster_id}/credentials", response_model=IssuedServiceCredential)
+async def create_service_credential(
+    cluster_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Executors sign heartbeat and status callbacks with this; rotate by issuing a new one, then revoking the old
+    cluster = get_admin_cluster(db, cluster_id, current_user)
+    return issue_credential(db, cluster.id, current_user.id)
+
+@router.get("/{cluster_id}/credentials", response_model=List[ServiceCredentialSchema])
+async def list_service_credentials(
+    cluster_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    cluster = get_admin_cluster(db, cluster_id, current_user)
+    return db.query(ServiceCredential).filter(
+        ServiceCredential.cluster_id == cluster.id
+    ).order_by(ServiceCredential.id).all()
+
+@router.delete("/{cluster_id}/credentials/{key_id}")
+async def revoke_service_credential(
+    cluster_id: int,
+    key_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    cluster = get_admin_cluster(db, cluster_id, current_user)
+    credential = db.query(ServiceCredential).filter(
+        ServiceCredential.cluster_id == cluster.id,
+        ServiceCredential.key_id == key_id,
+        ServiceCredential.revoked_at.is_(None)
+    ).first()
+    
+    if not credential:
+        raise HTTPException(status_code=404, detail="Credential not found")
+    
+    revoke_credential(db, credential)
+    return {"message": "Credential revoked successfully"}
+
 @router.delete("/{cluster_id}")
 async def delete_cluster(
     cluster_id: int,
@@ -1,16 +1,40 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
+import math
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from ..core.config import settings
 from ..core.database import get_db
 from ..models.user import User
+from ..models.cluster import Cluster
 from ..models.deployment import Deployment, DeploymentStatus
-from ..schemas.deployment import DeploymentCreate, Deployment as DeploymentSchema, DeploymentUpdate
+from ..schemas.deployment import (
+    DeploymentCreate, Deployment as DeploymentSchema, DeploymentUpdate, DeploymentLease, DeploymentEvent,
+    DeploymentExplanation, QueuePosition, UsageSample, UsageSummary, RightSizingRecommendation
+)
 from ..services.deployment_service import DeploymentService
-from .auth import get_current_user
+from ..services.export import EXPORT_FORMATS, stream_export
+from ..services.fast_reads import deployments_query
+from ..services.rate_limit import submission_limiter
+from ..services.versions import (
+    version_clock, user_deployments_scope, cluster_deployments_scope, organization_deployments_scope
+)
+from .auth import get_current_user, get_read_db
+from .responses import list_response, make_etag, not_modified, vouched_etag
 
 router = APIRouter()
 
-@router.post("/", response_model=DeploymentSchema)
+async def enforce_rate_limit(current_user: User = Depends(get_current_user)):
+    allowed, wait = submission_limiter.acquire(current_user)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Deployment request rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))}
+        )
+
+@router.post("/", response_model=DeploymentSchema, dependencies=[Depends(enforce_rate_limit)])
 async def create_deployment(
     deployment_data: DeploymentCreate,
     current_user: User = Depends(get_current_user),
@@ -22,36 +46,107 @@ async def create_deployment(
     service = DeploymentService(db)
     
     try:
-        deployment = service.create_deployment(deployment_data, current_user.id)
+        deployment = service.create_deployment(
+            deployment_data, current_user.id, current_user.organization_id
+        )
         return deployment
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=List[DeploymentSchema])
 async def list_deployments(
+    include_archived: bool = False,
+    format: str = "json",
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    service = DeploymentService(db)
-    
     if current_user.role == "admin":
         # Admin can see all deployments in organization
-        deployments = db.query(Deployment).join(Deployment.cluster).filter(
-            Deployment.cluster.has(organization_id=current_user.organization_id)
-        ).all()
+        scope = organization_deployments_scope(current_user.organization_id)
+        statement = deployments_query(
+            organization_id=current_user.organization_id, include_archived=include_archived, since=since
+        )
     else:
         # Regular users see only their deployments
-        deployments = service.get_deployments_by_user(current_user.id)
+        scope = user_deployments_scope(current_user.id)
+        statement = deployments_query(user_id=current_user.id, include_archived=include_archived, since=since)
+    
+    # Read the version before the rows so a concurrent change can only make the ETag stale, never wrong
+    version = version_clock.current(scope)
+    etag = make_etag(version, format, int(include_archived), since or 0)
+    return not_modified(if_none_match, version, etag) or list_response(
+        db, statement, format, vouched_etag(db, version, etag)
+    )
+
+@router.get("/recommendations", response_model=RightSizingRecommendation)
+async def get_rightsizing_recommendation(
+    docker_image: str,
+    user_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # Only admins may look at other users' usage
+    if user_id is None:
+        user_id = current_user.id
+    elif user_id != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    service = DeploymentService(db)
+    return service.get_rightsizing_recommendation(docker_image, user_id)
+
+@router.get("/events", response_model=List[DeploymentEvent])
+async def list_deployment_events(
+    after: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    # Incremental change feed: pass the last seen event id as `after`
+    limit = max(1, min(limit, settings.JOURNAL_FEED_LIMIT))
+    service = DeploymentService(db)
+    if current_user.role == "admin":
+        org_clusters = db.query(Cluster.id).filter(
+            Cluster.organization_id == current_user.organization_id
+        ).all()
+        return service.scheduler.journal.events_since(
+            after, limit, cluster_ids=[row.id for row in org_clusters]
+        )
+    return service.scheduler.journal.events_since(after, limit, user_id=current_user.id)
+
+@router.get("/export")
+async def export_deployments(
+    format: str = "parquet",
+    after_id: int = 0,
+    created_after: Optional[datetime] = None,
+    completed_after: Optional[datetime] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    # Incremental exports pass the highest id already exported as `after_id`. That id watermark never
+    # re-exports a row that completes later; to collect completions, pass the last exported `completed_at`
+    # as `completed_after` with its row's id as `after_id`, and rows come in completion order instead
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
     
-    return deployments
+    extension = "parquet" if format == "parquet" else "arrows"
+    return StreamingResponse(
+        stream_export(db, current_user.organization_id, format, after_id, created_after, completed_after),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="deployments-after-{after_id}.{extension}"'}
+    )
 
 @router.get("/{deployment_id}", response_model=DeploymentSchema)
 async def get_deployment(
     deployment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+    service = DeploymentService(db)
+    deployment = service.get_deployment(deployment_id)
     
     if not deployment:
         raise HTTPException(status_code=404, detail="Deployment not found")
@@ -62,7 +157,48 @@ async def get_deployment(
     
     return deployment
 
-@router.patch("/{deployment_id}", response_model=DeploymentSchema)
+@router.get("/{deployment_id}/explain", response_model=DeploymentExplanation)
+async def explain_deployment(
+    deployment_id: int,
+    limit: int = 5,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    # Why a deployment is (or is not) running: its most recent scheduling decisions, newest first
+    service = DeploymentService(db)
+    deployment = service.get_deployment(deployment_id)
+    
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    if current_user.role != "admin" and deployment.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    limit = max(1, min(limit, settings.DECISION_TRACE_KEEP))
+    return {
+        "deployment_id": deployment.id,
+        "status": deployment.status,
+        "decisions": service.scheduler.traces.recent(deployment.id, limit)
+    }
+
+@router.get("/{deployment_id}/queue-position", response_model=QueuePosition)
+async def get_queue_position(
+    deployment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    service = DeploymentService(db)
+    deployment = service.get_deployment(deployment_id)
+    
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    if current_user.role != "admin" and deployment.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    return service.queue_position(deployment)
+
+@router.patch("/{deployment_id}", response_model=DeploymentSchema, dependencies=[Depends(enforce_rate_limit)])
 async def update_deployment(
     deployment_id: int,
     deployment_update: DeploymentUpdate,
@@ -79,15 +215,66 @@ async def update_deployment(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     # Update fields
-    for field, value in deployment_update.dict(exclude_unset=True).items():
+    changes = deployment_update.dict(exclude_unset=True)
+    for field, value in changes.items():
         setattr(deployment, field, value)
     
     db.commit()
     db.refresh(deployment)
     
+    if "priority" in changes:
+        DeploymentService(db).refresh_priority(deployment)
+    
     return deployment
 
-@router.post("/{deployment_id}/cancel")
+@router.post("/{deployment_id}/heartbeat", response_model=DeploymentLease)
+async def heartbeat_deployment(
+    deployment_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+    
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    if current_user.role != "admin" and deployment.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    service = DeploymentService(db)
+    expires_at = service.heartbeat(deployment_id)
+    if expires_at is None:
+        raise HTTPException(status_code=409, detail="Deployment has no active lease")
+    
+    return DeploymentLease(
+        deployment_id=deployment_id,
+        expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+    )
+
+@router.post("/{deployment_id}/usage", response_model=UsageSummary)
+async def report_deployment_usage(
+    deployment_id: int,
+    sample: UsageSample,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+    
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    
+    if current_user.role != "admin" and deployment.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    service = DeploymentService(db)
+    try:
+        p95_ram, p95_cpu = service.record_usage(deployment, sample.ram_gb, sample.cpu_cores)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return UsageSummary(deployment_id=deployment_id, p95_ram_gb=p95_ram, p95_cpu_cores=p95_cpu)
+
+@router.post("/{deployment_id}/cancel", dependencies=[Depends(enforce_rate_limit)])
 async def cancel_deployment(
     deployment_id: int,
     current_user: User = Depends(get_current_user),
@@ -103,14 +290,21 @@ async def cancel_deployment(
 @router.get("/cluster/{cluster_id}", response_model=List[DeploymentSchema])
 async def list_cluster_deployments(
     cluster_id: int,
+    include_archived: bool = False,
+    format: str = "json",
+    since: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    service = DeploymentService(db)
-    deployments = service.get_deployments_by_cluster(cluster_id)
-    
     # Filter based on user permissions
-    if current_user.role != "admin":
-        deployments = [d for d in deployments if d.user_id == current_user.id]
+    user_id = None if current_user.role == "admin" else current_user.id
+    statement = deployments_query(
+        user_id=user_id, cluster_id=cluster_id, include_archived=include_archived, since=since
+    )
     
-    return deployments 
\ No newline at end of file
+    version = version_clock.current(cluster_deployments_scope(cluster_id))
+    etag = make_etag(version, format, int(include_archived), since or 0, user_id or 0)
+    return not_modified(if_none_match, version, etag) or list_response(
+        db, statement, format, vouched_etag(db, version, etag)
+    )
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from ..core.database import get_db
+from ..core.redis_client import get_redis_client
+from ..models.deployment import Deployment, DeploymentStatus
+from ..schemas.deployment import Deployment as DeploymentSchema, DeploymentLease, DeploymentStatusReport
+from ..services.deployment_service import DeploymentService
+from ..services.leases import LeaseManager
+from ..services.service_auth import verify_request
+
+router = APIRouter()
+
+REPORTABLE_STATUSES = (DeploymentStatus.COMPLETED, DeploymentStatus.FAILED)
+
+async def get_executor_cluster(
+    request: Request,
+    x_service_key: str = Header(...),
+    x_service_timestamp: str = Header(...),
+    x_service_signature: str = Header(...),
+    db: Session = Depends(get_db)
+) -> int:
+    """Authenticate an HMAC-signed executor request and return the cluster its key is scoped to"""
+    # The session only opens a connection on a key-table miss
+    try:
+        return verify_request(
+            db, get_redis_client(), x_service_key, x_service_timestamp, x_service_signature,
+            request.method, request.url.path, await request.body()
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+
+def get_cluster_deployment(db: Session, deployment_id: int, cluster_id: int) -> Deployment:
+    deployment = db.query(Deployment).filter(Deployment.id == deployment_id).first()
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    if deployment.cluster_id != cluster_id:
+        raise HTTPException(status_code=403, detail="Deployment does not run on this cluster")
+    return deployment
+
+@router.post("/deployments/{deployment_id}/heartbeat", response_model=DeploymentLease)
+async def executor_heartbeat(
+    deployment_id: int,
+    cluster_id: int = Depends(get_executor_cluster),
+    db: Session = Depends(get_db)
+):
+    leases = LeaseManager(get_redis_client())
+    try:
+        expires_at = leases.renew_in_cluster(deployment_id, cluster_id)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except LookupError:
+        get_cluster_deployment(db, deployment_id, cluster_id)
+        expires_at = leases.renew(deployment_id)
+    
+    if expires_at is None:
+        raise HTTPException(status_code=409, detail="Deployment has no active lease")
+    
+    return DeploymentLease(
+        deployment_id=deployment_id,
+        expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+    )
+
+@router.post("/deployments/{deployment_id}/status", response_model=DeploymentSchema)
+async def executor_report_status(
+    deployment_id: int,
+    report: DeploymentStatusReport,
+    cluster_id: int = Depends(get_executor_cluster),
+    db: Session = Depends(get_db)
+):
+    if report.status not in REPORTABLE_STATUSES:
+        raise HTTPException(status_code=400, detail="Executors can only report completed or failed deployments")
+    
+    get_cluster_deployment(db, deployment_id, cluster_id)
+    return DeploymentService(db).update_deployment_status(deployment_id, report.status)
@@ -4,8 +4,11 @@ from sqlalchemy.orm import Session
 from ..core.database import get_db
 from ..models.user import User
 from ..models.organization import Organization
-from ..schemas.organization import OrganizationCreate, Organization as OrganizationSchema
-from .auth import get_current_user
+from ..schemas.organization import (
+    OrganizationCreate, Organization as OrganizationSchema, OrganizationCapacity, RateLimits
+)
+from ..services.capacity import CapacityDashboard
+from .auth import get_current_user, get_read_db
 
 router = APIRouter()
 
@@ -42,7 +45,7 @@ async def create_organization(
 @router.get("/my", response_model=OrganizationSchema)
 async def get_my_organization(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     if not current_user.organization_id:
         raise HTTPException(status_code=404, detail="User is not part of any organization")
@@ -56,6 +59,17 @@ async def get_my_organization(
     
     return organization
 
+@router.get("/my/capacity", response_model=OrganizationCapacity)
+async def get_my_organization_capacity(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    if not current_user.organization_id:
+        raise HTTPException(status_code=404, detail="User is not part of any organization")
+    
+    dashboard = CapacityDashboard(db)
+    return dashboard.get_capacity(current_user.organization_id)
+
 @router.get("/{org_id}/invite-code")
 async def get_invite_code(
     org_id: int,
@@ -73,6 +87,43 @@ async def get_invite_code(
     
     return {"invite_code": organization.invite_code}
 
+@router.get("/{org_id}/rate-limits", response_model=RateLimits)
+async def get_rate_limits(
+    org_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.organization_id != org_id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    organization = db.query(Organization).filter(Organization.id == org_id).first()
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    
+    return organization.rate_limits or {}
+
+@router.put("/{org_id}/rate-limits", response_model=RateLimits)
+async def update_rate_limits(
+    org_id: int,
+    rate_limits: RateLimits,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.organization_id != org_id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    
+    check_admin_access(current_user)
+    
+    organization = db.query(Organization).filter(Organization.id == org_id).first()
+    if not organization:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    
+    # JSON object keys are strings, so per-user overrides are stored keyed by str(user_id)
+    organization.rate_limits = rate_limits.model_dump(mode="json", exclude_none=True)
+    db.commit()
+    
+    return organization.rate_limits
+
 @router.post("/{org_id}/regenerate-invite-code")
 async def regenerate_invite_code(
     org_id: int,
@@ -0,0 +1,40 @@
+from typing import Optional
+import time
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..services.fast_reads import fetch_rows, render_json, stream_ndjson
+
+LIST_FORMATS = ("json", "ndjson")
+
+def list_response(db: Session, statement, format: str = "json", etag: Optional[str] = None) -> Response:
+    """Render a Core SELECT as a JSON array, or stream it as NDJSON for large exports"""
+    if format not in LIST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(LIST_FORMATS)}")
+    
+    headers = {"ETag": etag} if etag else None
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(db, statement), media_type="application/x-ndjson", headers=headers)
+    return Response(content=render_json(fetch_rows(db, statement)), media_type="application/json", headers=headers)
+
+def make_etag(version: int, *variant) -> str:
+    """Strong ETag for one representation of a read scope at a version"""
+    return '"' + "-".join(str(part) for part in (version,) + variant) + '"'
+
+def not_modified(if_none_match: Optional[str], version: int, etag: str) -> Optional[Response]:
+    """A 304 response when the client already holds this version"""
+    # Version 0 means the scope was never touched, so there is nothing to vouch for
+    if not version or not if_none_match:
+        return None
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def vouched_etag(db: Session, version: int, etag: str) -> Optional[str]:
+    """The ETag to send with rows read through this session, or None while a replica may lag the version"""
+    # Versions are millisecond timestamps, so their age bounds how far behind the replica can be
+    if db.info.get("replica") and time.time() * 1000 - version < settings.REPLICA_LAG_SECONDS * 1000:
+        return None
+    return etag
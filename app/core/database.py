@@ -1,10 +1,66 @@
+from typing import Callable, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import orjson
 from .config import settings
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_engine: Optional[Engine] = None
+_replica_engine: Optional[Engine] = None
+
+def engine_options(url: str) -> dict:
+    # orjson decodes JSON columns several times faster than the stdlib
+    options = {"json_deserializer": orjson.loads, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
+        )
+    return options
+
+def get_engine() -> Engine:
+    """Build the engine on first use, so importing the app never touches the database"""
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+    return _engine
+
+def replica_configured() -> bool:
+    return bool(settings.DATABASE_REPLICA_URL)
+
+def get_replica_engine() -> Engine:
+    """Engine for the read replica, or the primary when no replica is configured"""
+    global _replica_engine
+    if not replica_configured():
+        return get_engine()
+    if _replica_engine is None:
+        _replica_engine = create_engine(settings.DATABASE_REPLICA_URL, **engine_options(settings.DATABASE_REPLICA_URL))
+    return _replica_engine
+
+def dispose_engine():
+    global _engine, _replica_engine
+    for engine in (_engine, _replica_engine):
+        if engine is not None:
+            engine.dispose()
+    _engine = None
+    _replica_engine = None
+
+class LazySessionmaker(sessionmaker):
+    """Sessionmaker that resolves its engine when a session is opened, not when it is defined"""
+    
+    def __init__(self, get_bind: Callable[[], Engine], **kw):
+        super().__init__(**kw)
+        self.get_bind = get_bind
+    
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", self.get_bind())
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionmaker(get_engine, autocommit=False, autoflush=False)
+ReplicaSessionLocal = LazySessionmaker(get_replica_engine, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
@@ -13,4 +69,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,18 @@
+from typing import Optional
+import redis
+from .config import settings
+
+_client: Optional[redis.Redis] = None
+
+def get_redis_client() -> redis.Redis:
+    """Process-wide Redis client; its connection pool is shared by every request"""
+    global _client
+    if _client is None:
+        _client = redis.from_url(settings.REDIS_URL)
+    return _client
+
+def close_redis_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -1,36 +1,97 @@
+from contextlib import asynccontextmanager
+import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from redis import RedisError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 from .core.config import settings
-from .core.database import engine, Base
-from .api import auth, organizations, clusters, deployments
+from .core.database import SessionLocal, get_engine, dispose_engine
+from .core.redis_client import get_redis_client, close_redis_client
+from .api import auth, organizations, clusters, deployments, executors
+from .services.cache import invalidation_bus
+from .services.timeseries import utilization_recorder
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(
-    title=settings.PROJECT_NAME,
-    debug=settings.DEBUG
-)
+# The schema is managed by Alembic (`alembic upgrade head`), never at import or startup
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Building pools does not connect, so a briefly unavailable DB or Redis does not block startup
+    get_engine()
+    get_redis_client()
+    invalidation_bus.start()
+    yield
+    invalidation_bus.stop()
+    
+    # Keep this worker's unflushed utilization samples
+    db = SessionLocal()
+    try:
+        utilization_recorder.flush(db)
+    except SQLAlchemyError:
+        logger.warning("Could not flush utilization samples on shutdown", exc_info=True)
+    finally:
+        db.close()
+    
+    dispose_engine()
+    close_redis_client()
 
-# Include routers
-app.include_router(auth.router, prefix="/auth", tags=["authentication"])
-app.include_router(organizations.router, prefix="/organizations", tags=["organizations"])
-app.include_router(clusters.router, prefix="/clusters", tags=["clusters"])
-app.include_router(deployments.router, prefix="/deployments", tags=["deployments"])
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title=settings.PROJECT_NAME,
+        debug=settings.DEBUG,
+        lifespan=lifespan
+    )
+    
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Include routers
+    app.include_router(auth.router, prefix="/auth", tags=["authentication"])
+    app.include_router(organizations.router, prefix="/organizations", tags=["organizations"])
+    app.include_router(clusters.router, prefix="/clusters", tags=["clusters"])
+    app.include_router(deployments.router, prefix="/deployments", tags=["deployments"])
+    app.include_router(executors.router, prefix="/executor", tags=["executors"])
+    
+    @app.get("/")
+    async def root():
+        return {"message": "MLOps Platform API", "version": "1.0.0"}
+    
+    @app.get("/health")
+    async def health_check():
+        # Liveness only: the process is up and serving
+        return {"status": "healthy"}
+    
+    @app.get("/ready")
+    def readiness_check():
+        checks = {}
+        try:
+            with get_engine().connect() as connection:
+                connection.execute(text("SELECT 1"))
+            checks["database"] = "ok"
+        except SQLAlchemyError:
+            checks["database"] = "unavailable"
+        
+        try:
+            get_redis_client().ping()
+            checks["redis"] = "ok"
+        except RedisError:
+            checks["redis"] = "unavailable"
+        
+        ready = all(result == "ok" for result in checks.values())
+        return JSONResponse(
+            status_code=200 if ready else 503,
+            content={"status": "ready" if ready else "unavailable", "checks": checks}
+        )
+    
+    return app
 
-@app.get("/")
-async def root():
-    return {"message": "MLOps Platform API", "version": "1.0.0"}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+app = create_app()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, DateTime, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -20,8 +20,17 @@ class Cluster(Base):
     available_cpu_cores = Column(Float, nullable=False)
     available_gpu_count = Column(Integer, nullable=False, default=0)
     
+    # Configured extra resource kinds (see settings.EXTRA_RESOURCE_KINDS), e.g. {"disk_gb": 500}
+    total_extra_resources = Column(JSON, nullable=True, default=dict)
+    available_extra_resources = Column(JSON, nullable=True, default=dict)
+    
+    # Admit up to this multiple of total RAM/CPU when observed usage allows it
+    overcommit_ratio = Column(Float, nullable=False, default=1.0)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Version-clock stamp of the last change, for `since` delta reads
+    version = Column(BigInteger, nullable=True, index=True)
     
     organization = relationship("Organization", back_populates="clusters")
     deployments = relationship("Deployment", back_populates="cluster")
@@ -34,4 +43,7 @@ class Cluster(Base):
         if hasattr(self, 'total_cpu_cores'):
             self.available_cpu_cores = self.total_cpu_cores
         if hasattr(self, 'total_gpu_count'):
-            self.available_gpu_count = self.total_gpu_count 
\ No newline at end of file
+            self.available_gpu_count = self.total_gpu_count
+        if self.total_extra_resources is None:
+            self.total_extra_resources = {}
+        self.available_extra_resources = dict(self.total_extra_resources) 
\ No newline at end of file
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class ServiceCredential(Base):
+    __tablename__ = "service_credentials"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key_id = Column(String, unique=True, index=True, nullable=False)
+    # Kept as issued: verifying an HMAC needs the shared secret itself
+    secret = Column(String, nullable=False)
+    cluster_id = Column(Integer, ForeignKey("clusters.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, DateTime, Enum, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -12,6 +12,9 @@ class DeploymentStatus(enum.Enum):
     FAILED = "failed"
     PREEMPTED = "preempted"
 
+# Statuses of deployments that wait in a cluster queue; preempted ones wait to resume
+WAITING_STATUSES = (DeploymentStatus.QUEUED, DeploymentStatus.PREEMPTED)
+
 class DeploymentPriority(enum.Enum):
     LOW = 1
     MEDIUM = 2
@@ -31,20 +34,68 @@ class Deployment(Base):
     required_ram_gb = Column(Float, nullable=False)
     required_cpu_cores = Column(Float, nullable=False)
     required_gpu_count = Column(Integer, nullable=False, default=0)
+    required_extra_resources = Column(JSON, nullable=True, default=dict)
     
     # Priority and status
     priority = Column(Enum(DeploymentPriority), default=DeploymentPriority.MEDIUM)
     status = Column(Enum(DeploymentStatus), default=DeploymentStatus.PENDING)
+    # Highest priority of unfinished dependents, when above our own (priority inheritance)
+    inherited_priority = Column(Enum(DeploymentPriority), nullable=True)
+    
+    # Dependency management (no foreign key: parents may be moved to deployment_archive)
+    depends_on_deployment_id = Column(Integer, nullable=True, index=True)
     
-    # Dependency management
-    depends_on_deployment_id = Column(Integer, ForeignKey("deployments.id"), nullable=True)
+    # Deadline scheduling (earliest-deadline-first tier)
+    deadline = Column(DateTime(timezone=True), nullable=True)
+    expected_duration_seconds = Column(Integer, nullable=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     scheduled_at = Column(DateTime(timezone=True), nullable=True)
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    # Version-clock stamp of the last change, for `since` delta reads
+    version = Column(BigInteger, nullable=True, index=True)
+    # Times this deployment was evicted by preemption
+    preemption_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     cluster = relationship("Cluster", back_populates="deployments")
     user = relationship("User", back_populates="deployments")
-    depends_on = relationship("Deployment", remote_side=[id]) 
\ No newline at end of file
+    depends_on = relationship(
+        "Deployment",
+        remote_side=[id],
+        primaryjoin="foreign(Deployment.depends_on_deployment_id) == Deployment.id"
+    )
+
+class DeploymentArchive(Base):
+    """Terminal deployments moved out of the hot table, range-partitioned by completion time"""
+    __tablename__ = "deployment_archive"
+    __table_args__ = {"postgresql_partition_by": "RANGE (completed_at)"}
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    docker_image = Column(String, nullable=False)
+    cluster_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    
+    required_ram_gb = Column(Float, nullable=False)
+    required_cpu_cores = Column(Float, nullable=False)
+    required_gpu_count = Column(Integer, nullable=False, default=0)
+    required_extra_resources = Column(JSON, nullable=True)
+    
+    priority = Column(Enum(DeploymentPriority))
+    status = Column(Enum(DeploymentStatus))
+    inherited_priority = Column(Enum(DeploymentPriority), nullable=True)
+    
+    depends_on_deployment_id = Column(Integer, nullable=True)
+    deadline = Column(DateTime(timezone=True), nullable=True)
+    expected_duration_seconds = Column(Integer, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True))
+    scheduled_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    # Partition key, so it is part of the primary key and never null
+    completed_at = Column(DateTime(timezone=True), primary_key=True)
+    version = Column(BigInteger, nullable=True)
+    preemption_count = Column(Integer, nullable=False, default=0, server_default="0")
+    archived_at = Column(DateTime(timezone=True), server_default=func.now()) 
\ No newline at end of file
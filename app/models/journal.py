@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, Index
+from sqlalchemy.sql import func
+from ..core.database import Base
+
+class SchedulerEvent(Base):
+    __tablename__ = "scheduler_events"
+    __table_args__ = (
+        Index("ix_scheduler_events_cluster_id_id", "cluster_id", "id"),
+    )
+    
+    # Monotonic sequence; SQLite only autoincrements plain INTEGER keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    deployment_id = Column(Integer, nullable=False, index=True)
+    cluster_id = Column(Integer, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    event_type = Column(String(20), nullable=False)  # created, queued, scheduled, preempted, completed, failed
+    payload = Column(JSON, nullable=False, default=dict)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SchedulerSnapshot(Base):
+    __tablename__ = "scheduler_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    last_event_id = Column(BigInteger, nullable=False)  # journal position the state includes
+    state = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Float, ForeignKey, UniqueConstraint
+from ..core.database import Base
+
+class UtilizationRollup(Base):
+    __tablename__ = "utilization_rollups"
+    __table_args__ = (
+        UniqueConstraint("cluster_id", "resolution", "bucket_start", name="uq_utilization_rollup_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cluster_id = Column(Integer, ForeignKey("clusters.id"), nullable=False)
+    resolution = Column(String(4), nullable=False)  # 1m, 1h, 1d
+    bucket_start = Column(BigInteger, nullable=False)  # epoch seconds
+    sample_count = Column(Integer, nullable=False, default=0)
+    
+    # Utilization percentages
+    ram_avg = Column(Float, nullable=False, default=0)
+    ram_max = Column(Float, nullable=False, default=0)
+    cpu_avg = Column(Float, nullable=False, default=0)
+    cpu_max = Column(Float, nullable=False, default=0)
+    gpu_avg = Column(Float, nullable=False, default=0)
+    gpu_max = Column(Float, nullable=False, default=0)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Annotated, Dict, List, Optional
 from datetime import datetime
 
 class ClusterBase(BaseModel):
@@ -7,6 +7,8 @@ class ClusterBase(BaseModel):
     total_ram_gb: float
     total_cpu_cores: float
     total_gpu_count: int = 0
+    total_extra_resources: Dict[str, float] = {}
+    overcommit_ratio: float = Field(1.0, ge=1.0)
 
 class ClusterCreate(ClusterBase):
     pass
@@ -14,17 +16,30 @@ class ClusterCreate(ClusterBase):
 class ClusterUpdate(BaseModel):
     name: Optional[str] = None
 
+class ClusterResize(BaseModel):
+    # New totals; omitted kinds keep their current capacity
+    total_ram_gb: Optional[float] = Field(None, ge=0)
+    total_cpu_cores: Optional[float] = Field(None, ge=0)
+    total_gpu_count: Optional[int] = Field(None, ge=0)
+    total_extra_resources: Dict[str, Annotated[float, Field(ge=0)]] = {}
+
 class Cluster(ClusterBase):
     id: int
     organization_id: int
     available_ram_gb: float
     available_cpu_cores: float
     available_gpu_count: int
+    available_extra_resources: Dict[str, float] = {}
     created_at: datetime
+    version: Optional[int] = None
     
     class Config:
         from_attributes = True
 
+class ClusterResizeResult(BaseModel):
+    cluster: Cluster
+    preempted_deployment_ids: List[int]
+
 class ClusterResources(BaseModel):
     total_ram_gb: float
     total_cpu_cores: float
@@ -32,4 +47,50 @@ class ClusterResources(BaseModel):
     available_ram_gb: float
     available_cpu_cores: float
     available_gpu_count: int
-    utilization_percentage: float 
\ No newline at end of file
+    total_extra_resources: Dict[str, float] = {}
+    available_extra_resources: Dict[str, float] = {}
+    utilization_percentage: float 
+
+class PreemptionStats(BaseModel):
+    preemptions: int
+    resumed: int
+    lost_runtime_seconds: float
+    lost_gpu_seconds: float
+
+class ServiceCredential(BaseModel):
+    key_id: str
+    cluster_id: int
+    created_at: datetime
+    revoked_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class IssuedServiceCredential(ServiceCredential):
+    # Only returned once, when the credential is issued
+    secret: str
+
+class ImageLocalityStats(BaseModel):
+    hits: int
+    misses: int
+    hit_rate: float
+
+class QueueReconciliationStats(BaseModel):
+    passes: int
+    stale_found: int
+    stale_removed: int
+    duplicates_found: int
+    duplicates_removed: int
+    missing_found: int
+    missing_requeued: int
+
+class UtilizationHistory(BaseModel):
+    cluster_id: int
+    resolution: str
+    timestamps: List[int]
+    ram_avg: List[float]
+    ram_max: List[float]
+    cpu_avg: List[float]
+    cpu_max: List[float]
+    gpu_avg: List[float]
+    gpu_max: List[float]
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from ..models.deployment import DeploymentStatus, DeploymentPriority
 
@@ -9,26 +9,105 @@ class DeploymentBase(BaseModel):
     required_ram_gb: float
     required_cpu_cores: float
     required_gpu_count: int = 0
+    required_extra_resources: Dict[str, float] = {}
     priority: DeploymentPriority = DeploymentPriority.MEDIUM
 
 class DeploymentCreate(DeploymentBase):
-    cluster_id: int
+    # Omit to let the scheduler place the deployment within the organization
+    cluster_id: Optional[int] = None
     depends_on_deployment_id: Optional[int] = None
+    deadline: Optional[datetime] = None
+    expected_duration_seconds: Optional[int] = None
 
 class DeploymentUpdate(BaseModel):
     priority: Optional[DeploymentPriority] = None
     status: Optional[DeploymentStatus] = None
 
+class DeploymentStatusReport(BaseModel):
+    status: DeploymentStatus
+
 class Deployment(DeploymentBase):
     id: int
     cluster_id: int
     user_id: int
     status: DeploymentStatus
+    inherited_priority: Optional[DeploymentPriority] = None
     depends_on_deployment_id: Optional[int]
+    deadline: Optional[datetime] = None
+    expected_duration_seconds: Optional[int] = None
     created_at: datetime
     scheduled_at: Optional[datetime]
     started_at: Optional[datetime]
     completed_at: Optional[datetime]
+    version: Optional[int] = None
+    preemption_count: int = 0
+    
+    class Config:
+        from_attributes = True 
+
+class DeploymentEvent(BaseModel):
+    id: int
+    deployment_id: int
+    cluster_id: Optional[int]
+    event_type: str
+    payload: Dict[str, Optional[str]]
+    created_at: Optional[datetime]
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class PreemptionTrace(BaseModel):
+    skipped: Optional[str]
+    candidates: int
+    candidate_ids: List[int]
+    victim_ids: List[int]
+
+class DecisionTrace(BaseModel):
+    at: float
+    outcome: Optional[str]
+    reason: Optional[str]
+    shortfall: Dict[str, float]
+    overcommit: bool
+    preemption: Optional[PreemptionTrace]
+    phases_us: Dict[str, int]
+    total_us: int
+
+class DeploymentExplanation(BaseModel):
+    deployment_id: int
+    status: DeploymentStatus
+    decisions: List[DecisionTrace]
+
+class QueuePosition(BaseModel):
+    deployment_id: int
+    status: DeploymentStatus
+    # 1-based rank in the cluster queue; None when not waiting
+    position: Optional[int]
+    queue_length: int
+    ahead_demand: Dict[str, float]
+    # False when only the head of a very long queue was counted
+    ahead_complete: bool
+    estimated_start: Optional[datetime]
+
+class DeploymentLease(BaseModel):
+    deployment_id: int
+    expires_at: datetime
+
+class UsageSample(BaseModel):
+    ram_gb: float = Field(ge=0)
+    cpu_cores: float = Field(ge=0)
+
+class UsageSummary(BaseModel):
+    deployment_id: int
+    p95_ram_gb: float
+    p95_cpu_cores: float
+
+class RightSizingRecommendation(BaseModel):
+    docker_image: str
+    user_id: int
+    samples: int
+    p50_ram_gb: Optional[float]
+    p95_ram_gb: Optional[float]
+    p50_cpu_cores: Optional[float]
+    p95_cpu_cores: Optional[float]
+    recommended_ram_gb: Optional[float]
+    recommended_cpu_cores: Optional[float]
\ No newline at end of file
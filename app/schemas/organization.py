@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class OrganizationBase(BaseModel):
@@ -16,5 +16,33 @@ class Organization(OrganizationBase):
     class Config:
         from_attributes = True
 
+class RateLimit(BaseModel):
+    per_minute: float = Field(..., gt=0)
+    burst: int = Field(..., ge=1)
+
+class RateLimits(BaseModel):
+    organization: Optional[RateLimit] = None
+    # Default for every user in the organization, and per-user overrides
+    user: Optional[RateLimit] = None
+    users: Dict[int, RateLimit] = {}
+
 class OrganizationWithUsers(Organization):
-    users: List['User'] = [] 
\ No newline at end of file
+    users: List['User'] = []
+
+class ClusterCapacity(BaseModel):
+    cluster_id: int
+    name: str
+    total_ram_gb: float
+    total_cpu_cores: float
+    total_gpu_count: int
+    available_ram_gb: float
+    available_cpu_cores: float
+    available_gpu_count: int
+    running_by_priority: Dict[str, int]
+    queued_by_priority: Dict[str, int]
+    queue_depth: int
+
+class OrganizationCapacity(BaseModel):
+    organization_id: int
+    clusters: List[ClusterCapacity]
+    generated_at: datetime 
\ No newline at end of file
@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
+from ..models.deployment import DeploymentPriority
+
+class SimulatedJob(BaseModel):
+    name: str = "hypothetical"
+    required_ram_gb: float
+    required_cpu_cores: float
+    required_gpu_count: int = 0
+    required_extra_resources: Dict[str, float] = {}
+    priority: DeploymentPriority = DeploymentPriority.MEDIUM
+    expected_duration_seconds: Optional[int] = None
+    deadline: Optional[datetime] = None
+
+class SimulationRequest(BaseModel):
+    jobs: List[SimulatedJob]
+
+class SimulatedJobResult(BaseModel):
+    index: int
+    name: str
+    projected_start: Optional[datetime]
+    projected_end: Optional[datetime]
+    preemptions: int
+    times_preempted: int
+    meets_deadline: Optional[bool]
+
+class SimulatedPreemption(BaseModel):
+    deployment_id: Optional[int]
+    job_index: Optional[int]
+    name: str
+    preempted_by: int
+    at: datetime
+
+class SimulationResult(BaseModel):
+    cluster_id: int
+    jobs: List[SimulatedJobResult]
+    preemptions: List[SimulatedPreemption]
+    peak_utilization: Dict[str, float]
+    projected_completion: Optional[datetime]
+    # Scheduler behaviour the simulation approximates
+    unmodelled: List[str] = []
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import and_, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentArchive, DeploymentStatus
+from .versions import deployment_scopes, version_clock
+
+TERMINAL_STATUSES = [DeploymentStatus.COMPLETED, DeploymentStatus.FAILED]
+
+# Columns copied verbatim from deployments into deployment_archive
+ARCHIVED_COLUMNS = [
+    "id", "name", "docker_image", "cluster_id", "user_id",
+    "required_ram_gb", "required_cpu_cores", "required_gpu_count", "required_extra_resources",
+    "priority", "status", "inherited_priority", "depends_on_deployment_id", "deadline", "expected_duration_seconds",
+    "created_at", "scheduled_at", "started_at", "version", "preemption_count"
+]
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def next_month(moment: datetime) -> datetime:
+    return (moment.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+class DeploymentArchiver:
+    """Moves old terminal deployments into deployment_archive in short, bounded transactions"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.is_postgres = db.get_bind().dialect.name == "postgresql"
+    
+    def ensure_partitions(self, earliest: datetime, latest: datetime):
+        """Create monthly archive partitions covering a completion time range (PostgreSQL only)"""
+        if not self.is_postgres:
+            return
+        
+        self.db.execute(text(
+            "CREATE TABLE IF NOT EXISTS deployment_archive_default PARTITION OF deployment_archive DEFAULT"
+        ))
+        current = month_start(earliest)
+        while current <= latest:
+            upper = next_month(current)
+            self.db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS deployment_archive_{current:%Y_%m} "
+                f"PARTITION OF deployment_archive "
+                f"FOR VALUES FROM ('{current.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+            current = upper
+    
+    def prepare_partitions(self, cutoff: datetime):
+        """Create every partition a run up to cutoff can archive into, through next month"""
+        if not self.is_postgres:
+            return
+        
+        # Creating a partition locks the whole archive, so do it here in a short transaction
+        # of its own rather than inside the batches that copy rows
+        finished_at = func.coalesce(Deployment.completed_at, Deployment.created_at)
+        earliest = self.db.query(func.min(finished_at)).filter(
+            and_(
+                Deployment.status.in_(TERMINAL_STATUSES),
+                finished_at < cutoff
+            )
+        ).scalar()
+        self.ensure_partitions(earliest or cutoff, next_month(cutoff))
+        self.db.commit()
+    
+    def archive_batch(self, cutoff: datetime, batch_size: Optional[int] = None) -> int:
+        """Archive one batch of terminal deployments finished before cutoff"""
+        batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+        finished_at = func.coalesce(Deployment.completed_at, Deployment.created_at)
+        
+        # SKIP LOCKED keeps the batch from waiting on rows the scheduler is touching
+        batch = self.db.query(
+            Deployment.id, finished_at, Deployment.user_id, Deployment.cluster_id, Cluster.organization_id
+        ).outerjoin(Cluster, Cluster.id == Deployment.cluster_id).filter(
+            and_(
+                Deployment.status.in_(TERMINAL_STATUSES),
+                finished_at < cutoff
+            )
+        ).order_by(Deployment.id).limit(batch_size).with_for_update(skip_locked=True, of=Deployment).all()
+        
+        if not batch:
+            self.db.rollback()
+            return 0
+        
+        # Partitions exist ahead of time (prepare_partitions), so this transaction only moves rows
+        ids: List[int] = [row[0] for row in batch]
+        source = select(
+            *[getattr(Deployment, column) for column in ARCHIVED_COLUMNS],
+            finished_at
+        ).where(Deployment.id.in_(ids))
+        self.db.execute(
+            insert(DeploymentArchive).from_select(ARCHIVED_COLUMNS + ["completed_at"], source)
+        )
+        self.db.execute(
+            delete(Deployment).where(Deployment.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        
+        # Archived rows drop out of the default lists, so their read versions move on
+        version_clock.touch({
+            scope for row in batch for scope in deployment_scopes(row[2], row[3], row[4])
+        })
+        return len(ids)
+    
+    def run(self, now: Optional[datetime] = None) -> int:
+        """Archive everything past the retention window, one committed batch at a time"""
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=settings.ARCHIVE_RETENTION_DAYS)
+        self.prepare_partitions(cutoff)
+        
+        total = 0
+        for _ in range(settings.ARCHIVE_MAX_BATCHES):
+            archived = self.archive_batch(cutoff)
+            total += archived
+            if archived < settings.ARCHIVE_BATCH_SIZE:
+                break
+        return total
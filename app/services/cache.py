@@ -0,0 +1,187 @@
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import json
+import logging
+import threading
+import time
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.redis_client import get_redis_client
+from ..models.credential import ServiceCredential
+from ..models.organization import Organization
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Entities whose changes are broadcast to every worker's local caches
+CACHED_ENTITIES = (User, Organization, ServiceCredential)
+
+def entity_key(obj) -> str:
+    return f"{obj.__tablename__}:{obj.id}"
+
+class LocalCache:
+    """In-process TTL cache whose entries are tagged with the entity keys they were built from"""
+    
+    def __init__(self, name: str, bus: "InvalidationBus", max_entries: int = 10000, ttl_seconds: Optional[float] = None):
+        self.name = name
+        self.bus = bus
+        self.max_entries = max_entries
+        # Defaults to CACHE_TTL_SECONDS, read on every lookup
+        self.ttl_seconds = ttl_seconds
+        self.entries: Dict[Any, Tuple[float, Any, Set[str]]] = {}
+        self.tagged: Dict[str, Set[Any]] = {}
+        self.lock = threading.Lock()
+        bus.register(self)
+    
+    def get(self, key) -> Optional[Any]:
+        # Without the bus, evictions from other workers are missed, so only trust fresh entries
+        ttl = self.ttl_seconds or settings.CACHE_TTL_SECONDS
+        if not self.bus.connected:
+            ttl = min(ttl, settings.CACHE_FALLBACK_TTL_SECONDS)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > ttl:
+                self._remove(key)
+                return None
+            return entry[1]
+    
+    def set(self, key, value, tags: Iterable[str] = ()):
+        with self.lock:
+            if key not in self.entries and len(self.entries) >= self.max_entries:
+                # Dicts keep insertion order, so this drops the oldest entry
+                self._remove(next(iter(self.entries)))
+            self._remove(key)
+            tags = set(tags)
+            self.entries[key] = (time.monotonic(), value, tags)
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(key)
+    
+    def evict(self, tags: Iterable[str]):
+        with self.lock:
+            for tag in tags:
+                for key in self.tagged.pop(tag, ()):
+                    self._remove(key)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tagged.clear()
+    
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
+
+class InvalidationBus:
+    """Redis pub/sub fan-out of changed entity keys to every worker's local caches"""
+    
+    CHANNEL = "cache_invalidation"
+    
+    def __init__(self):
+        self.caches = []
+        self.connected = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    @property
+    def redis_client(self):
+        return get_redis_client()
+    
+    def register(self, cache: LocalCache):
+        self.caches.append(cache)
+    
+    def evict_local(self, keys: Iterable[str]):
+        keys = list(keys)
+        for cache in self.caches:
+            cache.evict(keys)
+    
+    def publish(self, keys: Iterable[str]):
+        """Evict locally, then tell the other workers in one message"""
+        keys = sorted(set(keys))
+        if not keys:
+            return
+        self.evict_local(keys)
+        try:
+            self.redis_client.publish(self.CHANNEL, json.dumps(keys))
+        except redis.RedisError:
+            logger.warning("Could not publish cache invalidations", exc_info=True)
+    
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.CACHE_BUS_POLL_SECONDS * 2)
+        self.connected = False
+    
+    def _listen(self):
+        while not self._stop.is_set():
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.CHANNEL)
+                # Anything published while disconnected was missed
+                for cache in self.caches:
+                    cache.clear()
+                self.connected = True
+                
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=settings.CACHE_BUS_POLL_SECONDS)
+                    if message is None:
+                        continue
+                    # Coalesce whatever else has already arrived into one eviction pass
+                    keys = set(json.loads(message["data"]))
+                    while True:
+                        message = pubsub.get_message(timeout=0)
+                        if message is None:
+                            break
+                        keys.update(json.loads(message["data"]))
+                    self.evict_local(keys)
+            except redis.RedisError:
+                logger.warning("Cache invalidation bus disconnected, falling back to TTL expiry", exc_info=True)
+                self.connected = False
+                self._stop.wait(settings.CACHE_BUS_POLL_SECONDS)
+            finally:
+                self.connected = False
+                pubsub.close()
+
+invalidation_bus = InvalidationBus()
+
+user_cache = LocalCache("users", invalidation_bus)
+invite_code_cache = LocalCache("invite_codes", invalidation_bus)
+service_key_cache = LocalCache("service_keys", invalidation_bus)
+service_key_miss_cache = LocalCache(
+    "service_key_misses", invalidation_bus,
+    max_entries=settings.SERVICE_KEY_MISS_CACHE_ENTRIES,
+    ttl_seconds=settings.SERVICE_KEY_MISS_CACHE_SECONDS
+)
+
+@event.listens_for(Session, "after_flush")
+def collect_invalidations(session: Session, flush_context):
+    keys = session.info.setdefault("invalidated_entities", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CACHED_ENTITIES):
+            keys.add(entity_key(obj))
+
+@event.listens_for(Session, "after_commit")
+def publish_invalidations(session: Session):
+    keys = session.info.pop("invalidated_entities", None)
+    if keys:
+        invalidation_bus.publish(keys)
+
+@event.listens_for(Session, "after_rollback")
+def discard_invalidations(session: Session):
+    session.info.pop("invalidated_entities", None)
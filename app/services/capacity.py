@@ -0,0 +1,110 @@
+from datetime import datetime, timezone
+import json
+import logging
+import redis
+from sqlalchemy import and_, event, func
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.redis_client import get_redis_client
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentStatus, WAITING_STATUSES
+from .scheduler import queue_index_key
+
+logger = logging.getLogger(__name__)
+
+def capacity_cache_key(organization_id: int) -> str:
+    return f"org_capacity_{organization_id}"
+
+@event.listens_for(Session, "after_flush")
+def collect_capacity_changes(session: Session, flush_context):
+    """Note organizations whose cluster capacity changes in this transaction"""
+    for obj in session.dirty:
+        if isinstance(obj, Cluster) and obj.organization_id is not None:
+            session.info.setdefault("capacity_organizations", set()).add(obj.organization_id)
+
+@event.listens_for(Session, "after_commit")
+def invalidate_organization_capacity(session: Session):
+    """Drop cached snapshots once the change is visible, so a concurrent read cannot cache the old numbers again"""
+    organization_ids = session.info.pop("capacity_organizations", None)
+    if organization_ids:
+        try:
+            get_redis_client().delete(*[capacity_cache_key(organization_id) for organization_id in organization_ids])
+        except redis.RedisError:
+            logger.warning("Could not invalidate cached organization capacity", exc_info=True)
+
+@event.listens_for(Session, "after_rollback")
+def discard_capacity_changes(session: Session):
+    session.info.pop("capacity_organizations", None)
+
+class CapacityDashboard:
+    """Organization-wide capacity computed with one aggregate query and one Redis round-trip"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.redis_client = get_redis_client()
+    
+    def get_capacity(self, organization_id: int) -> dict:
+        cache_key = capacity_cache_key(organization_id)
+        cached = self.redis_client.get(cache_key)
+        if cached:
+            return json.loads(cached)
+        
+        capacity = self._compute(organization_id)
+        self.redis_client.set(cache_key, json.dumps(capacity), ex=settings.CAPACITY_CACHE_SECONDS)
+        return capacity
+    
+    def _compute(self, organization_id: int) -> dict:
+        # One row per (cluster, status, priority); clusters without active work yield a single NULL row
+        rows = self.db.query(
+            Cluster.id, Cluster.name,
+            Cluster.total_ram_gb, Cluster.total_cpu_cores, Cluster.total_gpu_count,
+            Cluster.available_ram_gb, Cluster.available_cpu_cores, Cluster.available_gpu_count,
+            Deployment.status, Deployment.priority, func.count(Deployment.id)
+        ).outerjoin(
+            Deployment,
+            and_(
+                Deployment.cluster_id == Cluster.id,
+                Deployment.status.in_((DeploymentStatus.RUNNING,) + WAITING_STATUSES)
+            )
+        ).filter(
+            Cluster.organization_id == organization_id
+        ).group_by(
+            Cluster.id, Deployment.status, Deployment.priority
+        ).order_by(Cluster.id).all()
+        
+        clusters = {}
+        for row in rows:
+            cluster = clusters.get(row[0])
+            if cluster is None:
+                cluster = clusters[row[0]] = {
+                    "cluster_id": row[0],
+                    "name": row[1],
+                    "total_ram_gb": row[2],
+                    "total_cpu_cores": row[3],
+                    "total_gpu_count": row[4],
+                    "available_ram_gb": row[5],
+                    "available_cpu_cores": row[6],
+                    "available_gpu_count": row[7],
+                    "running_by_priority": {},
+                    "queued_by_priority": {},
+                    "queue_depth": 0
+                }
+            status, priority, count = row[8], row[9], row[10]
+            if status == DeploymentStatus.RUNNING:
+                cluster["running_by_priority"][priority.name] = count
+            elif status in WAITING_STATUSES:
+                queued = cluster["queued_by_priority"]
+                queued[priority.name] = queued.get(priority.name, 0) + count
+        
+        # Queue depth for every cluster in one pipelined round-trip; the index holds one entry per deployment
+        pipe = self.redis_client.pipeline(transaction=False)
+        for cluster_id in clusters:
+            pipe.hlen(queue_index_key(cluster_id))
+        for cluster, depth in zip(clusters.values(), pipe.execute()):
+            cluster["queue_depth"] = depth
+        
+        return {
+            "organization_id": organization_id,
+            "clusters": list(clusters.values()),
+            "generated_at": datetime.now(timezone.utc).isoformat()
+        }
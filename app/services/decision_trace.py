@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import json
+import logging
+import time
+import redis
+import numpy as np
+from ..core.config import settings
+from .resources import resource_kinds
+
+logger = logging.getLogger(__name__)
+
+class DecisionTrace:
+    """Outcome, blocking reason and per-phase timings of one scheduling decision"""
+    
+    def __init__(self):
+        self.outcome: Optional[str] = None
+        self.reason: Optional[str] = None
+        self.shortfall: Dict[str, float] = {}
+        self.overcommit = False
+        self.preemption: Optional[dict] = None
+        # Filled in by the victim search, in preemption order
+        self.candidates: list = []
+        self.phases: Dict[str, int] = {}
+        self._started = self._last = time.perf_counter()
+    
+    def mark(self, phase: str):
+        """Close a phase; its time is measured from the previous mark"""
+        now = time.perf_counter()
+        self.phases[phase] = int((now - self._last) * 1_000_000)
+        self._last = now
+    
+    def block(self, reason: str, need: Optional[np.ndarray] = None, available: Optional[np.ndarray] = None):
+        """Record why the deployment could not start; resource blocks name the kinds that are short"""
+        self.reason = reason
+        if need is not None:
+            missing = need - available
+            self.shortfall = {
+                kind: round(float(amount), 3) for kind, amount in zip(resource_kinds(), missing) if amount > 0
+            }
+    
+    def consider(self, victims: Optional[list] = None, skipped: Optional[str] = None):
+        """Record the preemption outcome against the candidates the victim search looked at"""
+        limit = settings.DECISION_TRACE_MAX_CANDIDATES
+        self.preemption = {
+            "skipped": skipped,
+            "candidates": len(self.candidates),
+            "candidate_ids": [d.id for d in self.candidates[:limit]],
+            "victim_ids": [d.id for d in (victims or [])[:limit]]
+        }
+    
+    def to_dict(self) -> dict:
+        return {
+            "at": time.time(),
+            "outcome": self.outcome,
+            "reason": self.reason,
+            "shortfall": self.shortfall,
+            "overcommit": self.overcommit,
+            "preemption": self.preemption,
+            "phases_us": self.phases,
+            "total_us": int((self._last - self._started) * 1_000_000)
+        }
+
+class DecisionTraceStore:
+    """Most recent decisions per deployment in capped Redis lists, written in one round trip per batch"""
+    
+    KEY_PREFIX = "decision_trace_"
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.pending: List[tuple] = []
+        self.deferred = 0
+    
+    def _key(self, deployment_id: int) -> str:
+        return f"{self.KEY_PREFIX}{deployment_id}"
+    
+    def record(self, deployment_id: int, trace: DecisionTrace):
+        if not settings.DECISION_TRACE_ENABLED:
+            return
+        self.pending.append((deployment_id, json.dumps(trace.to_dict())))
+        if not self.deferred:
+            self.flush()
+    
+    @contextmanager
+    def batch(self):
+        """Hold traces until the block ends, e.g. while draining a whole queue"""
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred:
+                self.flush()
+    
+    def flush(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for deployment_id, payload in pending:
+            key = self._key(deployment_id)
+            pipe.lpush(key, payload)
+            pipe.ltrim(key, 0, settings.DECISION_TRACE_KEEP - 1)
+            pipe.expire(key, settings.DECISION_TRACE_TTL_SECONDS)
+        # Traces are diagnostics; losing some must never fail a scheduling decision
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            logger.warning("Could not store %d scheduling decision traces", len(pending), exc_info=True)
+    
+    def recent(self, deployment_id: int, limit: Optional[int] = None) -> List[dict]:
+        """Newest first"""
+        limit = limit or settings.DECISION_TRACE_KEEP
+        return [json.loads(raw) for raw in self.redis_client.lrange(self._key(deployment_id), 0, limit - 1)]
@@ -1,25 +1,32 @@
+import logging
+import time
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func
-from ..models.deployment import Deployment, DeploymentStatus
+from ..models.deployment import Deployment, DeploymentArchive, DeploymentStatus, WAITING_STATUSES
 from ..models.cluster import Cluster
 from ..schemas.deployment import DeploymentCreate
+from ..core.config import settings
 from .scheduler import DeploymentScheduler
+from .queue_position import QueueEstimator
+from .resources import validate_extra_resources
+from .priority_inheritance import FINISHED_STATUSES
+
+logger = logging.getLogger(__name__)
 
 class DeploymentService:
     def __init__(self, db: Session):
         self.db = db
         self.scheduler = DeploymentScheduler(db)
     
-    def create_deployment(self, deployment_data: DeploymentCreate, user_id: int) -> Deployment:
+    def create_deployment(
+        self,
+        deployment_data: DeploymentCreate,
+        user_id: int,
+        organization_id: Optional[int] = None
+    ) -> Deployment:
         """Create a new deployment"""
-        # Validate cluster exists and user has access
-        cluster = self.db.query(Cluster).filter(
-            Cluster.id == deployment_data.cluster_id
-        ).first()
-        
-        if not cluster:
-            raise ValueError("Cluster not found")
+        validate_extra_resources(deployment_data.required_extra_resources)
         
         # Create deployment
         deployment = Deployment(
@@ -28,26 +35,94 @@ class DeploymentService:
             status=DeploymentStatus.PENDING
         )
         
+        if deployment_data.cluster_id is None:
+            # Let the scheduler place the deployment within the organization
+            if organization_id is None:
+                raise ValueError("cluster_id is required")
+            cluster = self.scheduler.select_cluster(deployment, organization_id)
+            if not cluster:
+                raise ValueError("No cluster in the organization can fit this deployment")
+            deployment.cluster_id = cluster.id
+        else:
+            # Validate cluster exists and user has access
+            cluster = self.db.query(Cluster).filter(
+                Cluster.id == deployment_data.cluster_id
+            ).first()
+            
+            if not cluster:
+                raise ValueError("Cluster not found")
+        
+        if deployment.deadline:
+            self.check_deadline_admission(deployment, cluster)
+        
         self.db.add(deployment)
         self.db.commit()
         self.db.refresh(deployment)
         
-        # Try to schedule immediately
-        self.scheduler.schedule_deployment(deployment)
+        # Try to schedule immediately (in sharded mode the cluster's scheduler worker does)
+        self.scheduler.submit(deployment)
+        
+        # Unfinished ancestors now block this deployment, so they inherit its priority
+        if deployment.depends_on_deployment_id:
+            self.scheduler.inheritance.update_ancestors(deployment)
         
         return deployment
     
-    def get_deployments_by_user(self, user_id: int) -> List[Deployment]:
+    def check_deadline_admission(self, deployment: Deployment, cluster: Cluster):
+        """Reject or warn about deadlines that cannot be met at submit time"""
+        if not deployment.expected_duration_seconds or deployment.expected_duration_seconds <= 0:
+            raise ValueError("expected_duration_seconds is required when a deadline is set")
+        
+        if self.scheduler.check_deadline_feasibility(deployment, cluster):
+            return
+        
+        if settings.DEADLINE_ADMISSION_MODE == "warn":
+            logger.warning(
+                "Admitting deployment %r on cluster %s with an infeasible deadline",
+                deployment.name, cluster.id
+            )
+            return
+        
+        raise ValueError("Deadline cannot be met with current cluster load and queue")
+    
+    def get_deployment(self, deployment_id: int):
+        """Get a deployment, falling through to the archive"""
+        deployment = self.db.query(Deployment).filter(
+            Deployment.id == deployment_id
+        ).first()
+        
+        if deployment is None:
+            deployment = self.db.query(DeploymentArchive).filter(
+                DeploymentArchive.id == deployment_id
+            ).first()
+        
+        return deployment
+    
+    def get_deployments_by_user(self, user_id: int, include_archived: bool = False) -> List[Deployment]:
         """Get all deployments for a user"""
-        return self.db.query(Deployment).filter(
+        deployments = self.db.query(Deployment).filter(
             Deployment.user_id == user_id
         ).all()
+        
+        if include_archived:
+            deployments += self.db.query(DeploymentArchive).filter(
+                DeploymentArchive.user_id == user_id
+            ).all()
+        
+        return deployments
     
-    def get_deployments_by_cluster(self, cluster_id: int) -> List[Deployment]:
+    def get_deployments_by_cluster(self, cluster_id: int, include_archived: bool = False) -> List[Deployment]:
         """Get all deployments for a cluster"""
-        return self.db.query(Deployment).filter(
+        deployments = self.db.query(Deployment).filter(
             Deployment.cluster_id == cluster_id
         ).all()
+        
+        if include_archived:
+            deployments += self.db.query(DeploymentArchive).filter(
+                DeploymentArchive.cluster_id == cluster_id
+            ).all()
+        
+        return deployments
     
     def update_deployment_status(self, deployment_id: int, status: DeploymentStatus) -> Optional[Deployment]:
         """Update deployment status"""
@@ -63,21 +138,91 @@ class DeploymentService:
         
         # Handle resource cleanup on completion/failure
         if status in [DeploymentStatus.COMPLETED, DeploymentStatus.FAILED] and old_status == DeploymentStatus.RUNNING:
-            cluster = deployment.cluster
-            cluster.available_ram_gb += deployment.required_ram_gb
-            cluster.available_cpu_cores += deployment.required_cpu_cores
-            cluster.available_gpu_count += deployment.required_gpu_count
+            # Successful runs feed the per-image duration histograms behind queue ETAs
+            if status == DeploymentStatus.COMPLETED and deployment.started_at:
+                self.scheduler.runtimes.record(deployment.docker_image, time.time() - deployment.started_at.timestamp())
+            self.scheduler.release_resources(deployment)
+            self.scheduler.leases.release(deployment.id)
             
             deployment.completed_at = func.now()
             
             # Process queue to schedule waiting deployments
-            self.scheduler.process_queue(cluster.id)
+            self.scheduler.drain(deployment.cluster_id)
         
         self.db.commit()
         self.db.refresh(deployment)
         
+        # A finished dependent stops lending its priority to its ancestors
+        if status in FINISHED_STATUSES and deployment.depends_on_deployment_id:
+            self.scheduler.inheritance.update_ancestors(deployment)
+        
         return deployment
     
+    def queue_position(self, deployment: Deployment) -> dict:
+        """Rank, demand ahead and estimated start of a waiting deployment"""
+        return QueueEstimator(self.scheduler).position(deployment)
+    
+    def refresh_priority(self, deployment: Deployment):
+        """Re-score a deployment and its ancestors after its own priority changed"""
+        if deployment.status in WAITING_STATUSES:
+            self.scheduler.add_to_queue(deployment)
+        if deployment.depends_on_deployment_id:
+            self.scheduler.inheritance.update_ancestors(deployment)
+    
+    def record_usage(self, deployment: Deployment, ram_gb: float, cpu_cores: float):
+        """Store an executor usage sample for a running deployment"""
+        if deployment.status != DeploymentStatus.RUNNING:
+            raise ValueError("Usage can only be reported for running deployments")
+        return self.scheduler.usage.record_sample(deployment, ram_gb, cpu_cores)
+    
+    def get_rightsizing_recommendation(self, docker_image: str, user_id: int) -> dict:
+        """Recommend resource requests for an image from observed usage"""
+        return self.scheduler.usage.recommendation(docker_image, user_id)
+    
+    def heartbeat(self, deployment_id: int) -> Optional[float]:
+        """Renew the executor lease of a running deployment"""
+        return self.scheduler.leases.renew(deployment_id)
+    
+    def expire_leases(self, now: Optional[float] = None) -> int:
+        """Fail or requeue running deployments whose leases expired"""
+        expired_ids = self.scheduler.leases.claim_expired(now)
+        if not expired_ids:
+            return 0
+        
+        deployments = self.db.query(Deployment).filter(
+            and_(
+                Deployment.id.in_(expired_ids),
+                Deployment.status == DeploymentStatus.RUNNING
+            )
+        ).all()
+        
+        requeued = []
+        cluster_ids = set()
+        for deployment in deployments:
+            self.scheduler.release_resources(deployment)
+            cluster_ids.add(deployment.cluster_id)
+            
+            if settings.LEASE_EXPIRY_ACTION == "requeue":
+                deployment.status = DeploymentStatus.QUEUED
+                deployment.started_at = None
+                requeued.append(deployment)
+            else:
+                deployment.status = DeploymentStatus.FAILED
+                deployment.completed_at = func.now()
+        
+        self.db.commit()
+        # Only now drop the leases; had the commit failed, the claims would time out and be swept again
+        self.scheduler.leases.release(*expired_ids)
+        
+        for deployment in requeued:
+            self.scheduler.add_to_queue(deployment)
+        
+        # Drain each affected queue once rather than once per expired deployment
+        for cluster_id in cluster_ids:
+            self.scheduler.drain(cluster_id)
+        
+        return len(expired_ids)
+    
     def cancel_deployment(self, deployment_id: int, user_id: int) -> bool:
         """Cancel a deployment"""
         deployment = self.db.query(Deployment).filter(
@@ -0,0 +1,154 @@
+from datetime import datetime
+from typing import Iterator, List, Optional
+import io
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import and_, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentArchive
+
+EXPORT_FORMATS = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+# Columns read from both the hot table and the archive
+EXPORT_COLUMNS = (
+    "id", "name", "docker_image", "cluster_id", "user_id", "priority", "status",
+    "required_ram_gb", "required_cpu_cores", "required_gpu_count",
+    "created_at", "scheduled_at", "started_at", "completed_at", "preemption_count"
+)
+
+EXPORT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("name", pa.string()),
+    ("docker_image", pa.string()),
+    ("cluster_id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("priority", pa.int8()),
+    ("status", pa.string()),
+    ("required_ram_gb", pa.float64()),
+    ("required_cpu_cores", pa.float64()),
+    ("required_gpu_count", pa.int32()),
+    ("created_at", TIMESTAMP),
+    ("scheduled_at", TIMESTAMP),
+    ("started_at", TIMESTAMP),
+    ("completed_at", TIMESTAMP),
+    ("preemption_count", pa.int32()),
+    ("archived", pa.bool_()),
+    # Derived: created to started, and started to completed
+    ("wait_seconds", pa.float64()),
+    ("run_seconds", pa.float64())
+])
+
+def export_batch_query(
+    organization_id: int,
+    after_id: int,
+    created_after: Optional[datetime],
+    limit: int,
+    completed_after: Optional[datetime] = None
+):
+    """Next keyset batch of an organization's deployments, live and archived, in id or completion order"""
+    statements = []
+    for table, archived in ((Deployment.__table__, False), (DeploymentArchive.__table__, True)):
+        criteria = [
+            table.c.cluster_id.in_(select(Cluster.id).where(Cluster.organization_id == organization_id))
+        ]
+        if completed_after is None:
+            criteria.append(table.c.id > after_id)
+            order = (table.c.id,)
+        else:
+            # Keyset on (completed_at, id), so rows that finished after an earlier export are picked up too
+            criteria.append(or_(
+                table.c.completed_at > completed_after,
+                and_(table.c.completed_at == completed_after, table.c.id > after_id)
+            ))
+            order = (table.c.completed_at, table.c.id)
+        if created_after is not None:
+            criteria.append(table.c.created_at > created_after)
+        # Each side is limited on its own keyset order, so a batch never reads more than 2 * limit rows
+        statements.append(
+            select(*[table.c[name] for name in EXPORT_COLUMNS], literal(archived).label("archived"))
+            .where(and_(*criteria))
+            .order_by(*order)
+            .limit(limit)
+        )
+    union = union_all(*[statement.subquery().select() for statement in statements]).subquery()
+    if completed_after is None:
+        return select(union).order_by(union.c.id).limit(limit)
+    return select(union).order_by(union.c.completed_at, union.c.id).limit(limit)
+
+def _seconds_between(start: pa.Array, end: pa.Array) -> pa.Array:
+    return pc.divide(pc.cast(pc.subtract(end, start), pa.int64()), 1_000_000.0)
+
+def record_batch(rows: List) -> pa.RecordBatch:
+    """Columnar batch of exported rows, with wait and run durations computed vectorized"""
+    columns = {name: [getattr(row, name) for row in rows] for name in EXPORT_COLUMNS + ("archived",)}
+    columns["priority"] = [priority.value if priority else None for priority in columns["priority"]]
+    columns["status"] = [status.value if status else None for status in columns["status"]]
+    arrays = {
+        name: pa.array(columns[name], type=EXPORT_SCHEMA.field(name).type)
+        for name in EXPORT_COLUMNS + ("archived",)
+    }
+    arrays["wait_seconds"] = _seconds_between(arrays["created_at"], arrays["started_at"])
+    arrays["run_seconds"] = _seconds_between(arrays["started_at"], arrays["completed_at"])
+    return pa.record_batch([arrays[field.name] for field in EXPORT_SCHEMA], schema=EXPORT_SCHEMA)
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands over what was written since the last drain, keeping the running offset"""
+    
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.written = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.written += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.written
+    
+    def drain(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+def stream_export(
+    db: Session,
+    organization_id: int,
+    format: str = "parquet",
+    after_id: int = 0,
+    created_after: Optional[datetime] = None,
+    completed_after: Optional[datetime] = None
+) -> Iterator[bytes]:
+    """Stream deployments as Parquet row groups or Arrow IPC batches, one keyset batch in memory at a time"""
+    sink = _ChunkSink()
+    if format == "parquet":
+        writer = pq.ParquetWriter(sink, EXPORT_SCHEMA)
+    else:
+        writer = pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+    
+    chunk = settings.EXPORT_CHUNK_ROWS
+    while True:
+        rows = db.execute(
+            export_batch_query(organization_id, after_id, created_after, chunk, completed_after)
+        ).all()
+        if rows:
+            writer.write_batch(record_batch(rows))
+            yield sink.drain()
+            after_id = rows[-1].id
+            if completed_after is not None:
+                completed_after = rows[-1].completed_at
+        if len(rows) < chunk:
+            break
+    
+    writer.close()
+    yield sink.drain()
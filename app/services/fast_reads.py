@@ -0,0 +1,83 @@
+from typing import Iterator, List, Optional, Type
+from pydantic import BaseModel
+from sqlalchemy import Table, and_, select, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+import orjson
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentArchive
+from ..schemas.cluster import Cluster as ClusterSchema
+from ..schemas.deployment import Deployment as DeploymentSchema
+
+# Datetimes render like Pydantic's ("Z" for UTC); enums render as their values
+JSON_OPTIONS = orjson.OPT_UTC_Z
+
+def schema_columns(schema: Type[BaseModel], table: Table) -> list:
+    """Only the table columns a response schema exposes, in schema order"""
+    return [table.c[name] for name in schema.model_fields]
+
+def changed_since(table: Table, since: int):
+    return table.c.version > since - settings.DELTA_SYNC_OVERLAP_MS
+
+def deployment_select(table: Table, *criteria) -> Select:
+    return select(*schema_columns(DeploymentSchema, table)).where(and_(*criteria))
+
+def deployments_query(
+    user_id: Optional[int] = None,
+    cluster_id: Optional[int] = None,
+    organization_id: Optional[int] = None,
+    include_archived: bool = False,
+    since: Optional[int] = None
+) -> Select:
+    """Core SELECT for a deployment list, optionally unioned with the archive"""
+    tables = [Deployment.__table__]
+    if include_archived:
+        tables.append(DeploymentArchive.__table__)
+    
+    statements = []
+    for table in tables:
+        criteria = []
+        if user_id is not None:
+            criteria.append(table.c.user_id == user_id)
+        if cluster_id is not None:
+            criteria.append(table.c.cluster_id == cluster_id)
+        if organization_id is not None:
+            criteria.append(
+                table.c.cluster_id.in_(select(Cluster.id).where(Cluster.organization_id == organization_id))
+            )
+        if since is not None:
+            criteria.append(changed_since(table, since))
+        statements.append(deployment_select(table, *criteria))
+    
+    if len(statements) == 1:
+        return statements[0]
+    return union_all(*statements)
+
+def clusters_query(organization_id: int, since: Optional[int] = None) -> Select:
+    table = Cluster.__table__
+    criteria = [table.c.organization_id == organization_id]
+    if since is not None:
+        criteria.append(changed_since(table, since))
+    return select(*schema_columns(ClusterSchema, table)).where(and_(*criteria))
+
+def fetch_rows(db: Session, statement) -> List[dict]:
+    """Plain dicts straight from the cursor, without ORM hydration or validation"""
+    result = db.execute(statement)
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result.all()]
+
+def render_json(rows: List[dict]) -> bytes:
+    return orjson.dumps(rows, option=JSON_OPTIONS)
+
+def stream_ndjson(db: Session, statement) -> Iterator[bytes]:
+    """Render rows as newline-delimited JSON in chunks, using a server-side cursor where supported"""
+    result = db.execute(
+        statement.execution_options(stream_results=True, yield_per=settings.FAST_READ_CHUNK_ROWS)
+    )
+    keys = list(result.keys())
+    for partition in result.partitions():
+        yield b"".join(
+            orjson.dumps(dict(zip(keys, row)), option=JSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+            for row in partition
+        )
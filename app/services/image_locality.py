@@ -0,0 +1,57 @@
+from typing import Dict
+import time
+from ..core.config import settings
+
+class ImageLocalityIndex:
+    """Recency-decayed index of the clusters where each docker image ran recently"""
+    
+    STATS_KEY = "image_locality_stats"
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.half_life = settings.IMAGE_LOCALITY_HALF_LIFE_SECONDS
+        self.max_clusters = settings.IMAGE_LOCALITY_MAX_CLUSTERS
+        # Entries older than this have decayed below 1% and are dropped
+        self.horizon = self.half_life * 7
+    
+    def _key(self, docker_image: str) -> str:
+        return f"image_locality_{docker_image}"
+    
+    def weights(self, docker_image: str) -> Dict[int, float]:
+        """Return decayed locality weights in [0, 1] keyed by cluster id"""
+        now = time.time()
+        entries = self.redis_client.zrangebyscore(
+            self._key(docker_image), now - self.horizon, "+inf", withscores=True
+        )
+        return {
+            int(cluster_id): 0.5 ** ((now - last_seen) / self.half_life)
+            for cluster_id, last_seen in entries
+        }
+    
+    def record(self, docker_image: str, cluster_id: int) -> bool:
+        """Record that an image started on a cluster; return True on a warm hit"""
+        key = self._key(docker_image)
+        now = time.time()
+        last_seen = self.redis_client.zscore(key, cluster_id)
+        hit = last_seen is not None and now - last_seen <= self.horizon
+        
+        pipe = self.redis_client.pipeline()
+        pipe.zadd(key, {cluster_id: now})
+        # Keep only the most recent clusters per image and let idle images expire
+        pipe.zremrangebyrank(key, 0, -(self.max_clusters + 1))
+        pipe.expire(key, int(self.horizon))
+        pipe.hincrby(self.STATS_KEY, "hits" if hit else "misses", 1)
+        pipe.execute()
+        return hit
+    
+    def stats(self) -> Dict[str, float]:
+        """Return placement cache-hit counters"""
+        raw = self.redis_client.hgetall(self.STATS_KEY)
+        hits = int(raw.get(b"hits", 0))
+        misses = int(raw.get(b"misses", 0))
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0
+        }
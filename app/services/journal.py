@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.deployment import Deployment, DeploymentStatus
+from ..models.journal import SchedulerEvent, SchedulerSnapshot
+
+EVENT_TYPES = {
+    DeploymentStatus.PENDING: "created",
+    DeploymentStatus.QUEUED: "queued",
+    DeploymentStatus.RUNNING: "scheduled",
+    DeploymentStatus.PREEMPTED: "preempted",
+    DeploymentStatus.COMPLETED: "completed",
+    DeploymentStatus.FAILED: "failed"
+}
+
+TERMINAL_EVENTS = {"completed", "failed"}
+
+def _event_row(deployment: Deployment, event_type: str, previous: Optional[DeploymentStatus] = None) -> dict:
+    status = deployment.status or DeploymentStatus.PENDING
+    return {
+        "deployment_id": deployment.id,
+        "cluster_id": deployment.cluster_id,
+        "user_id": deployment.user_id,
+        "event_type": event_type,
+        "payload": {
+            "status": status.value,
+            "previous_status": previous.value if previous else None,
+            "priority": deployment.priority.name if deployment.priority else None
+        }
+    }
+
+@event.listens_for(Session, "after_flush")
+def journal_status_changes(session: Session, flush_context):
+    """Append an event for every deployment created or moved to a new status in this flush"""
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Deployment):
+            rows.append(_event_row(obj, "created"))
+    for obj in session.dirty:
+        if not isinstance(obj, Deployment):
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.added and history.deleted and history.added[0] != history.deleted[0]:
+            rows.append(_event_row(obj, EVENT_TYPES[obj.status], history.deleted[0]))
+    
+    if rows:
+        # Same connection, so the journal commits or rolls back with the change itself
+        session.connection().execute(SchedulerEvent.__table__.insert(), rows)
+
+def _settled_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=settings.JOURNAL_COMMIT_LAG_SECONDS)
+
+def _is_settled(scheduler_event: SchedulerEvent, cutoff: datetime) -> bool:
+    created_at = scheduler_event.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at <= cutoff
+
+class SchedulerState:
+    """Active deployments keyed by id, as of a journal position"""
+    
+    def __init__(self, deployments: Optional[Dict[int, dict]] = None, last_event_id: int = 0):
+        self.deployments = deployments or {}
+        self.last_event_id = last_event_id
+    
+    def apply(self, scheduler_event: SchedulerEvent):
+        if scheduler_event.event_type in TERMINAL_EVENTS:
+            self.deployments.pop(scheduler_event.deployment_id, None)
+        else:
+            self.deployments[scheduler_event.deployment_id] = {
+                "cluster_id": scheduler_event.cluster_id,
+                "status": scheduler_event.payload["status"],
+                "priority": scheduler_event.payload.get("priority")
+            }
+    
+    def deployment_ids(self, cluster_id: int, status: DeploymentStatus) -> List[int]:
+        return sorted(
+            deployment_id for deployment_id, entry in self.deployments.items()
+            if entry["cluster_id"] == cluster_id and entry["status"] == status.value
+        )
+    
+    def to_dict(self) -> dict:
+        # JSON object keys are strings
+        return {str(deployment_id): entry for deployment_id, entry in self.deployments.items()}
+    
+    @classmethod
+    def from_snapshot(cls, snapshot: SchedulerSnapshot) -> "SchedulerState":
+        return cls(
+            {int(deployment_id): entry for deployment_id, entry in snapshot.state.items()},
+            snapshot.last_event_id
+        )
+
+class SchedulerJournal:
+    """Reads the deployment event journal and maintains scheduler state snapshots"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def events_since(
+        self,
+        after_id: int,
+        limit: Optional[int] = None,
+        cluster_ids: Optional[List[int]] = None,
+        user_id: Optional[int] = None,
+        settled_only: bool = True
+    ) -> List[SchedulerEvent]:
+        """Events after a journal position, oldest first, stopping at the first one still unsettled"""
+        query = self.db.query(SchedulerEvent).filter(SchedulerEvent.id > after_id)
+        if cluster_ids is not None:
+            query = query.filter(SchedulerEvent.cluster_id.in_(cluster_ids))
+        if user_id is not None:
+            query = query.filter(SchedulerEvent.user_id == user_id)
+        events = query.order_by(SchedulerEvent.id).limit(limit or settings.JOURNAL_FEED_LIMIT).all()
+        if not settled_only:
+            return events
+        
+        # Every id below a settled event has committed, so a consumer resuming after the last
+        # returned id cannot miss a lower one that commits late
+        cutoff = _settled_cutoff()
+        for index, scheduler_event in enumerate(events):
+            if not _is_settled(scheduler_event, cutoff):
+                return events[:index]
+        return events
+    
+    def latest_snapshot(self) -> Optional[SchedulerSnapshot]:
+        return self.db.query(SchedulerSnapshot).order_by(SchedulerSnapshot.last_event_id.desc()).first()
+    
+    def cold_state(self) -> SchedulerState:
+        """Build state from the deployments table when there is no snapshot yet"""
+        # Read the journal position first; replaying events after it is idempotent. Only a settled
+        # event is a safe position: lower ids still in flight would commit behind it unreplayed
+        last_event_id = self.db.query(func.max(SchedulerEvent.id)).filter(
+            SchedulerEvent.created_at <= _settled_cutoff()
+        ).scalar() or 0
+        active = self.db.query(
+            Deployment.id, Deployment.cluster_id, Deployment.status, Deployment.priority
+        ).filter(
+            Deployment.status.notin_([DeploymentStatus.COMPLETED, DeploymentStatus.FAILED])
+        ).all()
+        return SchedulerState(
+            {
+                row.id: {
+                    "cluster_id": row.cluster_id,
+                    "status": row.status.value,
+                    "priority": row.priority.name if row.priority else None
+                }
+                for row in active
+            },
+            last_event_id
+        )
+    
+    def restore(self) -> SchedulerState:
+        """Latest snapshot plus a replay of the journal tail"""
+        snapshot = self.latest_snapshot()
+        state = SchedulerState.from_snapshot(snapshot) if snapshot else self.cold_state()
+        
+        # Apply everything visible, but only advance the position through the settled prefix.
+        # Replaying from there again is idempotent: a deployment's events commit in id order
+        cutoff = _settled_cutoff()
+        cursor = state.last_event_id
+        settled = True
+        while True:
+            batch = self.events_since(cursor, limit=settings.JOURNAL_REPLAY_BATCH, settled_only=False)
+            for scheduler_event in batch:
+                state.apply(scheduler_event)
+                settled = settled and _is_settled(scheduler_event, cutoff)
+                if settled:
+                    state.last_event_id = scheduler_event.id
+                cursor = scheduler_event.id
+            if len(batch) < settings.JOURNAL_REPLAY_BATCH:
+                return state
+    
+    def take_snapshot(self) -> SchedulerSnapshot:
+        """Persist the current state and drop all but the newest snapshots"""
+        state = self.restore()
+        snapshot = SchedulerSnapshot(last_event_id=state.last_event_id, state=state.to_dict())
+        self.db.add(snapshot)
+        self.db.flush()
+        
+        stale = self.db.query(SchedulerSnapshot.id).order_by(
+            SchedulerSnapshot.last_event_id.desc()
+        ).offset(settings.JOURNAL_SNAPSHOTS_KEPT).all()
+        if stale:
+            self.db.query(SchedulerSnapshot).filter(
+                SchedulerSnapshot.id.in_([row.id for row in stale])
+            ).delete(synchronize_session=False)
+        
+        self.db.commit()
+        return snapshot
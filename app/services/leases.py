@@ -0,0 +1,96 @@
+from typing import List, Optional
+import time
+from redis.commands.core import Script
+from ..core.config import settings
+
+# Renew a lease only if the deployment runs on the caller's cluster:
+# 1 renewed, 0 no lease, -1 another cluster, -2 cluster not recorded
+RENEW_IN_CLUSTER_SCRIPT = """
+local cluster_id = redis.call('HGET', KEYS[2], ARGV[1])
+if not cluster_id then
+    if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+        return -2
+    end
+    return 0
+end
+if cluster_id ~= ARGV[2] then
+    return -1
+end
+return redis.call('ZADD', KEYS[1], 'XX', 'CH', ARGV[3], ARGV[1])
+"""
+
+# Claim expired leases by pushing their expiry out to a retry time instead of removing them;
+# the claimer releases them once its transaction commits
+CLAIM_EXPIRED_SCRIPT = """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(members) do
+    redis.call('ZADD', KEYS[1], ARGV[3], member)
+end
+return members
+"""
+
+class LeaseManager:
+    """Executor leases for running deployments, kept in a Redis sorted set keyed by expiry"""
+    
+    LEASES_KEY = "deployment_leases"
+    CLUSTERS_KEY = "deployment_lease_clusters"
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.ttl = settings.LEASE_TTL_SECONDS
+        self.renew_in_cluster_script = Script(None, RENEW_IN_CLUSTER_SCRIPT.encode())
+        self.claim_expired_script = Script(None, CLAIM_EXPIRED_SCRIPT.encode())
+    
+    def grant(self, deployment_id: int, cluster_id: Optional[int] = None) -> float:
+        """Start a lease for a deployment and return its expiry timestamp"""
+        expires_at = time.time() + self.ttl
+        pipe = self.redis_client.pipeline()
+        pipe.zadd(self.LEASES_KEY, {deployment_id: expires_at})
+        if cluster_id is not None:
+            # Lets executor heartbeats be checked against their cluster without the database
+            pipe.hset(self.CLUSTERS_KEY, deployment_id, cluster_id)
+        pipe.execute()
+        return expires_at
+    
+    def renew(self, deployment_id: int) -> Optional[float]:
+        """Extend an existing lease; return None if the lease is gone"""
+        expires_at = time.time() + self.ttl
+        # XX only updates members that exist, so an expired lease cannot be revived
+        updated = self.redis_client.zadd(
+            self.LEASES_KEY, {deployment_id: expires_at}, xx=True, ch=True
+        )
+        return expires_at if updated else None
+    
+    def renew_in_cluster(self, deployment_id: int, cluster_id: int) -> Optional[float]:
+        """Renew a lease on behalf of an executor scoped to one cluster; None if the lease is gone"""
+        expires_at = time.time() + self.ttl
+        result = int(self.renew_in_cluster_script(
+            keys=[self.LEASES_KEY, self.CLUSTERS_KEY],
+            args=[deployment_id, cluster_id, expires_at],
+            client=self.redis_client
+        ))
+        if result == -1:
+            raise ValueError("Deployment does not run on this cluster")
+        if result == -2:
+            # Granted before leases recorded their cluster; the caller has to check it
+            raise LookupError(deployment_id)
+        return expires_at if result else None
+    
+    def release(self, *deployment_ids: int):
+        """Drop the leases of deployments that stopped running"""
+        if not deployment_ids:
+            return
+        pipe = self.redis_client.pipeline()
+        pipe.zrem(self.LEASES_KEY, *deployment_ids)
+        pipe.hdel(self.CLUSTERS_KEY, *deployment_ids)
+        pipe.execute()
+    
+    def claim_expired(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[int]:
+        """Claim up to limit expired leases; each lease is claimed by one caller until the claim times out"""
+        now = now if now is not None else time.time()
+        members = self.claim_expired_script(
+            keys=[self.LEASES_KEY],
+            args=[now, limit or settings.LEASE_SWEEP_BATCH, now + settings.LEASE_CLAIM_TIMEOUT_SECONDS],
+            client=self.redis_client
+        )
+        return [int(member) for member in members]
@@ -0,0 +1,43 @@
+from typing import Dict, Optional
+import time
+from ..core.config import settings
+
+COUNTERS = ("preemptions", "resumed", "lost_runtime_seconds", "lost_gpu_seconds")
+
+def preemption_allowed(deployment, now: Optional[float] = None) -> bool:
+    """Thrash protection: a victim must have run long enough and still have preemption budget left"""
+    if (deployment.preemption_count or 0) >= settings.PREEMPTION_BUDGET:
+        return False
+    if deployment.started_at is not None:
+        now = now if now is not None else time.time()
+        if now - deployment.started_at.timestamp() < settings.PREEMPTION_MIN_RUNTIME_SECONDS:
+            return False
+    return True
+
+def resume_boost(deployment) -> float:
+    """Extra queue score for work that already lost progress to preemption"""
+    return settings.PREEMPTION_RESUME_BOOST if deployment.preemption_count else 0.0
+
+class PreemptionMetrics:
+    """Cumulative preemption churn and the work it threw away"""
+    
+    STATS_KEY = "preemption_stats"
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+    
+    def record_preemption(self, deployment, now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        runtime = max(now - deployment.started_at.timestamp(), 0.0) if deployment.started_at else 0.0
+        pipe = self.redis_client.pipeline()
+        pipe.hincrby(self.STATS_KEY, "preemptions", 1)
+        pipe.hincrbyfloat(self.STATS_KEY, "lost_runtime_seconds", runtime)
+        pipe.hincrbyfloat(self.STATS_KEY, "lost_gpu_seconds", runtime * (deployment.required_gpu_count or 0))
+        pipe.execute()
+    
+    def record_resume(self):
+        self.redis_client.hincrby(self.STATS_KEY, "resumed", 1)
+    
+    def stats(self) -> Dict[str, float]:
+        raw = self.redis_client.hgetall(self.STATS_KEY)
+        return {counter: float(raw.get(counter.encode(), 0)) for counter in COUNTERS}
@@ -0,0 +1,67 @@
+from typing import Dict, Optional, Set
+from sqlalchemy import and_
+from ..models.deployment import Deployment, DeploymentStatus, DeploymentPriority, WAITING_STATUSES
+
+FINISHED_STATUSES = (DeploymentStatus.COMPLETED, DeploymentStatus.FAILED)
+
+def effective_priority(deployment) -> DeploymentPriority:
+    """A deployment's own priority, raised to the highest one inherited from unfinished dependents"""
+    inherited = deployment.inherited_priority
+    if inherited is not None and inherited.value > deployment.priority.value:
+        return inherited
+    return deployment.priority
+
+class PriorityInheritance:
+    """Propagates effective priority from dependents up to the unfinished ancestors they wait on"""
+    
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.db = scheduler.db
+    
+    def _dependents_priority(self, ancestor_id: int, memo: Dict[int, DeploymentPriority]) -> Optional[DeploymentPriority]:
+        """Highest effective priority among an ancestor's unfinished direct dependents"""
+        dependents = self.db.query(Deployment).filter(
+            and_(
+                Deployment.depends_on_deployment_id == ancestor_id,
+                Deployment.status.notin_(FINISHED_STATUSES)
+            )
+        ).all()
+        highest = None
+        for dependent in dependents:
+            # Dependents already updated in this walk carry their fresh effective priority
+            priority = memo.get(dependent.id) or effective_priority(dependent)
+            if highest is None or priority.value > highest.value:
+                highest = priority
+        return highest
+    
+    def update_ancestors(self, deployment: Deployment) -> int:
+        """Re-derive inherited priority up the dependency chain; return how many ancestors changed"""
+        memo: Dict[int, DeploymentPriority] = {deployment.id: effective_priority(deployment)}
+        visited: Set[int] = {deployment.id}
+        changed = 0
+        parent_id = deployment.depends_on_deployment_id
+        
+        while parent_id is not None and parent_id not in visited:
+            visited.add(parent_id)
+            parent = self.db.query(Deployment).filter(Deployment.id == parent_id).first()
+            # Finished or archived ancestors no longer block anyone
+            if parent is None or parent.status in FINISHED_STATUSES:
+                break
+            
+            inherited = self._dependents_priority(parent.id, memo)
+            if inherited is not None and inherited.value <= parent.priority.value:
+                inherited = None
+            if inherited == parent.inherited_priority:
+                # Everything further up was derived from this unchanged value
+                break
+            
+            parent.inherited_priority = inherited
+            memo[parent.id] = effective_priority(parent)
+            changed += 1
+            if parent.status in WAITING_STATUSES:
+                self.scheduler.add_to_queue(parent)
+            parent_id = parent.depends_on_deployment_id
+        
+        if changed:
+            self.db.commit()
+        return changed
@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+from typing import Optional
+import json
+import time
+import numpy as np
+from sqlalchemy import and_
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentStatus, WAITING_STATUSES
+from .resources import required_vector, available_vector, resource_kinds, fits
+from .scheduler import queue_index_key
+
+class QueueEstimator:
+    """Queue rank, demand ahead and estimated start of a waiting deployment"""
+    
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.db = scheduler.db
+        self.redis_client = scheduler.redis_client
+    
+    def _rank(self, deployment: Deployment) -> Optional[int]:
+        """Zero-based rank from the top: one index lookup and a ZREVRANK, with a scan fallback"""
+        queue_key = f"deployment_queue_{deployment.cluster_id}"
+        member = self.redis_client.hget(queue_index_key(deployment.cluster_id), deployment.id)
+        if member is not None:
+            rank = self.redis_client.zrevrank(queue_key, member)
+            if rank is not None:
+                return rank
+        
+        # Index entry missing, or pointing at a duplicate the reconciler dropped: find the member and repair
+        found = next(self.redis_client.zscan_iter(queue_key, match=f'{{"deployment_id": {deployment.id}, *'), None)
+        if found is None:
+            return None
+        self.redis_client.hset(queue_index_key(deployment.cluster_id), deployment.id, found[0])
+        return self.redis_client.zrevrank(queue_key, found[0])
+    
+    def position(self, deployment: Deployment) -> dict:
+        result = {
+            "deployment_id": deployment.id,
+            "status": deployment.status,
+            "position": None,
+            "queue_length": 0,
+            "ahead_demand": {},
+            "ahead_complete": True,
+            "estimated_start": None
+        }
+        if deployment.status not in WAITING_STATUSES:
+            return result
+        
+        queue_key = f"deployment_queue_{deployment.cluster_id}"
+        rank = self._rank(deployment)
+        if rank is None:
+            return result
+        result["position"] = rank + 1
+        # Distinct waiting deployments; the index holds one entry per deployment
+        result["queue_length"] = self.redis_client.hlen(queue_index_key(deployment.cluster_id))
+        
+        # Demand ahead comes from the queue members themselves; very deep positions only count the head
+        scanned = min(rank, settings.QUEUE_POSITION_MAX_AHEAD)
+        ahead = np.zeros(len(resource_kinds()), dtype=np.float64)
+        complete = scanned == rank
+        seen = {deployment.id}
+        for raw in self.redis_client.zrevrange(queue_key, 0, scanned - 1) if scanned else []:
+            queue_data = json.loads(raw)
+            # Members left over from before enqueueing replaced old entries are counted once
+            if queue_data.get("deployment_id") in seen:
+                continue
+            seen.add(queue_data.get("deployment_id"))
+            demand = queue_data.get("demand")
+            if demand is None or len(demand) != len(ahead):
+                # Queued before demand was recorded, or with a different set of resource kinds
+                complete = False
+                continue
+            ahead += demand
+        if scanned == rank:
+            result["position"] = len(seen)
+        result["ahead_demand"] = dict(zip(resource_kinds(), ahead.tolist()))
+        result["ahead_complete"] = complete
+        if complete:
+            start = self.estimate_start(deployment, ahead)
+            if start is not None:
+                result["estimated_start"] = datetime.fromtimestamp(start, timezone.utc)
+        return result
+    
+    def estimate_start(self, deployment: Deployment, ahead: np.ndarray) -> Optional[float]:
+        """When running work will have released enough for everything ahead plus this deployment"""
+        # Work ahead is treated as one block that starts once it fits, so packing is ignored
+        cluster = self.db.get(Cluster, deployment.cluster_id)
+        if cluster is None:
+            return None
+        target = ahead + required_vector(deployment)
+        available = available_vector(cluster)
+        now = time.time()
+        if fits(target, available):
+            return now
+        
+        running = self.db.query(
+            Deployment.id, Deployment.docker_image, Deployment.started_at, Deployment.expected_duration_seconds,
+            Deployment.required_ram_gb, Deployment.required_cpu_cores, Deployment.required_gpu_count,
+            Deployment.required_extra_resources
+        ).filter(
+            and_(
+                Deployment.cluster_id == cluster.id,
+                Deployment.status == DeploymentStatus.RUNNING
+            )
+        ).all()
+        histograms = self.scheduler.runtimes.load(
+            d.docker_image for d in running if not d.expected_duration_seconds
+        )
+        
+        releases = []
+        for d in running:
+            elapsed = max(now - d.started_at.timestamp(), 0.0) if d.started_at else 0.0
+            if d.expected_duration_seconds:
+                remaining = max(d.expected_duration_seconds - elapsed, 0.0)
+            else:
+                remaining = self.scheduler.runtimes.remaining(histograms.get(d.docker_image, {}), elapsed)
+            if remaining is not None:
+                releases.append((now + remaining, required_vector(d)))
+        releases.sort(key=lambda release: release[0])
+        
+        for end, freed in releases:
+            available = available + freed
+            if fits(target, available):
+                return end
+        return None
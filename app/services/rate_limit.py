@@ -0,0 +1,99 @@
+from typing import List, Optional, Tuple
+import logging
+import time
+import redis
+from redis.commands.core import Script
+from ..core.config import settings
+from ..core.redis_client import get_redis_client
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+# KEYS: one bucket per key. ARGV: now, cost, then (refill per second, burst) for each key.
+# Tokens are taken from every bucket or from none, so the caller needs a single round trip.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + i * 2])
+    local burst = tonumber(ARGV[2 + i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(state[1]) or burst
+    local last = tonumber(state[2]) or now
+    level = math.min(burst, level + math.max(0, now - last) * rate)
+    levels[i] = level
+    if level < cost then
+        wait = math.max(wait, (cost - level) / rate)
+    end
+end
+if wait > 0 then
+    return {0, tostring(wait)}
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[1 + i * 2])
+    local burst = tonumber(ARGV[2 + i * 2])
+    redis.call('HSET', key, 'tokens', levels[i] - cost, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return {1, '0'}
+"""
+
+def _limit(overrides: Optional[dict], per_minute: float, burst: int) -> Tuple[float, int]:
+    if overrides:
+        return overrides["per_minute"], overrides["burst"]
+    return per_minute, burst
+
+class TokenBucketLimiter:
+    """Per-organization and per-user token buckets for deployment submissions"""
+    
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.script = Script(None, TOKEN_BUCKET_SCRIPT.encode())
+    
+    @property
+    def redis_client(self):
+        return self._redis_client or get_redis_client()
+    
+    def limits_for(self, user: User) -> List[Tuple[str, float, int]]:
+        """Bucket keys with their (per-minute rate, burst) for a user"""
+        overrides = {}
+        if user.organization_id and user.organization is not None:
+            overrides = user.organization.rate_limits or {}
+        
+        user_overrides = overrides.get("users", {}).get(str(user.id)) or overrides.get("user")
+        buckets = [
+            (f"rate_limit_user_{user.id}",) + _limit(
+                user_overrides, settings.RATE_LIMIT_USER_PER_MINUTE, settings.RATE_LIMIT_USER_BURST
+            )
+        ]
+        if user.organization_id:
+            buckets.append(
+                (f"rate_limit_org_{user.organization_id}",) + _limit(
+                    overrides.get("organization"), settings.RATE_LIMIT_ORG_PER_MINUTE, settings.RATE_LIMIT_ORG_BURST
+                )
+            )
+        return buckets
+    
+    def acquire(self, user: User, cost: int = 1) -> Tuple[bool, float]:
+        """Take tokens for one request; returns (allowed, seconds until retry)"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return True, 0.0
+        
+        buckets = self.limits_for(user)
+        args = [time.time(), cost]
+        for _, per_minute, burst in buckets:
+            args += [per_minute / 60, burst]
+        
+        try:
+            allowed, wait = self.script(
+                keys=[key for key, _, _ in buckets], args=args, client=self.redis_client
+            )
+        except redis.RedisError:
+            # Fail open: admission control must not take submissions down with it
+            logger.warning("Rate limiter unavailable, admitting request", exc_info=True)
+            return True, 0.0
+        return bool(allowed), float(wait)
+
+submission_limiter = TokenBucketLimiter()
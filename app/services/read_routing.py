@@ -0,0 +1,45 @@
+import logging
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..core.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+class ReadYourWrites:
+    """Remembers which users wrote recently, so their reads skip a possibly lagging replica"""
+    
+    KEY_PREFIX = "recent_write_"
+    
+    def mark(self, username: str):
+        try:
+            get_redis_client().set(f"{self.KEY_PREFIX}{username}", 1, ex=settings.REPLICA_LAG_SECONDS)
+        except redis.RedisError:
+            logger.warning("Could not record a recent write", exc_info=True)
+    
+    def recent(self, username: str) -> bool:
+        try:
+            return bool(get_redis_client().exists(f"{self.KEY_PREFIX}{username}"))
+        except redis.RedisError:
+            # Without the marker we cannot rule out a recent write, so stay on the primary
+            return True
+    
+    def forget(self, username: str):
+        get_redis_client().delete(f"{self.KEY_PREFIX}{username}")
+
+read_your_writes = ReadYourWrites()
+
+@event.listens_for(Session, "after_flush")
+def note_user_write(session: Session, flush_context):
+    if "username" in session.info and (session.new or session.dirty or session.deleted):
+        session.info["wrote"] = True
+
+@event.listens_for(Session, "after_commit")
+def mark_user_write(session: Session):
+    if session.info.pop("wrote", False):
+        read_your_writes.mark(session.info["username"])
+
+@event.listens_for(Session, "after_rollback")
+def discard_user_write(session: Session):
+    session.info.pop("wrote", None)
@@ -0,0 +1,168 @@
+from typing import Dict, Set, Tuple
+import json
+from sqlalchemy import and_
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentStatus, WAITING_STATUSES
+from .journal import SchedulerState
+from .scheduler import queue_index_key
+
+COUNTERS = (
+    "passes",
+    "stale_found", "stale_removed",
+    "duplicates_found", "duplicates_removed",
+    "missing_found", "missing_requeued"
+)
+
+class QueueReconciler:
+    """Repairs drift between the Redis deployment queues and waiting (queued or preempted) deployment rows"""
+    
+    STATS_KEY = "queue_reconcile_stats"
+    
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.db = scheduler.db
+        self.redis_client = scheduler.redis_client
+        self.chunk = settings.QUEUE_RECONCILE_CHUNK
+    
+    def _parse(self, member: bytes):
+        try:
+            return int(json.loads(member)["deployment_id"])
+        except (ValueError, KeyError, TypeError):
+            return None
+    
+    def _scan_queue(self, cluster_id: int, counts: Dict[str, int]) -> Set[int]:
+        """Walk the queue in ZSCAN chunks, dropping stale and duplicate members; return queued ids"""
+        key = f"deployment_queue_{cluster_id}"
+        kept: Dict[int, Tuple[bytes, float]] = {}
+        cursor = 0
+        
+        while True:
+            cursor, members = self.redis_client.zscan(key, cursor, count=self.chunk)
+            parsed = [(member, score, self._parse(member)) for member, score in members]
+            ids = {deployment_id for _, _, deployment_id in parsed if deployment_id is not None}
+            statuses = dict(
+                self.db.query(Deployment.id, Deployment.status).filter(
+                    and_(Deployment.id.in_(ids), Deployment.cluster_id == cluster_id)
+                ).all()
+            ) if ids else {}
+            
+            stale = []
+            duplicates = []
+            deduplicated = set()
+            for member, score, deployment_id in parsed:
+                status = statuses.get(deployment_id)
+                if status == DeploymentStatus.PENDING:
+                    # Mid-schedule: queued in Redis just before the status commit
+                    continue
+                if status not in WAITING_STATUSES:
+                    stale.append(member)
+                    continue
+                
+                previous = kept.get(deployment_id)
+                if previous is None:
+                    kept[deployment_id] = (member, score)
+                elif previous[0] != member:
+                    # Scores age over time, so re-queueing can leave several members; keep the highest
+                    if score > previous[1]:
+                        duplicates.append(previous[0])
+                        kept[deployment_id] = (member, score)
+                    else:
+                        duplicates.append(member)
+                    deduplicated.add(deployment_id)
+            
+            counts["stale_found"] += len(stale)
+            counts["duplicates_found"] += len(duplicates)
+            if stale:
+                counts["stale_removed"] += self.redis_client.zrem(key, *stale)
+                stale_ids = {self._parse(member) for member in stale} - {None}
+                if stale_ids:
+                    self.redis_client.hdel(queue_index_key(cluster_id), *stale_ids)
+            if duplicates:
+                counts["duplicates_removed"] += self.redis_client.zrem(key, *duplicates)
+                # The index may still name a dropped member; point it at the one kept
+                self.redis_client.hset(queue_index_key(cluster_id), mapping={
+                    deployment_id: kept[deployment_id][0] for deployment_id in deduplicated
+                })
+            
+            if cursor == 0:
+                return set(kept)
+    
+    def _requeue_missing(self, cluster_id: int, queued_ids: Set[int], counts: Dict[str, int]) -> int:
+        """Keyset-scan waiting rows and put back any that are missing from Redis"""
+        requeued = 0
+        last_id = 0
+        
+        while True:
+            ids = [
+                row.id for row in self.db.query(Deployment.id).filter(
+                    and_(
+                        Deployment.cluster_id == cluster_id,
+                        Deployment.status.in_(WAITING_STATUSES),
+                        Deployment.id > last_id
+                    )
+                ).order_by(Deployment.id).limit(self.chunk)
+            ]
+            missing = [deployment_id for deployment_id in ids if deployment_id not in queued_ids]
+            
+            if missing:
+                counts["missing_found"] += len(missing)
+                for deployment in self.db.query(Deployment).filter(Deployment.id.in_(missing)):
+                    self.scheduler.add_to_queue(deployment)
+                    requeued += 1
+            
+            if len(ids) < self.chunk:
+                return requeued
+            last_id = ids[-1]
+    
+    def restore_cluster(self, cluster_id: int, state: SchedulerState) -> int:
+        """Requeue waiting deployments from journal-restored state that are missing from Redis"""
+        key = f"deployment_queue_{cluster_id}"
+        queued_ids = {self._parse(member) for member, _ in self.redis_client.zscan_iter(key, count=self.chunk)}
+        missing = [
+            deployment_id
+            for status in WAITING_STATUSES
+            for deployment_id in state.deployment_ids(cluster_id, status)
+            if deployment_id not in queued_ids
+        ]
+        if not missing:
+            return 0
+        
+        # Rows may have moved on since the restore was read
+        deployments = self.db.query(Deployment).filter(
+            and_(Deployment.id.in_(missing), Deployment.status.in_(WAITING_STATUSES))
+        ).all()
+        for deployment in deployments:
+            self.scheduler.add_to_queue(deployment)
+        return len(deployments)
+    
+    def reconcile_cluster(self, cluster_id: int) -> Dict[str, int]:
+        counts = {counter: 0 for counter in COUNTERS}
+        queued_ids = self._scan_queue(cluster_id, counts)
+        requeued = self._requeue_missing(cluster_id, queued_ids, counts)
+        counts["missing_requeued"] = requeued
+        
+        # Requeued work may fit right away instead of waiting for the next completion
+        if requeued:
+            self.scheduler.drain(cluster_id)
+        return counts
+    
+    def reconcile(self) -> Dict[str, int]:
+        """One pass over every cluster's queue"""
+        totals = {counter: 0 for counter in COUNTERS}
+        totals["passes"] = 1
+        for (cluster_id,) in self.db.query(Cluster.id).order_by(Cluster.id).all():
+            for counter, value in self.reconcile_cluster(cluster_id).items():
+                totals[counter] += value
+        
+        pipe = self.redis_client.pipeline()
+        for counter, value in totals.items():
+            if value:
+                pipe.hincrby(self.STATS_KEY, counter, value)
+        pipe.execute()
+        return totals
+    
+    def stats(self) -> Dict[str, int]:
+        """Return cumulative drift counters"""
+        raw = self.redis_client.hgetall(self.STATS_KEY)
+        return {counter: int(raw.get(counter.encode(), 0)) for counter in COUNTERS}
@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional
+import numpy as np
+from ..core.config import settings
+
+# Tolerance for accumulated floating point error in fit checks
+FIT_EPSILON = 1e-9
+
+# Built-in kinds are kept in their own columns; anything else lives in the *_extra_resources JSON
+BASE_RESOURCE_KINDS = ("ram", "cpu", "gpu")
+
+def resource_kinds() -> List[str]:
+    """All resource kinds in vector order"""
+    return list(BASE_RESOURCE_KINDS) + list(settings.EXTRA_RESOURCE_KINDS)
+
+def validate_extra_resources(extra: Dict[str, float]):
+    """Reject resource kinds that are not configured"""
+    unknown = set(extra or {}) - set(settings.EXTRA_RESOURCE_KINDS)
+    if unknown:
+        raise ValueError(f"Unknown resource kinds: {', '.join(sorted(unknown))}")
+
+def _vector(ram: float, cpu: float, gpu: int, extra: Dict[str, float]) -> np.ndarray:
+    extra = extra or {}
+    return np.array(
+        [ram or 0.0, cpu or 0.0, gpu or 0] + [extra.get(kind, 0.0) for kind in settings.EXTRA_RESOURCE_KINDS],
+        dtype=np.float64
+    )
+
+def required_vector(deployment) -> np.ndarray:
+    # Simulated deployments carry a precomputed vector
+    cached = getattr(deployment, "resource_vector", None)
+    if cached is not None:
+        return cached
+    return _vector(
+        deployment.required_ram_gb,
+        deployment.required_cpu_cores,
+        deployment.required_gpu_count,
+        deployment.required_extra_resources
+    )
+
+def available_vector(cluster) -> np.ndarray:
+    return _vector(
+        cluster.available_ram_gb,
+        cluster.available_cpu_cores,
+        cluster.available_gpu_count,
+        cluster.available_extra_resources
+    )
+
+def total_vector(cluster) -> np.ndarray:
+    return _vector(
+        cluster.total_ram_gb,
+        cluster.total_cpu_cores,
+        cluster.total_gpu_count,
+        cluster.total_extra_resources
+    )
+
+def resized_total_vector(
+    cluster,
+    ram: Optional[float] = None,
+    cpu: Optional[float] = None,
+    gpu: Optional[int] = None,
+    extra: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """A cluster's total vector with the given kinds replaced"""
+    return _vector(
+        cluster.total_ram_gb if ram is None else ram,
+        cluster.total_cpu_cores if cpu is None else cpu,
+        cluster.total_gpu_count if gpu is None else gpu,
+        {**(cluster.total_extra_resources or {}), **(extra or {})}
+    )
+
+def stack(vectors: List[np.ndarray]) -> np.ndarray:
+    """Stack vectors into an (n, kinds) matrix, keeping the shape for empty input"""
+    if not vectors:
+        return np.zeros((0, len(resource_kinds())), dtype=np.float64)
+    return np.vstack(vectors)
+
+def set_available(cluster, vector: np.ndarray):
+    """Write an availability vector back to a cluster"""
+    cluster.available_ram_gb = float(vector[0])
+    cluster.available_cpu_cores = float(vector[1])
+    cluster.available_gpu_count = int(round(vector[2]))
+    # Assign a new dict so the JSON column change is tracked
+    cluster.available_extra_resources = {
+        kind: float(value)
+        for kind, value in zip(settings.EXTRA_RESOURCE_KINDS, vector[len(BASE_RESOURCE_KINDS):])
+    }
+
+def set_total(cluster, vector: np.ndarray):
+    """Write a total-capacity vector back to a cluster"""
+    cluster.total_ram_gb = float(vector[0])
+    cluster.total_cpu_cores = float(vector[1])
+    cluster.total_gpu_count = int(round(vector[2]))
+    cluster.total_extra_resources = {
+        kind: float(value)
+        for kind, value in zip(settings.EXTRA_RESOURCE_KINDS, vector[len(BASE_RESOURCE_KINDS):])
+    }
+
+def fits(need: np.ndarray, available: np.ndarray) -> bool:
+    """Check that every resource kind in need is covered"""
+    return bool((available + FIT_EPSILON >= need).all())
+
+def fits_rows(need: np.ndarray, available: np.ndarray) -> np.ndarray:
+    """Fit check of one requirement against each row of an availability matrix"""
+    return (available + FIT_EPSILON >= need).all(axis=1)
+
+def covering_prefix(need: np.ndarray, available: np.ndarray, freed: np.ndarray) -> int:
+    """Smallest number of leading rows of freed that, added to available, covers need; -1 if none"""
+    if fits(need, available):
+        return 0
+    if not len(freed):
+        return -1
+    covered = fits_rows(need, available + np.cumsum(freed, axis=0))
+    if not covered.any():
+        return -1
+    return int(np.argmax(covered)) + 1
@@ -0,0 +1,39 @@
+from typing import Dict, Iterable, Optional
+from ..core.config import settings
+from .usage import sketch_bucket, sketch_percentile
+
+class RuntimeHistograms:
+    """Per-image run-duration sketches, updated incrementally as deployments complete"""
+    
+    KEY_PREFIX = "runtime_sketch_"
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+    
+    def _key(self, docker_image: str) -> str:
+        return f"{self.KEY_PREFIX}{docker_image}"
+    
+    def record(self, docker_image: str, duration_seconds: float):
+        self.redis_client.hincrby(self._key(docker_image), sketch_bucket(max(duration_seconds, 1.0)), 1)
+    
+    def load(self, docker_images: Iterable[str]) -> Dict[str, Dict[int, int]]:
+        """Bucket counts for several images in one round trip"""
+        images = sorted(set(docker_images))
+        pipe = self.redis_client.pipeline()
+        for image in images:
+            pipe.hgetall(self._key(image))
+        return {
+            image: {int(bucket): int(count) for bucket, count in raw.items()}
+            for image, raw in zip(images, pipe.execute())
+        }
+    
+    @staticmethod
+    def remaining(counts: Dict[int, int], elapsed_seconds: float) -> Optional[float]:
+        """Median remaining runtime of a run that has already lasted elapsed_seconds; None without enough history"""
+        if sum(counts.values()) < settings.RUNTIME_HISTOGRAM_MIN_SAMPLES:
+            return None
+        # Condition on the runs that lasted at least this long
+        longer = {bucket: count for bucket, count in counts.items() if bucket >= sketch_bucket(max(elapsed_seconds, 1.0))}
+        if not longer:
+            return 0.0
+        return max(sketch_percentile(longer, 0.5) - elapsed_seconds, 0.0)
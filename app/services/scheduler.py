@@ -1,191 +1,578 @@
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from ..models.deployment import Deployment, DeploymentStatus, DeploymentPriority
+from sqlalchemy import and_, case, func
+from sqlalchemy.exc import SQLAlchemyError
+from ..models.deployment import Deployment, DeploymentArchive, DeploymentStatus, DeploymentPriority, WAITING_STATUSES
 from ..models.cluster import Cluster
-import redis
 import json
+import logging
+import time
+import numpy as np
+from redis.commands.core import Script
 from ..core.config import settings
+from ..core.redis_client import get_redis_client
+from .image_locality import ImageLocalityIndex
+from .leases import LeaseManager
+from .usage import UsageTracker
+from .journal import SchedulerJournal
+from .timeseries import utilization_recorder
+from .preemption import PreemptionMetrics, preemption_allowed, resume_boost
+from .decision_trace import DecisionTrace, DecisionTraceStore
+from .runtimes import RuntimeHistograms
+from .priority_inheritance import PriorityInheritance, effective_priority
+from .resources import (
+    required_vector, available_vector, total_vector, set_available, set_total,
+    resized_total_vector, stack, fits, fits_rows, covering_prefix
+)
+
+logger = logging.getLogger(__name__)
+
+# Deadline deployments are ordered earliest-deadline-first above every priority tier
+EDF_TIER_BASE = 10_000_000_000
+
+# Swap a deployment's queue member for a new one; the index hash holds each deployment's current member
+ENQUEUE_SCRIPT = """
+local previous = redis.call('HGET', KEYS[2], ARGV[1])
+if previous then
+    redis.call('ZREM', KEYS[1], previous)
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+return 1
+"""
+
+def start_after_releases(need: np.ndarray, available: np.ndarray, finishing: list, now: float) -> Optional[float]:
+    """Earliest time need fits as running work finishes; finishing holds (end, freed) pairs in end order"""
+    if fits(need, available):
+        return now
+    count = covering_prefix(need, available, stack([freed for _, freed in finishing]))
+    if count < 0:
+        # Remaining capacity is held by deployments with no expected duration
+        return None
+    return max(finishing[count - 1][0], now)
+
+def waiting_misses_deadline(deployment, start: Optional[float]) -> bool:
+    if start is None:
+        return True
+    return start + (deployment.expected_duration_seconds or 0) > deployment.deadline.timestamp()
+
+def queue_index_key(cluster_id: int) -> str:
+    return f"deployment_queue_index_{cluster_id}"
+
+def victim_order(deployment: Deployment):
+    """Cheapest victims first: lowest priority, then the most recently started (least work lost)"""
+    return (effective_priority(deployment).value, -deployment.started_at.timestamp() if deployment.started_at else 0)
+
+def victim_order_by() -> tuple:
+    """victim_order as SQL ORDER BY clauses"""
+    # Priority columns store enum names
+    ranks = {priority.name: priority.value for priority in DeploymentPriority}
+    own = case(ranks, value=Deployment.priority)
+    inherited = func.coalesce(case(ranks, value=Deployment.inherited_priority), own)
+    return (
+        case((inherited > own, inherited), else_=own),
+        Deployment.started_at.desc().nulls_last(),
+        Deployment.id
+    )
 
 class DeploymentScheduler:
     def __init__(self, db: Session):
         self.db = db
-        self.redis_client = redis.from_url(settings.REDIS_URL)
+        self.redis_client = get_redis_client()
+        self.image_locality = ImageLocalityIndex(self.redis_client)
+        self.leases = LeaseManager(self.redis_client)
+        self.usage = UsageTracker(self.redis_client)
+        self.preemption_metrics = PreemptionMetrics(self.redis_client)
+        self.inheritance = PriorityInheritance(self)
+        self.journal = SchedulerJournal(db)
+        self.runtimes = RuntimeHistograms(self.redis_client)
+        self.enqueue_script = Script(None, ENQUEUE_SCRIPT.encode())
+        self.traces = DecisionTraceStore(self.redis_client)
+        # The decision in progress, if any
+        self.trace: Optional[DecisionTrace] = None
     
     def can_schedule_deployment(self, deployment: Deployment, cluster: Cluster) -> bool:
         """Check if deployment can be scheduled on cluster based on resources"""
+        if fits(required_vector(deployment), available_vector(cluster)):
+            return True
+        
+        return self.can_overcommit_deployment(deployment, cluster)
+    
+    def can_overcommit_deployment(self, deployment: Deployment, cluster: Cluster) -> bool:
+        """Check if deployment fits when running work is measured by observed p95 usage"""
+        ratio = cluster.overcommit_ratio or 1.0
+        if ratio <= 1.0:
+            return False
+        
+        # Only RAM and CPU (the first two kinds) are overcommitted; GPUs and extra kinds must fit
+        if not fits(required_vector(deployment)[2:], available_vector(cluster)[2:]):
+            return False
+        
+        # Requests stay bounded by the overcommit ratio
+        committed_ram = cluster.total_ram_gb - cluster.available_ram_gb
+        committed_cpu = cluster.total_cpu_cores - cluster.available_cpu_cores
+        if (
+            committed_ram + deployment.required_ram_gb > cluster.total_ram_gb * ratio or
+            committed_cpu + deployment.required_cpu_cores > cluster.total_cpu_cores * ratio
+        ):
+            return False
+        
+        # Observed usage of running work plus the newcomer's expected usage must fit physically
+        observed = self.usage.observed_usage(cluster.id)
+        running = self.db.query(
+            Deployment.id, Deployment.required_ram_gb, Deployment.required_cpu_cores
+        ).filter(
+            and_(
+                Deployment.cluster_id == cluster.id,
+                Deployment.status == DeploymentStatus.RUNNING
+            )
+        ).all()
+        used_ram = sum(observed.get(d.id, (d.required_ram_gb, 0))[0] for d in running)
+        used_cpu = sum(observed.get(d.id, (0, d.required_cpu_cores))[1] for d in running)
+        
+        expected_ram = deployment.required_ram_gb
+        expected_cpu = deployment.required_cpu_cores
+        estimate = self.usage.estimate(deployment.docker_image, deployment.user_id)
+        if estimate:
+            expected_ram = min(expected_ram, estimate[0])
+            expected_cpu = min(expected_cpu, estimate[1])
+        
         return (
-            cluster.available_ram_gb >= deployment.required_ram_gb and
-            cluster.available_cpu_cores >= deployment.required_cpu_cores and
-            cluster.available_gpu_count >= deployment.required_gpu_count
+            used_ram + expected_ram <= cluster.total_ram_gb and
+            used_cpu + expected_cpu <= cluster.total_cpu_cores
         )
     
+    def select_cluster(self, deployment: Deployment, organization_id: int) -> Optional[Cluster]:
+        """Pick a cluster for deployment, preferring clusters where its image is warm"""
+        clusters = self.db.query(Cluster).filter(
+            Cluster.organization_id == organization_id
+        ).all()
+        
+        need = required_vector(deployment)
+        large_enough = fits_rows(need, stack([total_vector(c) for c in clusters]))
+        candidates = [c for c, ok in zip(clusters, large_enough) if ok]
+        if not candidates:
+            return None
+        
+        fits_now = fits_rows(need, stack([available_vector(c) for c in candidates]))
+        locality = self.image_locality.weights(deployment.docker_image)
+        
+        def placement_score(index: int):
+            # Clusters that fit right now always win; locality is weighed against headroom
+            cluster = candidates[index]
+            headroom = 0.0
+            if cluster.total_ram_gb > 0:
+                headroom = (cluster.available_ram_gb - deployment.required_ram_gb) / cluster.total_ram_gb
+            weighted = locality.get(cluster.id, 0.0) * settings.IMAGE_LOCALITY_WEIGHT + headroom
+            schedulable = bool(fits_now[index]) or self.can_overcommit_deployment(deployment, cluster)
+            return (schedulable, weighted)
+        
+        return candidates[max(range(len(candidates)), key=placement_score)]
+    
     def check_dependencies(self, deployment: Deployment) -> bool:
         """Check if deployment dependencies are satisfied"""
         if not deployment.depends_on_deployment_id:
             return True
         
-        dependency = self.db.query(Deployment).filter(
+        status = self.db.query(Deployment.status).filter(
             Deployment.id == deployment.depends_on_deployment_id
-        ).first()
+        ).scalar()
         
-        return dependency and dependency.status == DeploymentStatus.COMPLETED
+        if status is None:
+            # Finished parents may already have been archived
+            status = self.db.query(DeploymentArchive.status).filter(
+                DeploymentArchive.id == deployment.depends_on_deployment_id
+            ).scalar()
+        
+        return status == DeploymentStatus.COMPLETED
     
     def get_priority_score(self, deployment: Deployment) -> int:
         """Calculate priority score for deployment"""
-        base_score = deployment.priority.value * 1000
+        if deployment.deadline:
+            # Earlier deadlines score higher and always rank above non-deadline work
+            return EDF_TIER_BASE - deployment.deadline.timestamp()
+        
+        # Ancestors of urgent work are scored as urgently as the work waiting on them
+        base_score = effective_priority(deployment).value * 1000
         
         # Add time-based urgency (older deployments get higher priority)
-        import time
         age_hours = (time.time() - deployment.created_at.timestamp()) / 3600
         urgency_bonus = min(age_hours * 10, 100)  # Max 100 bonus points
         
-        return base_score + urgency_bonus
+        return base_score + urgency_bonus + resume_boost(deployment)
     
-    def find_preemptable_deployments(self, cluster: Cluster, required_resources: dict) -> List[Deployment]:
-        """Find running deployments that can be preempted to free resources"""
-        running_deployments = self.db.query(Deployment).filter(
+    def estimate_start_time(self, deployment: Deployment, cluster: Cluster) -> Optional[float]:
+        """Estimate when a deadline deployment could start without preemption"""
+        need = required_vector(deployment)
+        
+        # Queued deadline work with an earlier deadline is served first
+        ahead_query = self.db.query(Deployment).filter(
             and_(
                 Deployment.cluster_id == cluster.id,
-                Deployment.status == DeploymentStatus.RUNNING
+                Deployment.status == DeploymentStatus.QUEUED,
+                Deployment.deadline.isnot(None),
+                Deployment.deadline < deployment.deadline
             )
-        ).all()
+        )
+        if deployment.id is not None:
+            ahead_query = ahead_query.filter(Deployment.id != deployment.id)
+        need = need + stack([required_vector(d) for d in ahead_query.all()]).sum(axis=0)
         
-        # Sort by priority (lowest first) and start time (newest first)
-        running_deployments.sort(
-            key=lambda d: (d.priority.value, -d.started_at.timestamp() if d.started_at else 0)
+        available = available_vector(cluster)
+        now = time.time()
+        if fits(need, available):
+            return now
+        
+        # Walk running deployments in order of expected completion
+        running = self.db.query(Deployment).filter(
+            and_(
+                Deployment.cluster_id == cluster.id,
+                Deployment.status == DeploymentStatus.RUNNING,
+                Deployment.expected_duration_seconds.isnot(None),
+                Deployment.started_at.isnot(None)
+            )
+        ).all()
+        finishing = sorted(
+            ((d.started_at.timestamp() + d.expected_duration_seconds, required_vector(d)) for d in running),
+            key=lambda release: release[0]
         )
+        return start_after_releases(need, available, finishing, now)
+    
+    def deadline_requires_preemption(self, deployment: Deployment, cluster: Cluster) -> bool:
+        """Check if waiting for capacity would make a deployment miss its deadline"""
+        return waiting_misses_deadline(deployment, self.estimate_start_time(deployment, cluster))
+    
+    def check_deadline_feasibility(self, deployment: Deployment, cluster: Cluster) -> bool:
+        """Check if a deadline can be met given current load and queue"""
+        duration = deployment.expected_duration_seconds or 0
+        if time.time() + duration > deployment.deadline.timestamp():
+            return False
         
-        preemptable = []
-        freed_ram = 0
-        freed_cpu = 0
-        freed_gpu = 0
+        if not self.deadline_requires_preemption(deployment, cluster):
+            return True
         
-        for deployment in running_deployments:
-            preemptable.append(deployment)
-            freed_ram += deployment.required_ram_gb
-            freed_cpu += deployment.required_cpu_cores
-            freed_gpu += deployment.required_gpu_count
-            
-            # Check if we have enough resources now
-            if (
-                cluster.available_ram_gb + freed_ram >= required_resources['ram'] and
-                cluster.available_cpu_cores + freed_cpu >= required_resources['cpu'] and
-                cluster.available_gpu_count + freed_gpu >= required_resources['gpu']
-            ):
-                break
+        return self.plan_preemption(deployment, cluster, max_priority=deployment.priority) is not None
+    
+    def select_victims(
+        self,
+        running_deployments: list,
+        required: np.ndarray,
+        available: np.ndarray,
+        max_priority: Optional[DeploymentPriority] = None
+    ) -> list:
+        """Order preemption candidates and keep the shortest prefix that frees enough resources"""
+        # Deployments admitted with a deadline are never preempted, nor are ones protected from thrashing
+        now = time.time()
+        candidates = [
+            d for d in running_deployments
+            if d.deadline is None and (max_priority is None or effective_priority(d).value <= max_priority.value)
+            and preemption_allowed(d, now)
+        ]
+        
+        # Sort by priority (lowest first) and start time (newest first)
+        candidates.sort(key=victim_order)
+        if self.trace is not None:
+            self.trace.candidates = candidates
         
-        return preemptable
+        # Shortest prefix of victims whose cumulative resources cover the requirement
+        freed = stack([required_vector(d) for d in candidates])
+        count = covering_prefix(required, available, freed)
+        if count < 0:
+            return candidates
+        return candidates[:count]
+    
+    def plan_preemption(
+        self,
+        deployment: Deployment,
+        cluster: Cluster,
+        max_priority: Optional[DeploymentPriority] = None
+    ) -> Optional[List[Deployment]]:
+        """Return victims whose preemption frees enough resources, or None"""
+        need = required_vector(deployment)
+        running = self.db.query(Deployment).filter(
+            and_(
+                Deployment.cluster_id == cluster.id,
+                Deployment.status == DeploymentStatus.RUNNING
+            )
+        ).all()
+        return self.covering_victims(need, available_vector(cluster), running, max_priority)
+    
+    def covering_victims(
+        self,
+        need: np.ndarray,
+        available: np.ndarray,
+        running: list,
+        max_priority: Optional[DeploymentPriority] = None
+    ) -> Optional[list]:
+        """Victims among running whose preemption frees enough for need, or None"""
+        preemptable = self.select_victims(running, need, available, max_priority)
+        if not preemptable:
+            return None
+        
+        # Check if preemption would help
+        freed = stack([required_vector(d) for d in preemptable]).sum(axis=0)
+        if fits(need, available + freed):
+            return preemptable
+        return None
+    
+    def preemption_policy(self, deployment, deadline_at_risk: Callable[[], bool]) -> Tuple[Optional[str], Optional[DeploymentPriority]]:
+        """Why a deployment may not preempt (None when it may), and the highest priority it may evict"""
+        priority = effective_priority(deployment)
+        if deployment.deadline:
+            # Deadline deployments preempt only when waiting would miss the deadline
+            if not deadline_at_risk():
+                return "deadline_met_by_waiting", None
+            return None, priority
+        if priority.value >= DeploymentPriority.HIGH.value:
+            # High-priority deployments may preempt anything of any priority
+            return None, None
+        return "priority_too_low", None
     
     def preempt_deployments(self, deployments: List[Deployment]):
         """Preempt running deployments"""
+        now = time.time()
         for deployment in deployments:
+            self.preemption_metrics.record_preemption(deployment, now)
             deployment.status = DeploymentStatus.PREEMPTED
             deployment.completed_at = None
+            deployment.preemption_count = (deployment.preemption_count or 0) + 1
             
             # Free up resources
-            cluster = deployment.cluster
-            cluster.available_ram_gb += deployment.required_ram_gb
-            cluster.available_cpu_cores += deployment.required_cpu_cores
-            cluster.available_gpu_count += deployment.required_gpu_count
+            self.release_resources(deployment)
+            self.leases.release(deployment.id)
             
-            # Add back to queue
+            # Back in the queue, boosted so it resumes ahead of its priority peers
             self.add_to_queue(deployment)
         
         self.db.commit()
     
     def allocate_resources(self, deployment: Deployment, cluster: Cluster):
         """Allocate resources for deployment"""
-        cluster.available_ram_gb -= deployment.required_ram_gb
-        cluster.available_cpu_cores -= deployment.required_cpu_cores
-        cluster.available_gpu_count -= deployment.required_gpu_count
+        set_available(cluster, available_vector(cluster) - required_vector(deployment))
+        if deployment.status == DeploymentStatus.PREEMPTED:
+            self.preemption_metrics.record_resume()
         
         deployment.status = DeploymentStatus.RUNNING
         deployment.scheduled_at = func.now()
         deployment.started_at = func.now()
         
         self.db.commit()
+        
+        self.leases.grant(deployment.id, deployment.cluster_id)
+        self.image_locality.record(deployment.docker_image, cluster.id)
+        self.record_utilization(cluster)
+    
+    def resize_cluster(
+        self,
+        cluster_id: int,
+        ram: Optional[float] = None,
+        cpu: Optional[float] = None,
+        gpu: Optional[int] = None,
+        extra: Optional[Dict[str, float]] = None
+    ) -> List[Deployment]:
+        """Set the given kinds of a cluster's total capacity, moving availability by the same delta; return the preempted victims"""
+        # Row lock, so concurrent resizes apply their deltas one after another
+        cluster = self.db.query(Cluster).filter(
+            Cluster.id == cluster_id
+        ).with_for_update().populate_existing().one()
+        
+        # Omitted kinds keep the totals of the locked row, not of an earlier read
+        totals = resized_total_vector(cluster, ram, cpu, gpu, extra)
+        before = available_vector(cluster)
+        delta = totals - total_vector(cluster)
+        set_total(cluster, totals)
+        set_available(cluster, before + delta)
+        
+        # Only a shrink past the free capacity costs anything; overcommitted kinds may not get worse than before
+        floor = np.minimum(before, 0)
+        victims = []
+        if not fits(floor, before + delta):
+            victims = self.shrink_victims(cluster, floor, before + delta)
+        
+        if victims:
+            self.preempt_deployments(victims)
+        else:
+            self.db.commit()
+        self.record_utilization(cluster)
+        
+        # Growth may let queued work start right away
+        if (delta > 0).any():
+            self.drain(cluster.id)
+        return victims
+    
+    def shrink_victims(self, cluster: Cluster, floor: np.ndarray, available: np.ndarray) -> List[Deployment]:
+        """Cheapest running deployments whose release brings availability back up to floor"""
+        # Read running deployments cheapest first and stop once they cover the shortfall,
+        # so the work follows the size of the resize rather than of the cluster
+        query = self.db.query(Deployment).filter(
+            and_(
+                Deployment.cluster_id == cluster.id,
+                Deployment.status == DeploymentStatus.RUNNING
+            )
+        ).order_by(*victim_order_by())
+        
+        running = []
+        while True:
+            page = query.offset(len(running)).limit(settings.SHRINK_VICTIM_BATCH).all()
+            running.extend(page)
+            victims = self.select_victims(running, floor, available)
+            if fits(floor, available + stack([required_vector(d) for d in victims]).sum(axis=0)):
+                return victims
+            if len(page) < settings.SHRINK_VICTIM_BATCH:
+                break
+        
+        # The capacity is gone either way, so protected deployments are preempted when the others do not suffice
+        count = covering_prefix(floor, available, stack([required_vector(d) for d in running]))
+        return running if count < 0 else running[:count]
+    
+    def release_resources(self, deployment: Deployment):
+        """Return a deployment's resources to its cluster"""
+        cluster = deployment.cluster
+        set_available(cluster, available_vector(cluster) + required_vector(deployment))
+        
+        self.usage.forget(deployment.id, cluster.id)
+        # Callers commit the release, so only sample here and leave flushing to the next allocation;
+        # the cached organization capacity is dropped when that commit lands
+        utilization_recorder.record(cluster)
+    
+    def record_utilization(self, cluster: Cluster):
+        """Sample cluster utilization and flush rollups when due"""
+        utilization_recorder.record(cluster)
+        if utilization_recorder.flush_due():
+            flush_db = Session(bind=self.db.get_bind())
+            try:
+                utilization_recorder.flush(flush_db)
+            except SQLAlchemyError:
+                # The allocation is already committed; unflushed samples stay buffered for the next flush
+                logger.warning("Could not flush utilization samples", exc_info=True)
+            finally:
+                flush_db.close()
     
     def add_to_queue(self, deployment: Deployment):
         """Add deployment to Redis queue with priority"""
         queue_data = {
             'deployment_id': deployment.id,
             'priority_score': self.get_priority_score(deployment),
-            'cluster_id': deployment.cluster_id
+            'cluster_id': deployment.cluster_id,
+            # Lets queue-position sum the demand ahead without touching the database
+            'demand': required_vector(deployment).tolist()
         }
         
-        # Use sorted set for priority queue
-        self.redis_client.zadd(
-            f"deployment_queue_{deployment.cluster_id}",
-            {json.dumps(queue_data): queue_data['priority_score']}
+        # Use sorted set for priority queue; scores age, so the deployment's previous member is replaced, not kept
+        self.enqueue_script(
+            keys=[f"deployment_queue_{deployment.cluster_id}", queue_index_key(deployment.cluster_id)],
+            args=[deployment.id, json.dumps(queue_data), queue_data['priority_score']],
+            client=self.redis_client
         )
     
+    def submit(self, deployment: Deployment) -> bool:
+        """Schedule a new deployment now, or queue it for its cluster's scheduler worker"""
+        if settings.SCHEDULER_MODE != "sharded":
+            return self.schedule_deployment(deployment)
+        
+        deployment.status = DeploymentStatus.QUEUED
+        self.add_to_queue(deployment)
+        self.db.commit()
+        return False
+    
+    def drain(self, cluster_id: int):
+        """Process a cluster's queue now, unless its leader worker owns that"""
+        if settings.SCHEDULER_MODE != "sharded":
+            self.process_queue(cluster_id)
+    
     def schedule_deployment(self, deployment: Deployment) -> bool:
-        """Attempt to schedule a deployment"""
+        """Attempt to schedule a deployment, recording a trace of the decision"""
+        trace = self.trace = DecisionTrace()
+        try:
+            return self.decide(deployment, trace)
+        finally:
+            self.trace = None
+            self.traces.record(deployment.id, trace)
+    
+    def decide(self, deployment: Deployment, trace: DecisionTrace) -> bool:
         cluster = self.db.query(Cluster).filter(Cluster.id == deployment.cluster_id).first()
+        trace.mark("lookup")
         if not cluster:
+            trace.outcome = "blocked"
+            trace.block("cluster_missing")
             return False
         
         # Check dependencies
-        if not self.check_dependencies(deployment):
+        satisfied = self.check_dependencies(deployment)
+        trace.mark("dependencies")
+        if not satisfied:
+            trace.outcome = "blocked"
+            trace.block("dependency")
             return False
         
         # Check if resources are available
+        need = required_vector(deployment)
+        available = available_vector(cluster)
         if self.can_schedule_deployment(deployment, cluster):
+            trace.overcommit = not fits(need, available)
+            trace.mark("fit")
             self.allocate_resources(deployment, cluster)
+            trace.outcome = "scheduled"
+            trace.mark("allocate")
             return True
+        trace.block("resources", need, available)
+        trace.mark("fit")
         
-        # Try preemption for high-priority deployments
-        if deployment.priority.value >= DeploymentPriority.HIGH.value:
-            required_resources = {
-                'ram': deployment.required_ram_gb,
-                'cpu': deployment.required_cpu_cores,
-                'gpu': deployment.required_gpu_count
-            }
-            
-            preemptable = self.find_preemptable_deployments(cluster, required_resources)
-            if preemptable:
-                # Check if preemption would help
-                total_freed_ram = sum(d.required_ram_gb for d in preemptable)
-                total_freed_cpu = sum(d.required_cpu_cores for d in preemptable)
-                total_freed_gpu = sum(d.required_gpu_count for d in preemptable)
-                
-                if (
-                    cluster.available_ram_gb + total_freed_ram >= deployment.required_ram_gb and
-                    cluster.available_cpu_cores + total_freed_cpu >= deployment.required_cpu_cores and
-                    cluster.available_gpu_count + total_freed_gpu >= deployment.required_gpu_count
-                ):
-                    self.preempt_deployments(preemptable)
-                    self.allocate_resources(deployment, cluster)
-                    return True
-        
-        # Add to queue if cannot schedule immediately
-        deployment.status = DeploymentStatus.QUEUED
+        skipped, max_priority = self.preemption_policy(
+            deployment, lambda: self.deadline_requires_preemption(deployment, cluster)
+        )
+        preemptable = None
+        if skipped is None:
+            preemptable = self.plan_preemption(deployment, cluster, max_priority=max_priority)
+        trace.consider(preemptable, skipped)
+        trace.mark("preemption")
+        
+        if preemptable:
+            self.preempt_deployments(preemptable)
+            self.allocate_resources(deployment, cluster)
+            trace.outcome = "scheduled"
+            trace.mark("allocate")
+            return True
+        
+        # Add to queue if cannot schedule immediately; preempted work stays marked as such until it resumes
+        if deployment.status != DeploymentStatus.PREEMPTED:
+            deployment.status = DeploymentStatus.QUEUED
         self.add_to_queue(deployment)
         self.db.commit()
+        trace.outcome = "queued"
+        trace.mark("queue")
         return False
     
-    def process_queue(self, cluster_id: int):
-        """Process the deployment queue for a cluster"""
+    def process_queue(self, cluster_id: int) -> int:
+        """Process the deployment queue for a cluster; return how many scheduling decisions were made"""
         queue_key = f"deployment_queue_{cluster_id}"
         
+        decisions = 0
+        
         # Get highest priority deployments
         queue_items = self.redis_client.zrevrange(queue_key, 0, -1, withscores=True)
         
-        for item_data, score in queue_items:
-            queue_data = json.loads(item_data)
-            deployment_id = queue_data['deployment_id']
-            
-            deployment = self.db.query(Deployment).filter(
-                Deployment.id == deployment_id
-            ).first()
-            
-            if not deployment or deployment.status != DeploymentStatus.QUEUED:
-                # Remove from queue if deployment no longer exists or status changed
-                self.redis_client.zrem(queue_key, item_data)
-                continue
-            
-            # Try to schedule
-            if self.schedule_deployment(deployment):
-                # Remove from queue if successfully scheduled
-                self.redis_client.zrem(queue_key, item_data) 
\ No newline at end of file
+        # One round trip stores the traces of the whole pass
+        with self.traces.batch():
+            for item_data, score in queue_items:
+                queue_data = json.loads(item_data)
+                deployment_id = queue_data['deployment_id']
+                
+                deployment = self.db.query(Deployment).filter(
+                    Deployment.id == deployment_id
+                ).first()
+                
+                if not deployment or deployment.status not in WAITING_STATUSES:
+                    # Remove from queue if deployment no longer exists or status changed
+                    self.redis_client.zrem(queue_key, item_data)
+                    self.redis_client.hdel(queue_index_key(cluster_id), deployment_id)
+                    continue
+                
+                # Try to schedule
+                decisions += 1
+                if self.schedule_deployment(deployment):
+                    # Remove from queue if successfully scheduled
+                    self.redis_client.zrem(queue_key, item_data)
+                    self.redis_client.hdel(queue_index_key(cluster_id), deployment_id)
+        
+        return decisions 
\ No newline at end of file
@@ -0,0 +1,86 @@
+from typing import Optional, Tuple
+from datetime import datetime, timezone
+import hashlib
+import hmac
+import secrets
+import time
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.credential import ServiceCredential
+from .cache import entity_key, service_key_cache, service_key_miss_cache
+
+SIGNATURE_KEY_PREFIX = "service_signature_"
+
+def string_to_sign(timestamp: str, method: str, path: str, body: bytes) -> bytes:
+    return "\n".join([timestamp, method.upper(), path, hashlib.sha256(body).hexdigest()]).encode()
+
+def sign(secret: str, timestamp: str, method: str, path: str, body: bytes = b"") -> str:
+    """Hex HMAC-SHA256 signature an executor sends in X-Service-Signature"""
+    return hmac.new(secret.encode(), string_to_sign(timestamp, method, path, body), hashlib.sha256).hexdigest()
+
+def issue_credential(db: Session, cluster_id: int, user_id: int) -> ServiceCredential:
+    credential = ServiceCredential(
+        key_id=f"svc_{secrets.token_hex(8)}",
+        secret=secrets.token_urlsafe(32),
+        cluster_id=cluster_id,
+        created_by=user_id
+    )
+    db.add(credential)
+    db.commit()
+    db.refresh(credential)
+    return credential
+
+def revoke_credential(db: Session, credential: ServiceCredential):
+    # The commit publishes an invalidation, so every worker drops the key at once
+    credential.revoked_at = datetime.now(timezone.utc)
+    db.commit()
+
+def lookup_key(db: Session, key_id: str) -> Optional[Tuple[str, int]]:
+    """(secret, cluster_id) for an active key, from the in-process key table when possible"""
+    entry = service_key_cache.get(key_id)
+    if entry is not None:
+        return entry
+    # Misses live in their own short-lived table, so random key ids cannot push out valid keys
+    if service_key_miss_cache.get(key_id) is not None:
+        return None
+    
+    credential = db.query(ServiceCredential).filter(ServiceCredential.key_id == key_id).first()
+    if credential is None or credential.revoked_at is not None:
+        tags = [entity_key(credential)] if credential is not None else []
+        service_key_miss_cache.set(key_id, True, tags=tags)
+        return None
+    entry = (credential.secret, credential.cluster_id)
+    service_key_cache.set(key_id, entry, tags=[entity_key(credential)])
+    return entry
+
+def verify_request(
+    db: Session,
+    redis_client,
+    key_id: str,
+    timestamp: str,
+    signature: str,
+    method: str,
+    path: str,
+    body: bytes
+) -> int:
+    """Check a signed, not previously seen executor request and return the cluster its key is scoped to"""
+    try:
+        skew = abs(time.time() - float(timestamp))
+    except ValueError:
+        raise ValueError("Invalid service timestamp")
+    if skew > settings.SERVICE_AUTH_MAX_SKEW_SECONDS:
+        raise ValueError("Service timestamp outside the allowed window")
+    
+    entry = lookup_key(db, key_id)
+    if entry is None:
+        raise ValueError("Unknown or revoked service key")
+    secret, cluster_id = entry
+    
+    if not hmac.compare_digest(sign(secret, timestamp, method, path, body), signature):
+        raise ValueError("Invalid service signature")
+    
+    # A timestamp is accepted up to the skew either side of now, so a signature stays usable for twice the skew
+    replay_key = f"{SIGNATURE_KEY_PREFIX}{key_id}:{signature}"
+    if not redis_client.set(replay_key, 1, nx=True, ex=2 * settings.SERVICE_AUTH_MAX_SKEW_SECONDS):
+        raise ValueError("Replayed service request")
+    return cluster_id
@@ -0,0 +1,199 @@
+from typing import Iterable, List, Optional, Set
+import bisect
+import hashlib
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from redis import RedisError
+from redis.commands.core import Script
+from sqlalchemy.exc import SQLAlchemyError
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.redis_client import get_redis_client
+from ..models.cluster import Cluster
+from .reconciler import QueueReconciler
+# Registers the post-commit capacity cache invalidation in worker processes too
+from . import capacity
+from .scheduler import DeploymentScheduler
+
+logger = logging.getLogger(__name__)
+
+# Extend or drop a lease only while we still hold it
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+class HashRing:
+    """Consistent-hash ring of scheduler workers; a joining or leaving worker only moves its own share"""
+    
+    def __init__(self, workers: Iterable[str], replicas: Optional[int] = None):
+        replicas = replicas or settings.SCHEDULER_RING_REPLICAS
+        points = sorted((_hash(f"{worker}#{i}"), worker) for worker in set(workers) for i in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.workers = [worker for _, worker in points]
+    
+    def owner(self, cluster_id: int) -> Optional[str]:
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, _hash(f"cluster:{cluster_id}")) % len(self.hashes)
+        return self.workers[index]
+
+class WorkerRegistry:
+    """Live scheduler workers, kept in a Redis sorted set scored by last heartbeat"""
+    
+    KEY = "scheduler_workers"
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+    
+    def heartbeat(self, worker_id: str):
+        self.redis_client.zadd(self.KEY, {worker_id: time.time()})
+    
+    def leave(self, worker_id: str):
+        self.redis_client.zrem(self.KEY, worker_id)
+    
+    def live(self) -> List[str]:
+        # Workers that stopped heartbeating drop out, and their clusters move to the survivors
+        self.redis_client.zremrangebyscore(self.KEY, "-inf", time.time() - settings.SCHEDULER_WORKER_TTL_SECONDS)
+        return [worker.decode() for worker in self.redis_client.zrange(self.KEY, 0, -1)]
+
+class LeaderLease:
+    """Short-lived per-cluster leadership; only the holder drains that cluster's queue"""
+    
+    KEY_PREFIX = "scheduler_leader_"
+    
+    def __init__(self, redis_client, worker_id: str):
+        self.redis_client = redis_client
+        self.worker_id = worker_id
+        self.ttl_ms = settings.SCHEDULER_LEASE_TTL_SECONDS * 1000
+        self.renew_script = Script(None, RENEW_SCRIPT.encode())
+        self.release_script = Script(None, RELEASE_SCRIPT.encode())
+    
+    def _key(self, cluster_id: int) -> str:
+        return f"{self.KEY_PREFIX}{cluster_id}"
+    
+    def acquire(self, cluster_id: int) -> bool:
+        """Take the lease if it is free, or extend it if we already hold it"""
+        if self.redis_client.set(self._key(cluster_id), self.worker_id, nx=True, px=self.ttl_ms):
+            return True
+        return self.renew(cluster_id)
+    
+    def renew(self, cluster_id: int) -> bool:
+        return bool(self.renew_script(
+            keys=[self._key(cluster_id)], args=[self.worker_id, self.ttl_ms], client=self.redis_client
+        ))
+    
+    def release(self, cluster_id: int):
+        self.release_script(keys=[self._key(cluster_id)], args=[self.worker_id], client=self.redis_client)
+    
+    def holder(self, cluster_id: int) -> Optional[str]:
+        holder = self.redis_client.get(self._key(cluster_id))
+        return holder.decode() if holder else None
+
+class SchedulerWorker:
+    """Drains the queues of the clusters this worker owns on the hash ring and holds the lease for"""
+    
+    def __init__(self, worker_id: Optional[str] = None, redis_client=None, session_factory=SessionLocal):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.redis_client = redis_client or get_redis_client()
+        self.session_factory = session_factory
+        self.registry = WorkerRegistry(self.redis_client)
+        self.lease = LeaderLease(self.redis_client, self.worker_id)
+        self.led: Set[int] = set()
+        self.decisions = 0
+        self._stop = threading.Event()
+    
+    def rebalance(self, cluster_ids: Iterable[int]) -> Set[int]:
+        """Hand off clusters that moved to another worker and claim the ones that moved here"""
+        ring = HashRing(self.registry.live())
+        owned = {cluster_id for cluster_id in cluster_ids if ring.owner(cluster_id) == self.worker_id}
+        for cluster_id in self.led - owned:
+            self.lease.release(cluster_id)
+        # A cluster whose previous owner has not let go yet is claimed on a later tick
+        self.led = {cluster_id for cluster_id in owned if self.lease.acquire(cluster_id)}
+        return self.led
+    
+    def tick(self) -> int:
+        """One pass: heartbeat, rebalance, then drain every led queue; return the decisions made"""
+        self.registry.heartbeat(self.worker_id)
+        db = self.session_factory()
+        try:
+            previous = set(self.led)
+            self.rebalance(cluster_id for (cluster_id,) in db.query(Cluster.id).all())
+            scheduler = DeploymentScheduler(db)
+            # Start-up and hand-offs: queues may have been lost with Redis or the previous owner
+            claimed = self.led - previous
+            if claimed:
+                self.restore_queues(scheduler, claimed)
+            decisions = 0
+            for cluster_id in sorted(self.led):
+                # Leases were just acquired or renewed, but a long drain can outlive one
+                if not self.lease.renew(cluster_id):
+                    self.led.discard(cluster_id)
+                    continue
+                decisions += scheduler.process_queue(cluster_id)
+            self.decisions += decisions
+            return decisions
+        finally:
+            db.close()
+    
+    def restore_queues(self, scheduler: DeploymentScheduler, cluster_ids: Set[int]) -> int:
+        """Rebuild newly led queues from the latest journal snapshot plus the journal tail"""
+        state = scheduler.journal.restore()
+        reconciler = QueueReconciler(scheduler)
+        restored = 0
+        for cluster_id in sorted(cluster_ids):
+            restored += reconciler.restore_cluster(cluster_id, state)
+        if restored:
+            logger.info("Worker %s requeued %d deployments from the journal", self.worker_id, restored)
+        return restored
+    
+    def stop(self):
+        self._stop.set()
+    
+    def shutdown(self):
+        """Give up every lease and leave the ring so the survivors take over at once"""
+        for cluster_id in self.led:
+            self.lease.release(cluster_id)
+        self.led = set()
+        self.registry.leave(self.worker_id)
+    
+    def run(self):
+        logger.info("Scheduler worker %s started", self.worker_id)
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    self.tick()
+                except (RedisError, SQLAlchemyError):
+                    logger.exception("Scheduler worker tick failed")
+                self._stop.wait(max(0.0, settings.SCHEDULER_POLL_SECONDS - (time.monotonic() - started)))
+        finally:
+            self.shutdown()
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    worker = SchedulerWorker()
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+if __name__ == "__main__":
+    main()
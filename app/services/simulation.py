@@ -0,0 +1,317 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import copy
+import heapq
+import time
+import numpy as np
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment, DeploymentStatus, DeploymentPriority, WAITING_STATUSES
+from .resources import (
+    resource_kinds, required_vector, available_vector, total_vector,
+    stack, fits, fits_rows
+)
+from .scheduler import DeploymentScheduler, start_after_releases, waiting_misses_deadline
+
+# Scheduler behaviour the simulation does not reproduce, reported with every result
+UNMODELLED = (
+    "usage-based overcommit: jobs start only when their requests fit",
+    "dependencies: queued deployments are treated as runnable",
+    "preemption while draining the queue: freed capacity only starts work that fits",
+    "priority inheritance changes during the simulated run"
+)
+
+class SimulatedDeployment:
+    """Detached stand-in for a Deployment that the scheduler decision logic can read"""
+    
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        resource_vector: np.ndarray,
+        priority: DeploymentPriority,
+        created_at: datetime,
+        expected_duration_seconds: Optional[int],
+        deadline: Optional[datetime] = None,
+        started_at: Optional[datetime] = None,
+        job_index: Optional[int] = None,
+        preemption_count: int = 0,
+        inherited_priority: Optional[DeploymentPriority] = None
+    ):
+        self.id = id
+        self.name = name
+        self.resource_vector = resource_vector
+        self.priority = priority
+        self.created_at = created_at
+        self.expected_duration_seconds = expected_duration_seconds
+        self.deadline = deadline
+        self.started_at = started_at
+        self.preemption_count = preemption_count
+        self.inherited_priority = inherited_priority
+        # Position in the hypothetical job list, None for existing deployments
+        self.job_index = job_index
+    
+    @classmethod
+    def from_deployment(cls, deployment: Deployment) -> "SimulatedDeployment":
+        return cls(
+            id=deployment.id,
+            name=deployment.name,
+            resource_vector=required_vector(deployment),
+            priority=deployment.priority,
+            created_at=deployment.created_at or datetime.now(timezone.utc),
+            expected_duration_seconds=deployment.expected_duration_seconds,
+            deadline=deployment.deadline,
+            started_at=deployment.started_at,
+            preemption_count=deployment.preemption_count or 0,
+            inherited_priority=deployment.inherited_priority
+        )
+
+class ClusterSnapshot:
+    """Read-only view of a cluster's capacity, running work and queue"""
+    
+    def __init__(self, cluster: Cluster, running: List[SimulatedDeployment], queued: List[SimulatedDeployment]):
+        self.cluster_id = cluster.id
+        self.total = total_vector(cluster)
+        self.available = available_vector(cluster)
+        self.total.flags.writeable = False
+        self.available.flags.writeable = False
+        self.running = tuple(running)
+        self.queued = tuple(queued)
+    
+    @classmethod
+    def load(cls, db: Session, cluster: Cluster) -> "ClusterSnapshot":
+        deployments = db.query(Deployment).filter(
+            and_(
+                Deployment.cluster_id == cluster.id,
+                Deployment.status.in_((DeploymentStatus.RUNNING,) + WAITING_STATUSES)
+            )
+        ).all()
+        running = [SimulatedDeployment.from_deployment(d) for d in deployments if d.status == DeploymentStatus.RUNNING]
+        queued = [SimulatedDeployment.from_deployment(d) for d in deployments if d.status in WAITING_STATUSES]
+        return cls(cluster, running, queued)
+
+class SimulationState:
+    """Copy-on-write scheduler state layered over a ClusterSnapshot"""
+    
+    def __init__(self, snapshot: ClusterSnapshot):
+        self.snapshot = snapshot
+        self.total = snapshot.total
+        self._available = snapshot.available
+        self._running = snapshot.running
+        self._owns_available = False
+        self._owns_running = False
+    
+    @property
+    def available(self) -> np.ndarray:
+        return self._available
+    
+    @property
+    def running(self):
+        return self._running
+    
+    def _mutable_available(self) -> np.ndarray:
+        if not self._owns_available:
+            self._available = self._available.copy()
+            self._owns_available = True
+        return self._available
+    
+    def _mutable_running(self) -> list:
+        if not self._owns_running:
+            self._running = list(self._running)
+            self._owns_running = True
+        return self._running
+    
+    def start(self, deployment: SimulatedDeployment):
+        self._mutable_available()[:] -= deployment.resource_vector
+        self._mutable_running().append(deployment)
+    
+    def stop(self, deployment: SimulatedDeployment):
+        self._mutable_available()[:] += deployment.resource_vector
+        self._mutable_running().remove(deployment)
+
+class CapacitySimulator:
+    """Replays scheduler decisions for hypothetical jobs without touching the DB or Redis
+    
+    Submissions go through the scheduler's own fit check, preemption policy and victim search
+    against in-memory state; see UNMODELLED for what is approximated.
+    """
+    
+    def __init__(self, scheduler: DeploymentScheduler, snapshot: ClusterSnapshot):
+        self.scheduler = scheduler
+        self.snapshot = snapshot
+    
+    def _end_time(self, deployment: SimulatedDeployment, now: float) -> float:
+        duration = deployment.expected_duration_seconds or settings.SIMULATION_DEFAULT_DURATION_SECONDS
+        started = deployment.started_at.timestamp() if deployment.started_at else now
+        return max(started + duration, now)
+    
+    def run(self, jobs: List[SimulatedDeployment]) -> dict:
+        state = SimulationState(self.snapshot)
+        now = time.time()
+        kinds = resource_kinds()
+        total = state.total
+        
+        starts: Dict[int, float] = {}
+        ends: Dict[int, float] = {}
+        preempted_by: Dict[int, List[dict]] = {}
+        preemptions: List[dict] = []
+        times_preempted: Dict[int, int] = {}
+        # Peak of allocated resources, reported as a percentage of total
+        peak = total - state.available
+        
+        # Completion events keyed by (end time, sequence); stale entries are skipped
+        events = []
+        sequence = 0
+        generation: Dict[int, int] = {}
+        
+        def record_start(deployment: SimulatedDeployment, at: float):
+            nonlocal sequence, peak
+            state.start(deployment)
+            deployment.started_at = datetime.fromtimestamp(at, tz=timezone.utc)
+            if deployment.job_index is not None:
+                starts[deployment.job_index] = at
+            sequence += 1
+            generation[id(deployment)] = sequence
+            heapq.heappush(events, (self._end_time(deployment, at), sequence, deployment))
+            peak = np.maximum(peak, total - state.available)
+        
+        # Queue ordered by the scheduler's priority score, highest first
+        queue = [(self.scheduler.get_priority_score(d), d) for d in self.snapshot.queued]
+        
+        def enqueue(deployment: SimulatedDeployment):
+            # Requeued snapshot deployments are copied so the snapshot itself stays untouched
+            if deployment.started_at is not None:
+                deployment = copy.copy(deployment)
+                deployment.started_at = None
+                # Only preemption sends started work back, and it resumes with a boost like the real scheduler's
+                deployment.preemption_count += 1
+            queue.append((self.scheduler.get_priority_score(deployment), deployment))
+        
+        for deployment in self.snapshot.running:
+            sequence += 1
+            generation[id(deployment)] = sequence
+            heapq.heappush(events, (self._end_time(deployment, now), sequence, deployment))
+        
+        def wait_start(job: SimulatedDeployment) -> Optional[float]:
+            # estimate_start_time on simulated state: earlier-deadline queued work first, then releases
+            need = job.resource_vector + stack([
+                d.resource_vector for _, d in queue if d.deadline is not None and d.deadline < job.deadline
+            ]).sum(axis=0)
+            finishing = sorted(
+                (
+                    (end, d.resource_vector) for end, seq, d in events
+                    if generation.get(id(d)) == seq and d.expected_duration_seconds is not None
+                ),
+                key=lambda release: release[0]
+            )
+            return start_after_releases(need, state.available, finishing, now)
+        
+        # Submission: schedule_deployment's fit check, then its preemption policy and victim search
+        for job in jobs:
+            if fits(job.resource_vector, state.available):
+                record_start(job, now)
+                continue
+            
+            skipped, max_priority = self.scheduler.preemption_policy(
+                job, lambda: waiting_misses_deadline(job, wait_start(job))
+            )
+            if skipped is None:
+                victims = self.scheduler.covering_victims(
+                    job.resource_vector, state.available, list(state.running), max_priority
+                )
+                if victims:
+                    for victim in victims:
+                        state.stop(victim)
+                        generation.pop(id(victim), None)
+                        entry = {
+                            "deployment_id": victim.id if victim.job_index is None else None,
+                            "job_index": victim.job_index,
+                            "name": victim.name,
+                            "preempted_by": job.job_index,
+                            "at": now
+                        }
+                        preemptions.append(entry)
+                        preempted_by.setdefault(job.job_index, []).append(entry)
+                        if victim.job_index is not None:
+                            times_preempted[victim.job_index] = times_preempted.get(victim.job_index, 0) + 1
+                        enqueue(victim)
+                    record_start(job, now)
+                    continue
+            
+            enqueue(job)
+        
+        # Completions: drain the queue in score order, starting everything that fits
+        queue.sort(key=lambda item: -item[0])
+        pending = [d for _, d in queue]
+        needs = stack([d.resource_vector for d in pending])
+        alive = np.ones(len(pending), dtype=bool)
+        # Everything before head has already started
+        head = 0
+        
+        while events:
+            end, seq, deployment = heapq.heappop(events)
+            if generation.get(id(deployment)) != seq:
+                continue
+            del generation[id(deployment)]
+            state.stop(deployment)
+            if deployment.job_index is not None:
+                ends[deployment.job_index] = end
+            
+            # Availability only shrinks while draining, so each scan resumes after the last start
+            while head < len(pending) and not alive[head]:
+                head += 1
+            position = head
+            while position < len(pending):
+                hits = np.flatnonzero(alive[position:] & fits_rows(needs[position:], state.available))
+                if not len(hits):
+                    break
+                index = position + int(hits[0])
+                alive[index] = False
+                record_start(pending[index], end)
+                position = index + 1
+            
+            # Compact the queue once most of it has started
+            if alive.sum() * 2 < len(pending):
+                pending = [d for d, keep in zip(pending, alive) if keep]
+                needs = needs[alive]
+                alive = np.ones(len(pending), dtype=bool)
+                head = 0
+        
+        results = []
+        for job in jobs:
+            start = starts.get(job.job_index)
+            finish = ends.get(job.job_index)
+            meets_deadline = None
+            if job.deadline is not None:
+                meets_deadline = finish is not None and finish <= job.deadline.timestamp()
+            results.append({
+                "index": job.job_index,
+                "name": job.name,
+                "projected_start": _to_datetime(start),
+                "projected_end": _to_datetime(finish),
+                "preemptions": len(preempted_by.get(job.job_index, [])),
+                "times_preempted": times_preempted.get(job.job_index, 0),
+                "meets_deadline": meets_deadline
+            })
+        
+        for entry in preemptions:
+            entry["at"] = _to_datetime(entry["at"])
+        
+        return {
+            "cluster_id": self.snapshot.cluster_id,
+            "jobs": results,
+            "preemptions": preemptions,
+            "peak_utilization": {
+                kind: float(used / capacity * 100) if capacity > 0 else 0.0
+                for kind, used, capacity in zip(kinds, peak, total)
+            },
+            "projected_completion": _to_datetime(max(ends.values())) if ends else None,
+            "unmodelled": list(UNMODELLED)
+        }
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
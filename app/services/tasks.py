@@ -0,0 +1,72 @@
+from celery import Celery
+from ..core.config import settings
+from ..core.database import SessionLocal
+from .deployment_service import DeploymentService
+from .archival import DeploymentArchiver
+from .journal import SchedulerJournal
+from .reconciler import QueueReconciler
+# Registers the post-commit capacity cache invalidation in worker processes too
+from . import capacity
+
+celery = Celery("mlops_platform", broker=settings.REDIS_URL)
+
+celery.conf.beat_schedule = {
+    "expire-deployment-leases": {
+        "task": "app.services.tasks.expire_leases",
+        "schedule": settings.LEASE_SWEEP_INTERVAL_SECONDS,
+    },
+    "archive-terminal-deployments": {
+        "task": "app.services.tasks.archive_deployments",
+        "schedule": settings.ARCHIVE_INTERVAL_SECONDS,
+    },
+    "snapshot-scheduler-state": {
+        "task": "app.services.tasks.snapshot_scheduler_state",
+        "schedule": settings.JOURNAL_SNAPSHOT_INTERVAL_SECONDS,
+    },
+    "reconcile-deployment-queues": {
+        "task": "app.services.tasks.reconcile_queues",
+        "schedule": settings.QUEUE_RECONCILE_INTERVAL_SECONDS,
+    },
+}
+
+@celery.task
+def expire_leases() -> int:
+    """Fail or requeue running deployments whose executor stopped heartbeating"""
+    db = SessionLocal()
+    try:
+        service = DeploymentService(db)
+        total = 0
+        while True:
+            expired = service.expire_leases()
+            total += expired
+            if expired < settings.LEASE_SWEEP_BATCH:
+                return total
+    finally:
+        db.close()
+
+@celery.task
+def archive_deployments() -> int:
+    """Move terminal deployments past the retention window into the archive"""
+    db = SessionLocal()
+    try:
+        return DeploymentArchiver(db).run()
+    finally:
+        db.close()
+
+@celery.task
+def snapshot_scheduler_state() -> int:
+    """Snapshot scheduler state so restarts only replay the journal tail"""
+    db = SessionLocal()
+    try:
+        return SchedulerJournal(db).take_snapshot().last_event_id
+    finally:
+        db.close()
+
+@celery.task
+def reconcile_queues() -> dict:
+    """Repair drift between the Redis queues and QUEUED deployments"""
+    db = SessionLocal()
+    try:
+        return QueueReconciler(DeploymentService(db).scheduler).reconcile()
+    finally:
+        db.close()
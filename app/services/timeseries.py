@@ -0,0 +1,223 @@
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+import numpy as np
+from sqlalchemy import and_, case
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.cluster import Cluster
+from ..models.utilization import UtilizationRollup
+
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+SERIES = ("ram", "cpu", "gpu")
+
+def aggregate(timestamps: np.ndarray, values: np.ndarray, width: int):
+    """Group samples into fixed-width buckets; returns starts, counts, sums and maxima"""
+    buckets = (timestamps // width).astype(np.int64) * width
+    starts, inverse = np.unique(buckets, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(starts))
+    sums = np.stack(
+        [np.bincount(inverse, weights=values[:, i], minlength=len(starts)) for i in range(values.shape[1])],
+        axis=1
+    )
+    maxima = np.full((len(starts), values.shape[1]), -np.inf)
+    np.maximum.at(maxima, inverse, values)
+    return starts, counts, sums, maxima
+
+class UtilizationBuffer:
+    """Fixed-size array-backed ring buffer of (timestamp, ram%, cpu%, gpu%) samples"""
+    
+    def __init__(self, capacity: int):
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, len(SERIES)), dtype=np.float32)
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+        # Samples ever appended, so a flush can tell which of its samples are still buffered
+        self.appended = 0
+    
+    @property
+    def full(self) -> bool:
+        return self.size >= self.capacity
+    
+    def append(self, timestamp: float, values: Tuple[float, float, float]):
+        index = (self.start + self.size) % self.capacity
+        self.timestamps[index] = timestamp
+        self.values[index] = values
+        if self.full:
+            # Overwrite the oldest sample rather than grow
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.size += 1
+        self.appended += 1
+    
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Samples in insertion order"""
+        order = (self.start + np.arange(self.size)) % self.capacity
+        return self.timestamps[order], self.values[order].astype(np.float64)
+    
+    def discard_through(self, appended: int):
+        """Drop the buffered samples among the first `appended` ever recorded"""
+        count = min(max(appended - (self.appended - self.size), 0), self.size)
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+
+class UtilizationRecorder:
+    """Per-process utilization samples, periodically flushed to the rollup table"""
+    
+    def __init__(self):
+        self.buffers: Dict[int, UtilizationBuffer] = {}
+        self.lock = threading.Lock()
+        self.flushing = threading.Lock()
+        self.last_flush = time.time()
+    
+    def record(self, cluster: Cluster, timestamp: Optional[float] = None):
+        """Sample a cluster's current utilization"""
+        values = tuple(
+            (total - available) / total * 100 if total else 0.0
+            for total, available in (
+                (cluster.total_ram_gb, cluster.available_ram_gb),
+                (cluster.total_cpu_cores, cluster.available_cpu_cores),
+                (cluster.total_gpu_count, cluster.available_gpu_count)
+            )
+        )
+        with self.lock:
+            buffer = self.buffers.get(cluster.id)
+            if buffer is None:
+                buffer = self.buffers[cluster.id] = UtilizationBuffer(settings.UTILIZATION_BUFFER_SIZE)
+            buffer.append(timestamp if timestamp is not None else time.time(), values)
+    
+    def flush_due(self) -> bool:
+        with self.lock:
+            if time.time() - self.last_flush >= settings.UTILIZATION_FLUSH_SECONDS:
+                return True
+            return any(buffer.full for buffer in self.buffers.values())
+    
+    def flush(self, db: Session):
+        """Merge buffered samples into every rollup resolution; samples are only dropped once committed"""
+        # One flush per process at a time, so no sample is merged twice
+        if not self.flushing.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                drained = {
+                    cluster_id: (buffer.appended, buffer.snapshot())
+                    for cluster_id, buffer in self.buffers.items() if buffer.size
+                }
+                self.last_flush = time.time()
+            
+            try:
+                for cluster_id, (_, (timestamps, values)) in drained.items():
+                    for resolution, width in RESOLUTIONS.items():
+                        self._merge(db, cluster_id, resolution, *aggregate(timestamps, values, width))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            
+            with self.lock:
+                for cluster_id, (appended, _) in drained.items():
+                    self.buffers[cluster_id].discard_through(appended)
+        finally:
+            self.flushing.release()
+    
+    def _merge(self, db: Session, cluster_id: int, resolution: str, starts, counts, sums, maxima):
+        """Upsert bucket rows, so workers flushing the same bucket add to it instead of colliding"""
+        table = UtilizationRollup.__table__
+        rows = []
+        for i, start in enumerate(starts):
+            row = {
+                "cluster_id": cluster_id, "resolution": resolution, "bucket_start": int(start),
+                "sample_count": int(counts[i])
+            }
+            for j, series in enumerate(SERIES):
+                row[f"{series}_avg"] = float(sums[i, j]) / int(counts[i])
+                row[f"{series}_max"] = float(maxima[i, j])
+            rows.append(row)
+        
+        insert = sqlite_insert if db.get_bind().dialect.name == "sqlite" else postgresql_insert
+        statement = insert(table).values(rows)
+        incoming = statement.excluded
+        total = table.c.sample_count + incoming.sample_count
+        updates = {"sample_count": total}
+        for series in SERIES:
+            avg, peak = table.c[f"{series}_avg"], table.c[f"{series}_max"]
+            # Sample-weighted running average
+            updates[f"{series}_avg"] = (
+                avg * table.c.sample_count + incoming[f"{series}_avg"] * incoming.sample_count
+            ) / total
+            updates[f"{series}_max"] = case((incoming[f"{series}_max"] > peak, incoming[f"{series}_max"]), else_=peak)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["cluster_id", "resolution", "bucket_start"], set_=updates
+        ))
+    
+    def pending(self, cluster_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Samples recorded by this process that are not flushed yet"""
+        with self.lock:
+            buffer = self.buffers.get(cluster_id)
+            if buffer is None:
+                return np.zeros(0), np.zeros((0, len(SERIES)))
+            return buffer.snapshot()
+
+utilization_recorder = UtilizationRecorder()
+
+def pick_resolution(start: float, end: float) -> str:
+    """Coarsest useful resolution for a time range"""
+    span = end - start
+    if span <= settings.UTILIZATION_MAX_POINTS * RESOLUTIONS["1m"]:
+        return "1m"
+    if span <= settings.UTILIZATION_MAX_POINTS * RESOLUTIONS["1h"]:
+        return "1h"
+    return "1d"
+
+def utilization_history(db: Session, cluster_id: int, start: float, end: float, resolution: Optional[str] = None) -> dict:
+    """Downsampled utilization series from the rollup table plus this process's unflushed tail"""
+    resolution = resolution or pick_resolution(start, end)
+    width = RESOLUTIONS[resolution]
+    first_bucket = int(start // width) * width
+    
+    rows = db.query(
+        UtilizationRollup.bucket_start, UtilizationRollup.sample_count,
+        UtilizationRollup.ram_avg, UtilizationRollup.ram_max,
+        UtilizationRollup.cpu_avg, UtilizationRollup.cpu_max,
+        UtilizationRollup.gpu_avg, UtilizationRollup.gpu_max
+    ).filter(
+        and_(
+            UtilizationRollup.cluster_id == cluster_id,
+            UtilizationRollup.resolution == resolution,
+            UtilizationRollup.bucket_start >= first_bucket,
+            UtilizationRollup.bucket_start <= end
+        )
+    ).order_by(UtilizationRollup.bucket_start).all()
+    
+    buckets: Dict[int, List[float]] = {
+        row.bucket_start: [row.sample_count, row.ram_avg, row.ram_max, row.cpu_avg, row.cpu_max, row.gpu_avg, row.gpu_max]
+        for row in rows
+    }
+    
+    timestamps, values = utilization_recorder.pending(cluster_id)
+    in_range = (timestamps >= first_bucket) & (timestamps <= end)
+    if in_range.any():
+        starts, counts, sums, maxima = aggregate(timestamps[in_range], values[in_range], width)
+        for i, bucket_start in enumerate(starts):
+            merged = buckets.setdefault(int(bucket_start), [0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+            total = merged[0] + int(counts[i])
+            for j in range(len(SERIES)):
+                merged[1 + 2 * j] = (merged[1 + 2 * j] * merged[0] + float(sums[i, j])) / total
+                merged[2 + 2 * j] = max(merged[2 + 2 * j], float(maxima[i, j]))
+            merged[0] = total
+    
+    ordered = sorted(buckets)
+    return {
+        "cluster_id": cluster_id,
+        "resolution": resolution,
+        "timestamps": ordered,
+        "ram_avg": [buckets[b][1] for b in ordered],
+        "ram_max": [buckets[b][2] for b in ordered],
+        "cpu_avg": [buckets[b][3] for b in ordered],
+        "cpu_max": [buckets[b][4] for b in ordered],
+        "gpu_avg": [buckets[b][5] for b in ordered],
+        "gpu_max": [buckets[b][6] for b in ordered]
+    }
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional, Tuple
+import math
+from ..core.config import settings
+
+# Relative accuracy of the log-bucketed percentile sketch (~2.5%)
+SKETCH_GAMMA = 1.05
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a small list of samples"""
+    ordered = sorted(values)
+    rank = max(math.ceil(q * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+def sketch_bucket(value: float) -> int:
+    """Map a positive value to its log-scaled sketch bucket (0 for empty usage)"""
+    if value <= 0:
+        return 0
+    return math.ceil(math.log(value) / math.log(SKETCH_GAMMA)) + 10_000
+
+def sketch_value(bucket: int) -> float:
+    """Representative value of a sketch bucket"""
+    if bucket == 0:
+        return 0.0
+    return SKETCH_GAMMA ** (bucket - 10_000)
+
+def sketch_percentile(counts: Dict[int, int], q: float) -> Optional[float]:
+    """Percentile from bucket counts"""
+    total = sum(counts.values())
+    if not total:
+        return None
+    threshold = q * total
+    seen = 0
+    for bucket in sorted(counts):
+        seen += counts[bucket]
+        if seen >= threshold:
+            return sketch_value(bucket)
+    return sketch_value(max(counts))
+
+class UsageTracker:
+    """Observed resource usage of running deployments, pushed by executors"""
+    
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.window = settings.USAGE_WINDOW_SAMPLES
+    
+    def _samples_key(self, deployment_id: int) -> str:
+        return f"usage_samples_{deployment_id}"
+    
+    def _observed_key(self, cluster_id: int) -> str:
+        return f"usage_p95_{cluster_id}"
+    
+    def _sketch_key(self, docker_image: str, user_id: int, resource: str) -> str:
+        return f"usage_sketch_{docker_image}_{user_id}_{resource}"
+    
+    def record_sample(self, deployment, ram_gb: float, cpu_cores: float) -> Tuple[float, float]:
+        """Store a usage sample and return the deployment's current p95 usage"""
+        samples_key = self._samples_key(deployment.id)
+        
+        pipe = self.redis_client.pipeline()
+        # Bounded ring buffer: newest samples at the head
+        pipe.lpush(samples_key, f"{ram_gb},{cpu_cores}")
+        pipe.ltrim(samples_key, 0, self.window - 1)
+        pipe.lrange(samples_key, 0, -1)
+        pipe.hincrby(self._sketch_key(deployment.docker_image, deployment.user_id, "ram"), sketch_bucket(ram_gb), 1)
+        pipe.hincrby(self._sketch_key(deployment.docker_image, deployment.user_id, "cpu"), sketch_bucket(cpu_cores), 1)
+        samples = pipe.execute()[2]
+        
+        parsed = [tuple(float(v) for v in sample.split(b",")) for sample in samples]
+        p95_ram = percentile([s[0] for s in parsed], 0.95)
+        p95_cpu = percentile([s[1] for s in parsed], 0.95)
+        
+        self.redis_client.hset(
+            self._observed_key(deployment.cluster_id), deployment.id, f"{p95_ram},{p95_cpu},{len(parsed)}"
+        )
+        return p95_ram, p95_cpu
+    
+    def observed_usage(self, cluster_id: int) -> Dict[int, Tuple[float, float]]:
+        """Return p95 (ram, cpu) usage of running deployments with enough samples, keyed by deployment id"""
+        raw = self.redis_client.hgetall(self._observed_key(cluster_id))
+        # The window caps the count, so it also caps the minimum
+        needed = min(settings.USAGE_MIN_SAMPLES, self.window)
+        observed = {}
+        for deployment_id, value in raw.items():
+            fields = value.split(b",")
+            # Entries written before counts were stored are treated as too few samples
+            if len(fields) == 3 and int(fields[2]) >= needed:
+                observed[int(deployment_id)] = (float(fields[0]), float(fields[1]))
+        return observed
+    
+    def forget(self, deployment_id: int, cluster_id: int):
+        """Drop per-deployment usage once it no longer holds resources"""
+        pipe = self.redis_client.pipeline()
+        pipe.delete(self._samples_key(deployment_id))
+        pipe.hdel(self._observed_key(cluster_id), deployment_id)
+        pipe.execute()
+    
+    def sketch(self, docker_image: str, user_id: int, resource: str) -> Dict[int, int]:
+        raw = self.redis_client.hgetall(self._sketch_key(docker_image, user_id, resource))
+        return {int(bucket): int(count) for bucket, count in raw.items()}
+    
+    def estimate(self, docker_image: str, user_id: int) -> Optional[Tuple[float, float]]:
+        """Historical p95 (ram, cpu) usage for an image and user, if enough samples exist"""
+        ram_counts = self.sketch(docker_image, user_id, "ram")
+        if sum(ram_counts.values()) < settings.USAGE_MIN_SAMPLES:
+            return None
+        cpu_counts = self.sketch(docker_image, user_id, "cpu")
+        return sketch_percentile(ram_counts, 0.95), sketch_percentile(cpu_counts, 0.95)
+    
+    def recommendation(self, docker_image: str, user_id: int) -> dict:
+        """Right-sizing recommendation derived from the image and user sketches"""
+        ram_counts = self.sketch(docker_image, user_id, "ram")
+        cpu_counts = self.sketch(docker_image, user_id, "cpu")
+        p95_ram = sketch_percentile(ram_counts, 0.95)
+        p95_cpu = sketch_percentile(cpu_counts, 0.95)
+        headroom = 1 + settings.RIGHTSIZING_HEADROOM
+        
+        return {
+            "docker_image": docker_image,
+            "user_id": user_id,
+            "samples": sum(ram_counts.values()),
+            "p50_ram_gb": sketch_percentile(ram_counts, 0.5),
+            "p95_ram_gb": p95_ram,
+            "p50_cpu_cores": sketch_percentile(cpu_counts, 0.5),
+            "p95_cpu_cores": p95_cpu,
+            "recommended_ram_gb": p95_ram * headroom if p95_ram is not None else None,
+            "recommended_cpu_cores": p95_cpu * headroom if p95_cpu is not None else None
+        }
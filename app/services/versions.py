@@ -0,0 +1,138 @@
+from typing import Iterable, List, Optional, Set
+import logging
+import time
+import redis
+from redis.commands.core import Script
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..core.redis_client import get_redis_client
+from ..models.cluster import Cluster
+from ..models.deployment import Deployment
+
+logger = logging.getLogger(__name__)
+
+# Millisecond clock that never goes backwards, even across Redis restarts
+CLOCK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local last = tonumber(redis.call('GET', KEYS[1]) or '0')
+local version = now
+if last >= now then
+    version = last + 1
+end
+redis.call('SET', KEYS[1], version)
+return version
+"""
+
+# Raise each scope to a version, never lower it
+TOUCH_SCRIPT = """
+local version = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    local current = tonumber(redis.call('GET', key) or '0')
+    if version > current then
+        redis.call('SET', key, version)
+    end
+end
+return version
+"""
+
+def clusters_scope(organization_id: int) -> str:
+    return f"version_clusters_org_{organization_id}"
+
+def cluster_scope(organization_id: int, cluster_id: int) -> str:
+    return f"version_cluster_{organization_id}_{cluster_id}"
+
+def user_deployments_scope(user_id: int) -> str:
+    return f"version_deployments_user_{user_id}"
+
+def cluster_deployments_scope(cluster_id: int) -> str:
+    return f"version_deployments_cluster_{cluster_id}"
+
+def organization_deployments_scope(organization_id: int) -> str:
+    return f"version_deployments_org_{organization_id}"
+
+def deployment_scopes(user_id: int, cluster_id: int, organization_id: Optional[int]) -> List[str]:
+    scopes = [user_deployments_scope(user_id), cluster_deployments_scope(cluster_id)]
+    if organization_id is not None:
+        scopes.append(organization_deployments_scope(organization_id))
+    return scopes
+
+class VersionClock:
+    """Monotonic versions stamped on changed rows, and the latest version seen by each read scope"""
+    
+    CLOCK_KEY = "version_clock"
+    
+    def __init__(self, redis_client=None):
+        self._redis_client = redis_client
+        self.clock = Script(None, CLOCK_SCRIPT.encode())
+        self.raise_scopes = Script(None, TOUCH_SCRIPT.encode())
+    
+    @property
+    def redis_client(self):
+        return self._redis_client or get_redis_client()
+    
+    def next(self) -> int:
+        return int(self.clock(keys=[self.CLOCK_KEY], args=[int(time.time() * 1000)], client=self.redis_client))
+    
+    def touch(self, scopes: Iterable[str], version: Optional[int] = None):
+        """Mark read scopes as changed at a version (a fresh one by default)"""
+        scopes = list(scopes)
+        if not scopes:
+            return
+        if version is None:
+            version = self.next()
+        self.raise_scopes(keys=scopes, args=[version], client=self.redis_client)
+    
+    def current(self, scope: str) -> int:
+        """Latest version of a scope; 0 when it has never been touched"""
+        return int(self.redis_client.get(scope) or 0)
+
+version_clock = VersionClock()
+
+@event.listens_for(Session, "before_flush")
+def stamp_versions(session: Session, flush_context, instances):
+    """Stamp changed clusters and deployments with one version per flush"""
+    changed = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, (Cluster, Deployment)) and (obj in session.new or session.is_modified(obj))
+    ]
+    if not changed:
+        return
+    
+    try:
+        version = version_clock.next()
+    except redis.RedisError:
+        # Writes never depend on Redis: fall back to the wall clock, still above every row's current version
+        logger.warning("Version clock unavailable, stamping from the local clock", exc_info=True)
+        version = max([int(time.time() * 1000)] + [(obj.version or 0) + 1 for obj in changed])
+    scopes: Set[str] = session.info.setdefault("version_scopes", set())
+    with session.no_autoflush:
+        for obj in changed:
+            obj.version = version
+            if isinstance(obj, Cluster):
+                scopes.add(clusters_scope(obj.organization_id))
+                if obj.id is not None:
+                    scopes.add(cluster_scope(obj.organization_id, obj.id))
+            else:
+                cluster = session.get(Cluster, obj.cluster_id)
+                scopes.update(deployment_scopes(obj.user_id, obj.cluster_id, cluster.organization_id if cluster else None))
+
+@event.listens_for(Session, "after_flush")
+def resolve_new_cluster_scopes(session: Session, flush_context):
+    # New clusters only have an id once inserted
+    for obj in session.new:
+        if isinstance(obj, Cluster):
+            session.info.setdefault("version_scopes", set()).add(cluster_scope(obj.organization_id, obj.id))
+
+@event.listens_for(Session, "after_commit")
+def publish_versions(session: Session):
+    """Advance read scopes only once their changes are visible"""
+    scopes = session.info.pop("version_scopes", None)
+    if scopes:
+        try:
+            version_clock.touch(scopes)
+        except redis.RedisError:
+            logger.warning("Could not advance read versions", exc_info=True)
+
+@event.listens_for(Session, "after_rollback")
+def discard_versions(session: Session):
+    session.info.pop("version_scopes", None)
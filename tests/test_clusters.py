@@ -1,6 +1,18 @@
 import pytest
+import json
+import os
+import time
+import redis
+from sqlalchemy.exc import SQLAlchemyError
 from fastapi.testclient import TestClient
 from ..app.main import app
+from ..app.core.config import settings
+from ..app.core.database import Base, SessionLocal, dispose_engine, get_replica_engine
+from ..app.models.cluster import Cluster
+from ..app.models.utilization import UtilizationRollup
+from ..app.services.read_routing import read_your_writes
+from ..app.services.timeseries import UtilizationRecorder
+from ..app.services.versions import version_clock
 
 client = TestClient(app)
 
@@ -71,4 +83,279 @@ def test_list_clusters():
     )
     assert response.status_code == 200
     data = response.json()
-    assert len(data) > 0 
\ No newline at end of file
+    assert len(data) > 0 
+
+
+def test_simulate_does_not_mutate_cluster():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    cluster_response = client.post(
+        "/clusters/",
+        json={
+            "name": "Simulation Cluster",
+            "total_ram_gb": 8.0,
+            "total_cpu_cores": 4.0,
+            "total_gpu_count": 0
+        },
+        headers=headers
+    )
+    cluster_id = cluster_response.json()["id"]
+    
+    response = client.post(
+        f"/clusters/{cluster_id}/simulate",
+        json={
+            "jobs": [
+                {"required_ram_gb": 4.0, "required_cpu_cores": 1.0, "expected_duration_seconds": 600}
+                for _ in range(3)
+            ]
+        },
+        headers=headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["jobs"]) == 3
+    assert data["jobs"][0]["projected_start"] == data["jobs"][1]["projected_start"]
+    assert data["jobs"][2]["projected_start"] == data["jobs"][0]["projected_end"]
+    assert data["peak_utilization"]["ram"] == 100.0
+    
+    resources = client.get(f"/clusters/{cluster_id}/resources", headers=headers)
+    assert resources.json()["available_ram_gb"] == 8.0
+
+def test_cluster_utilization_history():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    cluster_response = client.post(
+        "/clusters/",
+        json={
+            "name": "History Cluster",
+            "total_ram_gb": 8.0,
+            "total_cpu_cores": 4.0,
+            "total_gpu_count": 0
+        },
+        headers=headers
+    )
+    cluster_id = cluster_response.json()["id"]
+    
+    client.post(
+        "/deployments/",
+        json={
+            "name": "History Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 4.0,
+            "required_cpu_cores": 1.0
+        },
+        headers=headers
+    )
+    
+    response = client.get(f"/clusters/{cluster_id}/utilization", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["resolution"] == "1m"
+    assert data["ram_max"][-1] == 50.0
+    
+    response = client.get(
+        f"/clusters/{cluster_id}/utilization",
+        params={"resolution": "1w"},
+        headers=headers
+    )
+    assert response.status_code == 400
+
+def test_list_clusters_as_ndjson():
+    token = get_auth_token()
+    
+    listed = client.get("/clusters/", headers={"Authorization": f"Bearer {token}"}).json()
+    
+    response = client.get(
+        "/clusters/?format=ndjson",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == listed
+    
+    response = client.get("/clusters/?format=xml", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
+
+def test_list_clusters_conditional_get_and_since():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    client.post(
+        "/clusters/",
+        json={"name": "Versioned Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 2.0},
+        headers=headers
+    )
+    response = client.get("/clusters/", headers=headers)
+    etag = response.headers["ETag"]
+    version = int(etag.strip('"').split("-")[0])
+    
+    response = client.get("/clusters/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    
+    created = client.post(
+        "/clusters/",
+        json={"name": "Newer Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 2.0},
+        headers=headers
+    ).json()
+    
+    response = client.get("/clusters/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    
+    response = client.get(f"/clusters/?since={version}", headers=headers)
+    assert created["id"] in [c["id"] for c in response.json()]
+    assert all(c["version"] > version - 5000 for c in response.json())
+    
+    resources = client.get(f"/clusters/{created['id']}/resources", headers=headers)
+    response = client.get(
+        f"/clusters/{created['id']}/resources",
+        headers={**headers, "If-None-Match": resources.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+def test_reads_use_replica_outside_read_your_writes_window():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    # An empty replica stands in for one that has not caught up yet
+    settings.DATABASE_REPLICA_URL = "sqlite:///./test_replica.db"
+    try:
+        Base.metadata.create_all(bind=get_replica_engine())
+        
+        created = client.post(
+            "/clusters/",
+            json={"name": "Replica Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 2.0},
+            headers=headers
+        ).json()
+        
+        # The caller's own write is visible right away: the read goes to the primary
+        response = client.get("/clusters/", headers=headers)
+        assert created["id"] in [c["id"] for c in response.json()]
+        
+        read_your_writes.forget("clustertest")
+        response = client.get("/clusters/", headers=headers)
+        assert response.json() == []
+        # A lagging replica must not hand out an ETag for the latest version
+        assert "ETag" not in response.headers
+        assert client.get(f"/clusters/{created['id']}", headers=headers).status_code == 404
+    finally:
+        settings.DATABASE_REPLICA_URL = None
+        dispose_engine()
+        os.remove("./test_replica.db")
+
+def test_resize_cluster_drains_on_growth_and_preempts_on_shrink(monkeypatch):
+    # Read shrink candidates one at a time
+    monkeypatch.setattr(settings, "SHRINK_VICTIM_BATCH", 1)
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Elastic Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers=headers
+    ).json()["id"]
+    
+    def submit(name, priority):
+        return client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": "test/elastic:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 4.0,
+                "required_cpu_cores": 1.0,
+                "priority": priority
+            },
+            headers=headers
+        ).json()
+    
+    important = submit("Important", 3)
+    cheap = submit("Cheap", 1)
+    waiting = submit("Waiting", 2)
+    assert waiting["status"] == "queued"
+    
+    # Adding a machine starts the queued deployment right away
+    grown = client.patch(f"/clusters/{cluster_id}/capacity", json={"total_ram_gb": 12.0}, headers=headers)
+    assert grown.status_code == 200
+    assert grown.json()["preempted_deployment_ids"] == []
+    assert grown.json()["cluster"]["total_ram_gb"] == 12.0
+    assert grown.json()["cluster"]["available_ram_gb"] == 0.0
+    assert grown.json()["cluster"]["total_cpu_cores"] == 4.0
+    assert client.get(f"/deployments/{waiting['id']}", headers=headers).json()["status"] == "running"
+    
+    # Removing two machines preempts only the two cheapest deployments
+    shrunk = client.patch(f"/clusters/{cluster_id}/capacity", json={"total_ram_gb": 4.0}, headers=headers).json()
+    assert shrunk["preempted_deployment_ids"] == [cheap["id"], waiting["id"]]
+    assert shrunk["cluster"]["available_ram_gb"] == 0.0
+    assert client.get(f"/deployments/{important['id']}", headers=headers).json()["status"] == "running"
+    assert client.get(f"/deployments/{cheap['id']}", headers=headers).json()["status"] == "preempted"
+    
+    response = client.patch(f"/clusters/{cluster_id}/capacity", json={"total_ram_gb": -1.0}, headers=headers)
+    assert response.status_code == 422
+    response = client.patch(
+        f"/clusters/{cluster_id}/capacity", json={"total_extra_resources": {"disk_gb": -1.0}}, headers=headers
+    )
+    assert response.status_code == 422
+
+def test_concurrent_utilization_flushes_merge_into_one_bucket():
+    token = get_auth_token()
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Rollup Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers={"Authorization": f"Bearer {token}"}
+    ).json()["id"]
+    
+    db = SessionLocal()
+    try:
+        cluster = db.get(Cluster, cluster_id)
+        bucket = int(time.time() // 60) * 60
+        # Two workers flushing the same bucket each insert-or-add instead of colliding
+        workers = [UtilizationRecorder(), UtilizationRecorder()]
+        for recorder in workers:
+            recorder.record(cluster, bucket + 1)
+        
+        def failing_merge(*args, **kwargs):
+            raise SQLAlchemyError("database unavailable")
+        
+        workers[1]._merge = failing_merge
+        with pytest.raises(SQLAlchemyError):
+            workers[1].flush(db)
+        # A failed flush keeps its samples for the next attempt
+        assert len(workers[1].pending(cluster_id)[0]) == 1
+        del workers[1]._merge
+        
+        for recorder in workers:
+            recorder.flush(db)
+            assert len(recorder.pending(cluster_id)[0]) == 0
+        
+        row = db.query(UtilizationRollup).filter(
+            UtilizationRollup.cluster_id == cluster_id,
+            UtilizationRollup.resolution == "1m",
+            UtilizationRollup.bucket_start == bucket
+        ).one()
+        assert row.sample_count == 2
+    finally:
+        db.close()
+
+def test_cluster_writes_do_not_depend_on_the_version_clock(monkeypatch):
+    token = get_auth_token()
+    created = client.post(
+        "/clusters/",
+        json={"name": "Clockless Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers={"Authorization": f"Bearer {token}"}
+    ).json()
+    
+    def unavailable():
+        raise redis.RedisError("connection refused")
+    
+    monkeypatch.setattr(version_clock, "next", unavailable)
+    db = SessionLocal()
+    try:
+        cluster = db.get(Cluster, created["id"])
+        cluster.name = "Renamed Without Redis"
+        db.commit()
+        assert cluster.version > created["version"]
+    finally:
+        db.close()
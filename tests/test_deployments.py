@@ -1,6 +1,24 @@
 import pytest
+import io
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import pyarrow as pa
+import pyarrow.parquet as pq
 from fastapi.testclient import TestClient
 from ..app.main import app
+from ..app.core.config import settings
+from ..app.core.database import SessionLocal
+from ..app.models.deployment import Deployment, DeploymentStatus
+from ..app.models.journal import SchedulerEvent, SchedulerSnapshot
+from ..app.services.archival import DeploymentArchiver
+from ..app.services.deployment_service import DeploymentService
+from ..app.services.scheduler import DeploymentScheduler, queue_index_key
+from ..app.services.journal import SchedulerJournal
+from ..app.services.reconciler import QueueReconciler
+from ..app.services.cache import service_key_cache
+from ..app.services.service_auth import sign
 
 client = TestClient(app)
 
@@ -43,6 +61,15 @@ def get_auth_token_and_cluster():
     cluster_id = cluster_response.json()["id"]
     return token, cluster_id
 
+def get_viewer_token():
+    client.post(
+        "/auth/register",
+        json={"username": "statsviewer", "email": "statsviewer@example.com", "password": "testpassword", "role": "viewer"}
+    )
+    return client.post(
+        "/auth/login", data={"username": "statsviewer", "password": "testpassword"}
+    ).json()["access_token"]
+
 def test_create_deployment():
     token, cluster_id = get_auth_token_and_cluster()
     
@@ -89,4 +116,899 @@ def test_list_deployments():
     )
     assert response.status_code == 200
     data = response.json()
-    assert len(data) > 0 
\ No newline at end of file
+    assert len(data) > 0 
+
+
+def test_create_deployment_with_infeasible_deadline():
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    deadline = datetime.now(timezone.utc) + timedelta(minutes=1)
+    response = client.post(
+        "/deployments/",
+        json={
+            "name": "Deadline Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 2.0,
+            "required_cpu_cores": 1.0,
+            "deadline": deadline.isoformat(),
+            "expected_duration_seconds": 3600
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 400
+
+def test_create_deployment_with_feasible_deadline():
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    deadline = datetime.now(timezone.utc) + timedelta(hours=2)
+    response = client.post(
+        "/deployments/",
+        json={
+            "name": "Deadline Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 2.0,
+            "required_cpu_cores": 1.0,
+            "deadline": deadline.isoformat(),
+            "expected_duration_seconds": 600
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "running"
+
+def test_create_deployment_without_cluster_prefers_warm_image():
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    payload = {
+        "name": "Placed Deployment",
+        "docker_image": "test/locality:latest",
+        "required_ram_gb": 1.0,
+        "required_cpu_cores": 0.5
+    }
+    first = client.post(
+        "/deployments/",
+        json=payload,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert first.status_code == 200
+    
+    second = client.post(
+        "/deployments/",
+        json=payload,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert second.status_code == 200
+    assert second.json()["cluster_id"] == first.json()["cluster_id"]
+    
+    stats = client.get(
+        "/clusters/image-locality/stats",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert stats.status_code == 200
+    assert stats.json()["hits"] >= 1
+    
+    stats = client.get(
+        "/clusters/image-locality/stats",
+        headers={"Authorization": f"Bearer {get_viewer_token()}"}
+    )
+    assert stats.status_code == 403
+
+def test_heartbeat_and_lease_expiry():
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    response = client.post(
+        "/deployments/",
+        json={
+            "name": "Leased Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 1.0,
+            "required_cpu_cores": 0.5
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    deployment_id = response.json()["id"]
+    
+    heartbeat = client.post(
+        f"/deployments/{deployment_id}/heartbeat",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert heartbeat.status_code == 200
+    
+    db = SessionLocal()
+    try:
+        service = DeploymentService(db)
+        leases = service.scheduler.leases
+        # Backdate only this lease, and sweep only leases that old, so other tests' leases stay put
+        leases.redis_client.zadd(leases.LEASES_KEY, {deployment_id: 1})
+        
+        # A claim that never commits keeps the lease, pushed out for a later sweep
+        assert leases.claim_expired(now=1) == [deployment_id]
+        assert leases.redis_client.zscore(leases.LEASES_KEY, deployment_id) > 1
+        
+        leases.redis_client.zadd(leases.LEASES_KEY, {deployment_id: 1})
+        assert service.expire_leases(now=1) == 1
+        assert leases.redis_client.zscore(leases.LEASES_KEY, deployment_id) is None
+    finally:
+        db.close()
+    
+    response = client.get(
+        f"/deployments/{deployment_id}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.json()["status"] == "failed"
+    
+    heartbeat = client.post(
+        f"/deployments/{deployment_id}/heartbeat",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert heartbeat.status_code == 409
+
+def test_overcommit_admits_against_observed_usage():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    cluster_response = client.post(
+        "/clusters/",
+        json={
+            "name": "Overcommit Cluster",
+            "total_ram_gb": 8.0,
+            "total_cpu_cores": 4.0,
+            "overcommit_ratio": 2.0
+        },
+        headers=headers
+    )
+    cluster_id = cluster_response.json()["id"]
+    
+    # Usage sketches are kept per image across runs, so start from a fresh one
+    image = f"test/greedy-{uuid.uuid4().hex[:8]}:latest"
+    payload = {
+        "name": "Greedy Deployment",
+        "docker_image": image,
+        "cluster_id": cluster_id,
+        "required_ram_gb": 8.0,
+        "required_cpu_cores": 4.0
+    }
+    first = client.post("/deployments/", json=payload, headers=headers)
+    assert first.json()["status"] == "running"
+    
+    def report_usage():
+        usage = client.post(
+            f"/deployments/{first.json()['id']}/usage",
+            json={"ram_gb": 1.0, "cpu_cores": 0.5},
+            headers=headers
+        )
+        assert usage.status_code == 200
+        assert usage.json()["p95_ram_gb"] == 1.0
+    
+    negative = client.post(
+        f"/deployments/{first.json()['id']}/usage",
+        json={"ram_gb": -1.0, "cpu_cores": 0.5},
+        headers=headers
+    )
+    assert negative.status_code == 422
+    
+    payload["required_ram_gb"] = 4.0
+    payload["required_cpu_cores"] = 2.0
+    
+    # A single sample says little about the running deployment, so its request still counts
+    report_usage()
+    single_sample = client.post("/deployments/", json=payload, headers=headers)
+    assert single_sample.json()["status"] == "queued"
+    
+    for _ in range(settings.USAGE_MIN_SAMPLES - 1):
+        report_usage()
+    second = client.post("/deployments/", json=payload, headers=headers)
+    assert second.json()["status"] == "running"
+    
+    recommendation = client.get(
+        "/deployments/recommendations",
+        params={"docker_image": image},
+        headers=headers
+    )
+    assert recommendation.status_code == 200
+    assert recommendation.json()["samples"] == settings.USAGE_MIN_SAMPLES
+
+def test_archived_deployment_still_readable():
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    response = client.post(
+        "/deployments/",
+        json={
+            "name": "Archived Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 1.0,
+            "required_cpu_cores": 0.5
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    deployment_id = response.json()["id"]
+    
+    db = SessionLocal()
+    try:
+        DeploymentService(db).update_deployment_status(deployment_id, DeploymentStatus.COMPLETED)
+        archived = DeploymentArchiver(db).run(now=datetime.now(timezone.utc) + timedelta(days=365))
+    finally:
+        db.close()
+    assert archived >= 1
+    
+    response = client.get(
+        f"/deployments/{deployment_id}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    
+    response = client.get("/deployments/", headers={"Authorization": f"Bearer {token}"})
+    assert deployment_id not in [d["id"] for d in response.json()]
+    
+    response = client.get(
+        "/deployments/?include_archived=true",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert deployment_id in [d["id"] for d in response.json()]
+
+def test_event_journal_feed_and_replay(monkeypatch):
+    # Treat every committed event as settled
+    monkeypatch.setattr(settings, "JOURNAL_COMMIT_LAG_SECONDS", 0)
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    events = client.get("/deployments/events", headers={"Authorization": f"Bearer {token}"}).json()
+    after = events[-1]["id"] if events else 0
+    
+    response = client.post(
+        "/deployments/",
+        json={
+            "name": "Journaled Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 1.0,
+            "required_cpu_cores": 0.5
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    deployment_id = response.json()["id"]
+    
+    response = client.get(
+        f"/deployments/events?after={after}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert [e["event_type"] for e in response.json() if e["deployment_id"] == deployment_id] == ["created", "scheduled"]
+    
+    db = SessionLocal()
+    try:
+        journal = SchedulerJournal(db)
+        snapshot = journal.take_snapshot()
+        assert journal.restore().deployments[deployment_id]["status"] == "running"
+        
+        DeploymentService(db).update_deployment_status(deployment_id, DeploymentStatus.COMPLETED)
+        # The completion is only in the journal tail, after the snapshot
+        state = journal.restore()
+        assert state.last_event_id > snapshot.last_event_id
+        assert deployment_id not in state.deployments
+    finally:
+        db.close()
+
+def test_journal_position_stays_behind_unsettled_events(monkeypatch):
+    monkeypatch.setattr(settings, "JOURNAL_COMMIT_LAG_SECONDS", 3600)
+    db = SessionLocal()
+    snapshot = None
+    newest = db.query(SchedulerEvent.id).order_by(SchedulerEvent.id.desc()).first()
+    newest = newest.id if newest else 0
+    
+    def journal_event(event_id, deployment_id):
+        db.execute(SchedulerEvent.__table__.insert(), [{
+            "id": event_id,
+            "deployment_id": deployment_id,
+            "cluster_id": 999999,
+            "event_type": "queued",
+            "payload": {"status": "queued", "previous_status": "pending", "priority": "MEDIUM"}
+        }])
+        db.commit()
+    
+    try:
+        journal = SchedulerJournal(db)
+        # A later transaction commits first...
+        journal_event(newest + 10, 999901)
+        snapshot = journal.take_snapshot()
+        assert snapshot.last_event_id < newest + 10
+        assert journal.events_since(snapshot.last_event_id) == []
+        
+        # ...then an earlier one commits a lower id, which the next restore still replays
+        journal_event(newest + 5, 999902)
+        state = journal.restore()
+        assert {999901, 999902} <= set(state.deployments)
+        assert state.last_event_id == snapshot.last_event_id
+    finally:
+        db.query(SchedulerEvent).filter(SchedulerEvent.id.in_([newest + 5, newest + 10])).delete(synchronize_session=False)
+        if snapshot is not None:
+            db.query(SchedulerSnapshot).filter(SchedulerSnapshot.id == snapshot.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+def test_queue_reconciler_repairs_drift():
+    token, cluster_id = get_auth_token_and_cluster()
+    
+    response = client.post(
+        "/deployments/",
+        json={
+            "name": "Oversized Deployment",
+            "docker_image": "test/model:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 1000.0,
+            "required_cpu_cores": 0.5
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    deployment_id = response.json()["id"]
+    assert response.json()["status"] == "queued"
+    
+    db = SessionLocal()
+    try:
+        scheduler = DeploymentService(db).scheduler
+        queue_key = f"deployment_queue_{cluster_id}"
+        # Lose the queued member and leave one for a deployment that no longer exists
+        scheduler.redis_client.delete(queue_key)
+        scheduler.redis_client.zadd(queue_key, {json.dumps({"deployment_id": 10 ** 9, "cluster_id": cluster_id}): 1})
+        
+        counts = QueueReconciler(scheduler).reconcile_cluster(cluster_id)
+        assert counts["stale_removed"] == 1
+        assert counts["missing_requeued"] == 1
+        members = {json.loads(m)["deployment_id"] for m in scheduler.redis_client.zrange(queue_key, 0, -1)}
+        assert members == {deployment_id}
+        
+        # A second, higher-scored member for the deployment while the index names the first
+        (kept, score), = scheduler.redis_client.zrange(queue_key, 0, -1, withscores=True)
+        duplicate = json.dumps({"deployment_id": deployment_id, "cluster_id": cluster_id, "requeued": True})
+        scheduler.redis_client.zadd(queue_key, {duplicate: score + 1})
+        scheduler.redis_client.hset(queue_index_key(cluster_id), deployment_id, kept)
+        
+        counts = QueueReconciler(scheduler).reconcile_cluster(cluster_id)
+        assert counts["duplicates_removed"] == 1
+        assert scheduler.redis_client.hget(queue_index_key(cluster_id), deployment_id) == duplicate.encode()
+    finally:
+        db.close()
+    
+    response = client.get("/clusters/queues/reconciliation", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    response = client.get("/clusters/queues/reconciliation", headers={"Authorization": f"Bearer {get_viewer_token()}"})
+    assert response.status_code == 403
+
+def test_submission_rate_limit():
+    client.post(
+        "/auth/register",
+        json={
+            "username": "ratelimited",
+            "email": "ratelimited@example.com",
+            "password": "testpassword",
+            "role": "developer"
+        }
+    )
+    login_response = client.post(
+        "/auth/login",
+        data={"username": "ratelimited", "password": "testpassword"}
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    org_id = client.post("/organizations/", json={"name": "Rate Limited Org"}, headers=headers).json()["id"]
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Rate Limited Cluster", "total_ram_gb": 32.0, "total_cpu_cores": 8.0, "total_gpu_count": 0},
+        headers=headers
+    ).json()["id"]
+    
+    response = client.put(
+        f"/organizations/{org_id}/rate-limits",
+        json={"user": {"per_minute": 1, "burst": 2}},
+        headers=headers
+    )
+    assert response.status_code == 200
+    
+    statuses = []
+    for i in range(3):
+        response = client.post(
+            "/deployments/",
+            json={
+                "name": f"Burst {i}",
+                "docker_image": "test/model:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 1.0,
+                "required_cpu_cores": 0.5
+            },
+            headers=headers
+        )
+        statuses.append(response.status_code)
+    
+    assert statuses == [200, 200, 429]
+    assert int(response.headers["Retry-After"]) >= 1
+
+def signed_post(path, key_id, secret, body=None, timestamp=None):
+    content = json.dumps(body).encode() if body is not None else b""
+    timestamp = timestamp or f"{time.time():.6f}"
+    return client.post(
+        path,
+        content=content,
+        headers={
+            "Content-Type": "application/json",
+            "X-Service-Key": key_id,
+            "X-Service-Timestamp": timestamp,
+            "X-Service-Signature": sign(secret, timestamp, "POST", path, content)
+        }
+    )
+
+def test_executor_service_credentials():
+    token, cluster_id = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    deployment_id = client.post(
+        "/deployments/",
+        json={
+            "name": "Executor Deployment",
+            "docker_image": "test/executor:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 1.0,
+            "required_cpu_cores": 0.5
+        },
+        headers=headers
+    ).json()["id"]
+    
+    credential = client.post(f"/clusters/{cluster_id}/credentials", headers=headers).json()
+    key_id, secret = credential["key_id"], credential["secret"]
+    heartbeat_path = f"/executor/deployments/{deployment_id}/heartbeat"
+    
+    assert signed_post(heartbeat_path, key_id, secret).status_code == 200
+    assert signed_post(heartbeat_path, key_id, "wrong-secret").status_code == 401
+    
+    # A key for another cluster cannot touch this deployment
+    other_cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Other Executor Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 2.0},
+        headers=headers
+    ).json()["id"]
+    other = client.post(f"/clusters/{other_cluster_id}/credentials", headers=headers).json()
+    assert signed_post(heartbeat_path, other["key_id"], other["secret"]).status_code == 403
+    
+    response = signed_post(
+        f"/executor/deployments/{deployment_id}/status", key_id, secret, {"status": "completed"}
+    )
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    
+    # Revocation takes effect without a restart
+    assert client.delete(f"/clusters/{cluster_id}/credentials/{key_id}", headers=headers).status_code == 200
+    assert signed_post(heartbeat_path, key_id, secret).status_code == 401
+
+def test_executor_requests_cannot_be_replayed():
+    token, cluster_id = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    deployment_id = client.post(
+        "/deployments/",
+        json={
+            "name": "Replay Deployment",
+            "docker_image": "test/executor:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 1.0,
+            "required_cpu_cores": 0.5
+        },
+        headers=headers
+    ).json()["id"]
+    credential = client.post(f"/clusters/{cluster_id}/credentials", headers=headers).json()
+    heartbeat_path = f"/executor/deployments/{deployment_id}/heartbeat"
+    
+    timestamp = f"{time.time():.6f}"
+    assert signed_post(heartbeat_path, credential["key_id"], credential["secret"], timestamp=timestamp).status_code == 200
+    replayed = signed_post(heartbeat_path, credential["key_id"], credential["secret"], timestamp=timestamp)
+    assert replayed.status_code == 401
+    assert replayed.json()["detail"] == "Replayed service request"
+    
+    # Unknown keys are kept out of the valid-key table
+    for i in range(3):
+        assert signed_post(heartbeat_path, f"svc_unknown{i}", "secret").status_code == 401
+    assert service_key_cache.get("svc_unknown0") is None
+    assert service_key_cache.get(credential["key_id"]) is not None
+
+def test_preempted_deployment_resumes_and_is_protected_from_thrashing():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Preemption Cluster", "total_ram_gb": 4.0, "total_cpu_cores": 2.0, "total_gpu_count": 1},
+        headers=headers
+    ).json()["id"]
+    
+    def submit(name, priority):
+        return client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": "test/preempt:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 4.0,
+                "required_cpu_cores": 2.0,
+                "required_gpu_count": 1,
+                "priority": priority
+            },
+            headers=headers
+        ).json()
+    
+    low = submit("Preemptible", 1)
+    assert low["status"] == "running"
+    
+    # Just started, so the minimum-runtime guard keeps it running
+    blocked = submit("Too Early", 3)
+    assert blocked["status"] == "queued"
+    
+    db = SessionLocal()
+    try:
+        service = DeploymentService(db)
+        service.update_deployment_status(blocked["id"], DeploymentStatus.FAILED)
+        db.query(Deployment).filter(Deployment.id == low["id"]).update(
+            {"started_at": datetime.now(timezone.utc) - timedelta(hours=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    
+    high = submit("Urgent", 3)
+    assert high["status"] == "running"
+    preempted = client.get(f"/deployments/{low['id']}", headers=headers).json()
+    assert preempted["status"] == "preempted"
+    assert preempted["preemption_count"] == 1
+    
+    stats = client.get("/clusters/preemption/stats", headers=headers).json()
+    assert stats["preemptions"] >= 1
+    assert stats["lost_gpu_seconds"] >= 3500
+    
+    # Capacity frees up: the preempted deployment is rescheduled instead of dropped
+    db = SessionLocal()
+    try:
+        DeploymentService(db).update_deployment_status(high["id"], DeploymentStatus.COMPLETED)
+    finally:
+        db.close()
+    
+    resumed = client.get(f"/deployments/{low['id']}", headers=headers).json()
+    assert resumed["status"] == "running"
+    assert client.get("/clusters/preemption/stats", headers=headers).json()["resumed"] >= 1
+    
+    viewer_headers = {"Authorization": f"Bearer {get_viewer_token()}"}
+    assert client.get("/clusters/preemption/stats", headers=viewer_headers).status_code == 403
+
+def test_priority_inheritance_through_dependency_chain():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Inheritance Cluster", "total_ram_gb": 4.0, "total_cpu_cores": 2.0},
+        headers=headers
+    ).json()["id"]
+    
+    def submit(name, priority, depends_on=None):
+        return client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": "test/pipeline:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 4.0,
+                "required_cpu_cores": 1.0,
+                "priority": priority,
+                "depends_on_deployment_id": depends_on
+            },
+            headers=headers
+        ).json()
+    
+    def queue_scores():
+        db = SessionLocal()
+        try:
+            members = DeploymentScheduler(db).redis_client.zrange(f"deployment_queue_{cluster_id}", 0, -1, withscores=True)
+        finally:
+            db.close()
+        return {json.loads(member)["deployment_id"]: score for member, score in members}
+    
+    assert submit("Blocker", 2)["status"] == "running"
+    grandparent = submit("Grandparent", 1)
+    medium = submit("Medium", 2)
+    parent = submit("Parent", 1, depends_on=grandparent["id"])
+    critical = submit("Critical", 4, depends_on=parent["id"])
+    
+    for ancestor in (grandparent, parent):
+        response = client.get(f"/deployments/{ancestor['id']}", headers=headers).json()
+        assert response["inherited_priority"] == 4
+    scores = queue_scores()
+    assert scores[grandparent["id"]] > scores[medium["id"]]
+    
+    # Cancelling the critical dependent hands the chain back its own priority
+    assert client.post(f"/deployments/{critical['id']}/cancel", headers=headers).status_code == 200
+    for ancestor in (grandparent, parent):
+        response = client.get(f"/deployments/{ancestor['id']}", headers=headers).json()
+        assert response["inherited_priority"] is None
+    scores = queue_scores()
+    assert scores[grandparent["id"]] < scores[medium["id"]]
+
+def test_explain_reports_blocking_resources_and_preemption():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Explain Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0, "total_gpu_count": 1},
+        headers=headers
+    ).json()["id"]
+    
+    def submit(name, priority):
+        return client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": "test/explain:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 6.0,
+                "required_cpu_cores": 1.0,
+                "required_gpu_count": 1,
+                "priority": priority
+            },
+            headers=headers
+        ).json()
+    
+    running = submit("Running", 1)
+    waiting = submit("Waiting", 3)
+    assert waiting["status"] == "queued"
+    
+    explained = client.get(f"/deployments/{running['id']}/explain", headers=headers).json()
+    assert explained["decisions"][0]["outcome"] == "scheduled"
+    
+    explained = client.get(f"/deployments/{waiting['id']}/explain", headers=headers).json()
+    assert explained["status"] == "queued"
+    latest = explained["decisions"][0]
+    assert latest["outcome"] == "queued"
+    assert latest["reason"] == "resources"
+    assert latest["shortfall"] == {"ram": 4.0, "gpu": 1.0}
+    # The only candidate was just started, so thrash protection left it out
+    assert latest["preemption"]["skipped"] is None
+    assert latest["preemption"]["candidates"] == 0
+    assert set(latest["phases_us"]) == {"lookup", "dependencies", "fit", "preemption", "queue"}
+    assert latest["total_us"] >= sum(latest["phases_us"].values()) - len(latest["phases_us"])
+    assert client.get(f"/deployments/{waiting['id']}/explain").status_code == 401
+
+def test_queue_position_and_eta_from_runtime_histograms():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "ETA Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers=headers
+    ).json()["id"]
+    
+    db = SessionLocal()
+    try:
+        runtimes = DeploymentScheduler(db).runtimes
+        for _ in range(5):
+            runtimes.record("test/eta-history:latest", 1200)
+    finally:
+        db.close()
+    
+    def submit(name, image, priority, expected_duration_seconds=None):
+        return client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": image,
+                "cluster_id": cluster_id,
+                "required_ram_gb": 4.0,
+                "required_cpu_cores": 1.0,
+                "priority": priority,
+                "expected_duration_seconds": expected_duration_seconds
+            },
+            headers=headers
+        ).json()
+    
+    submit("Declared", "test/eta:latest", 2, expected_duration_seconds=600)
+    submit("From History", "test/eta-history:latest", 2)
+    first = submit("First In Line", "test/eta:latest", 2)
+    second = submit("Second In Line", "test/eta:latest", 1)
+    
+    now = time.time()
+    position = client.get(f"/deployments/{first['id']}/queue-position", headers=headers).json()
+    assert position["position"] == 1
+    assert position["queue_length"] == 2
+    assert position["ahead_demand"]["ram"] == 0.0
+    start = datetime.fromisoformat(position["estimated_start"].replace("Z", "+00:00")).timestamp()
+    assert 550 <= start - now <= 650
+    
+    # Behind the first one, so it waits for the job with no declared duration too
+    position = client.get(f"/deployments/{second['id']}/queue-position", headers=headers).json()
+    assert position["position"] == 2
+    assert position["ahead_demand"]["ram"] == 4.0
+    assert position["ahead_complete"]
+    start = datetime.fromisoformat(position["estimated_start"].replace("Z", "+00:00")).timestamp()
+    assert 1100 <= start - now <= 1300
+    
+    running = client.get(f"/deployments/{first['id'] - 1}/queue-position", headers=headers).json()
+    assert running["position"] is None
+    assert running["estimated_start"] is None
+
+def test_admin_columnar_export_is_incremental():
+    client.post(
+        "/auth/register",
+        json={"username": "exportadmin", "email": "exportadmin@example.com", "password": "testpassword", "role": "admin"}
+    )
+    token = client.post("/auth/login", data={"username": "exportadmin", "password": "testpassword"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/organizations/", json={"name": "Export Org"}, headers=headers)
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Export Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers=headers
+    ).json()["id"]
+    
+    ids = [
+        client.post(
+            "/deployments/",
+            json={
+                "name": f"Export {index}",
+                "docker_image": "test/export:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 4.0,
+                "required_cpu_cores": 1.0
+            },
+            headers=headers
+        ).json()["id"]
+        for index in range(3)
+    ]
+    db = SessionLocal()
+    try:
+        DeploymentService(db).update_deployment_status(ids[0], DeploymentStatus.COMPLETED)
+    finally:
+        db.close()
+    
+    response = client.get("/deployments/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("id").to_pylist() == ids
+    assert table.column("status").to_pylist()[0] == "completed"
+    # The first completion started the third deployment; the other two are still running
+    assert table.column("run_seconds").to_pylist()[0] >= 0
+    assert table.column("run_seconds").to_pylist()[1:] == [None, None]
+    assert all(wait >= 0 for wait in table.column("wait_seconds").to_pylist())
+    
+    # A nightly job passes the highest id it already has
+    response = client.get(f"/deployments/export?format=arrow&after_id={ids[0]}", headers=headers)
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == ids[1:]
+    
+    # Completions of rows exported earlier come back through the completion watermark
+    first_completed = pq.read_table(io.BytesIO(client.get("/deployments/export", headers=headers).content))
+    completed_at = first_completed.column("completed_at").to_pylist()[0]
+    db = SessionLocal()
+    try:
+        DeploymentService(db).update_deployment_status(ids[1], DeploymentStatus.COMPLETED)
+        db.query(Deployment).filter(Deployment.id == ids[1]).update(
+            {"completed_at": completed_at + timedelta(minutes=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    response = client.get(
+        "/deployments/export",
+        params={"format": "arrow", "completed_after": completed_at.isoformat(), "after_id": ids[0]},
+        headers=headers
+    )
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == [ids[1]]
+    assert table.column("status").to_pylist() == ["completed"]
+    
+    client.post(
+        "/auth/register",
+        json={"username": "exportviewer", "email": "exportviewer@example.com", "password": "testpassword", "role": "developer"}
+    )
+    viewer_token = client.post(
+        "/auth/login", data={"username": "exportviewer", "password": "testpassword"}
+    ).json()["access_token"]
+    response = client.get("/deployments/export", headers={"Authorization": f"Bearer {viewer_token}"})
+    assert response.status_code == 403
+
+def test_queue_position_stable_across_drains():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Drain Cluster", "total_ram_gb": 4.0, "total_cpu_cores": 2.0},
+        headers=headers
+    ).json()["id"]
+    
+    def submit(name, priority):
+        return client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": "test/drain:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 4.0,
+                "required_cpu_cores": 1.0,
+                "priority": priority
+            },
+            headers=headers
+        ).json()
+    
+    submit("Running", 2)
+    waiting = [submit(f"Waiting {priority}", priority) for priority in (2, 2, 1)]
+    
+    def position():
+        return client.get(f"/deployments/{waiting[-1]['id']}/queue-position", headers=headers).json()
+    
+    before = position()
+    assert before["position"] == 3
+    assert before["queue_length"] == 3
+    assert before["ahead_demand"]["ram"] == 8.0
+    
+    # Every failed attempt re-scores the waiting deployments; each must keep exactly one queue member
+    for _ in range(2):
+        db = SessionLocal()
+        try:
+            scheduler = DeploymentScheduler(db)
+            assert scheduler.process_queue(cluster_id) == 3
+            assert scheduler.redis_client.zcard(f"deployment_queue_{cluster_id}") == 3
+        finally:
+            db.close()
+        after = position()
+        assert after["position"] == 3
+        assert after["queue_length"] == 3
+        assert after["ahead_demand"] == before["ahead_demand"]
+
+def test_simulated_deadline_preemption_matches_scheduler():
+    token, _ = get_auth_token_and_cluster()
+    headers = {"Authorization": f"Bearer {token}"}
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Deadline Simulation Cluster", "total_ram_gb": 4.0, "total_cpu_cores": 2.0, "total_gpu_count": 0},
+        headers=headers
+    ).json()["id"]
+    
+    job = {
+        "required_ram_gb": 4.0,
+        "required_cpu_cores": 2.0,
+        "expected_duration_seconds": 600,
+        "priority": 2,
+        "deadline": (datetime.now(timezone.utc) + timedelta(minutes=30)).isoformat()
+    }
+    low = client.post(
+        "/deployments/",
+        json={
+            "name": "Open Ended",
+            "docker_image": "test/open-ended:latest",
+            "cluster_id": cluster_id,
+            "required_ram_gb": 4.0,
+            "required_cpu_cores": 2.0,
+            "priority": 1
+        },
+        headers=headers
+    ).json()
+    assert low["status"] == "running"
+    db = SessionLocal()
+    try:
+        db.query(Deployment).filter(Deployment.id == low["id"]).update(
+            {"started_at": datetime.now(timezone.utc) - timedelta(hours=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+    
+    # The running deployment has no expected end, so waiting would miss the deadline
+    simulated = client.post(f"/clusters/{cluster_id}/simulate", json={"jobs": [job]}, headers=headers).json()
+    assert simulated["jobs"][0]["preemptions"] == 1
+    assert simulated["jobs"][0]["meets_deadline"] is True
+    assert [p["deployment_id"] for p in simulated["preemptions"]] == [low["id"]]
+    assert simulated["unmodelled"]
+    
+    # The real scheduler makes the same call
+    urgent = client.post(
+        "/deployments/",
+        json={"name": "Deadline", "docker_image": "test/deadline:latest", "cluster_id": cluster_id, **job},
+        headers=headers
+    ).json()
+    assert urgent["status"] == "running"
+    assert client.get(f"/deployments/{low['id']}", headers=headers).json()["status"] == "preempted"
@@ -0,0 +1,115 @@
+import pytest
+from fastapi.testclient import TestClient
+from ..app.main import app
+from ..app.core.database import SessionLocal
+from ..app.core.redis_client import get_redis_client
+from ..app.models.deployment import DeploymentStatus
+from ..app.services.deployment_service import DeploymentService
+
+client = TestClient(app)
+
+def get_auth_token():
+    # Register and login a user
+    client.post(
+        "/auth/register",
+        json={
+            "username": "orgtest",
+            "email": "org@example.com",
+            "password": "testpassword",
+            "role": "admin"
+        }
+    )
+    
+    login_response = client.post(
+        "/auth/login",
+        data={"username": "orgtest", "password": "testpassword"}
+    )
+    token = login_response.json()["access_token"]
+    
+    client.post(
+        "/organizations/",
+        json={"name": "Capacity Org"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    return token
+
+def test_organization_capacity():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    cluster_response = client.post(
+        "/clusters/",
+        json={
+            "name": "Capacity Cluster",
+            "total_ram_gb": 8.0,
+            "total_cpu_cores": 4.0,
+            "total_gpu_count": 0
+        },
+        headers=headers
+    )
+    cluster_id = cluster_response.json()["id"]
+    
+    deployments = [
+        client.post(
+            "/deployments/",
+            json={
+                "name": "Capacity Deployment",
+                "docker_image": "test/model:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 6.0,
+                "required_cpu_cores": 1.0
+            },
+            headers=headers
+        ).json()
+        for _ in range(2)
+    ]
+    # A leftover member for the queued deployment is not a second waiting deployment
+    get_redis_client().zadd(f"deployment_queue_{cluster_id}", {f'{{"deployment_id": {deployments[1]["id"]}, "stale": true}}': 1})
+    
+    response = client.get("/organizations/my/capacity", headers=headers)
+    assert response.status_code == 200
+    clusters = {c["cluster_id"]: c for c in response.json()["clusters"]}
+    assert clusters[cluster_id]["running_by_priority"] == {"MEDIUM": 1}
+    assert clusters[cluster_id]["queued_by_priority"] == {"MEDIUM": 1}
+    assert clusters[cluster_id]["queue_depth"] == 1
+    
+    # The cached snapshot is dropped once the completion commits
+    db = SessionLocal()
+    try:
+        DeploymentService(db).update_deployment_status(deployments[0]["id"], DeploymentStatus.COMPLETED)
+    finally:
+        db.close()
+    clusters = {c["cluster_id"]: c for c in client.get("/organizations/my/capacity", headers=headers).json()["clusters"]}
+    assert clusters[cluster_id]["running_by_priority"] == {"MEDIUM": 1}
+    assert clusters[cluster_id]["queued_by_priority"] == {}
+
+def test_regenerated_invite_code_invalidates_cached_one():
+    token = get_auth_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    org_id = client.get("/organizations/my", headers=headers).json()["id"]
+    old_code = client.get(f"/organizations/{org_id}/invite-code", headers=headers).json()["invite_code"]
+    
+    response = client.post(
+        "/auth/register",
+        json={
+            "username": "invited",
+            "email": "invited@example.com",
+            "password": "testpassword",
+            "invite_code": old_code
+        }
+    )
+    assert response.status_code == 200
+    
+    client.post(f"/organizations/{org_id}/regenerate-invite-code", headers=headers)
+    
+    response = client.post(
+        "/auth/register",
+        json={
+            "username": "invitedlate",
+            "email": "invitedlate@example.com",
+            "password": "testpassword",
+            "invite_code": old_code
+        }
+    )
+    assert response.status_code == 400
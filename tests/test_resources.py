@@ -0,0 +1,24 @@
+import numpy as np
+from ..app.services.resources import fits, fits_rows, covering_prefix
+
+def test_fits_rows_checks_every_resource_kind():
+    need = np.array([4.0, 2.0, 1.0])
+    available = np.array([
+        [8.0, 4.0, 1.0],
+        [8.0, 4.0, 0.0],
+        [2.0, 4.0, 2.0]
+    ])
+    assert fits_rows(need, available).tolist() == [True, False, False]
+    assert fits(need, available[0])
+
+def test_covering_prefix_finds_fewest_victims():
+    need = np.array([8.0, 4.0, 1.0])
+    available = np.array([2.0, 1.0, 0.0])
+    freed = np.array([
+        [2.0, 1.0, 0.0],
+        [4.0, 2.0, 1.0],
+        [8.0, 8.0, 2.0]
+    ])
+    assert covering_prefix(need, available, freed) == 2
+    assert covering_prefix(need, np.array([8.0, 4.0, 1.0]), freed) == 0
+    assert covering_prefix(np.array([64.0, 0.0, 0.0]), available, freed) == -1
@@ -0,0 +1,245 @@
+import pytest
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from fastapi.testclient import TestClient
+from ..app.main import app
+from ..app.core.config import settings
+from ..app.core.database import SessionLocal, get_engine
+from ..app.core.redis_client import get_redis_client
+from ..app.models.deployment import Deployment, DeploymentStatus
+from ..app.services.journal import SchedulerJournal
+from ..app.services.scheduler import DeploymentScheduler, queue_index_key
+from ..app.services.sharding import HashRing, LeaderLease, SchedulerWorker, WorkerRegistry
+
+client = TestClient(app)
+
+@pytest.fixture
+def clean_workers():
+    redis_client = get_redis_client()
+    redis_client.delete(WorkerRegistry.KEY, *redis_client.keys(f"{LeaderLease.KEY_PREFIX}*"))
+    yield
+    redis_client.delete(WorkerRegistry.KEY, *redis_client.keys(f"{LeaderLease.KEY_PREFIX}*"))
+
+def test_hash_ring_balances_and_moves_only_the_new_share():
+    clusters = range(2000)
+    ring = HashRing([f"worker-{i}" for i in range(4)])
+    owners = {cluster_id: ring.owner(cluster_id) for cluster_id in clusters}
+    for i in range(4):
+        share = list(owners.values()).count(f"worker-{i}") / len(owners)
+        assert 0.15 < share < 0.35
+    
+    grown = HashRing([f"worker-{i}" for i in range(5)])
+    moved = [cluster_id for cluster_id in clusters if grown.owner(cluster_id) != owners[cluster_id]]
+    # Only clusters claimed by the newcomer change hands
+    assert all(grown.owner(cluster_id) == "worker-4" for cluster_id in moved)
+    assert 0.1 < len(moved) / len(owners) < 0.3
+
+def test_leader_leases_rebalance_when_workers_join_and_leave(clean_workers):
+    clusters = set(range(100))
+    first = SchedulerWorker("first")
+    second = SchedulerWorker("second")
+    
+    first.registry.heartbeat(first.worker_id)
+    assert first.rebalance(clusters) == clusters
+    
+    # The newcomer cannot lead anything until the previous owner hands off
+    second.registry.heartbeat(second.worker_id)
+    assert second.rebalance(clusters) == set()
+    first.rebalance(clusters)
+    second.rebalance(clusters)
+    assert first.led and second.led
+    assert first.led.isdisjoint(second.led)
+    assert first.led | second.led == clusters
+    assert all(first.lease.holder(cluster_id) == "second" for cluster_id in second.led)
+    
+    first.shutdown()
+    assert second.rebalance(clusters) == clusters
+    second.shutdown()
+
+def test_sharded_mode_defers_scheduling_to_the_leader(clean_workers):
+    client.post(
+        "/auth/register",
+        json={"username": "shardtest", "email": "shard@example.com", "password": "testpassword", "role": "developer"}
+    )
+    token = client.post("/auth/login", data={"username": "shardtest", "password": "testpassword"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/organizations/", json={"name": "Shard Org"}, headers=headers)
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Shard Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers=headers
+    ).json()["id"]
+    
+    settings.SCHEDULER_MODE = "sharded"
+    try:
+        deployment = client.post(
+            "/deployments/",
+            json={
+                "name": "Sharded Deployment",
+                "docker_image": "test/shard:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 1.0,
+                "required_cpu_cores": 0.5
+            },
+            headers=headers
+        ).json()
+        assert deployment["status"] == "queued"
+        
+        worker = SchedulerWorker("solo")
+        assert worker.tick() >= 1
+        assert cluster_id in worker.led
+        worker.shutdown()
+    finally:
+        settings.SCHEDULER_MODE = "inline"
+    
+    response = client.get(f"/deployments/{deployment['id']}", headers=headers)
+    assert response.json()["status"] == "running"
+
+def test_worker_restores_lost_queues_from_snapshot_and_journal_tail(clean_workers):
+    client.post(
+        "/auth/register",
+        json={"username": "restoretest", "email": "restore@example.com", "password": "testpassword", "role": "developer"}
+    )
+    token = client.post("/auth/login", data={"username": "restoretest", "password": "testpassword"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/organizations/", json={"name": "Restore Org"}, headers=headers)
+    cluster_id = client.post(
+        "/clusters/",
+        json={"name": "Restore Cluster", "total_ram_gb": 8.0, "total_cpu_cores": 4.0},
+        headers=headers
+    ).json()["id"]
+    
+    def submit(name):
+        deployment = client.post(
+            "/deployments/",
+            json={
+                "name": name,
+                "docker_image": "test/restore:latest",
+                "cluster_id": cluster_id,
+                "required_ram_gb": 64.0,
+                "required_cpu_cores": 0.5
+            },
+            headers=headers
+        ).json()
+        assert deployment["status"] == "queued"
+        return deployment["id"]
+    
+    # One deployment is in the snapshot, the other only in the journal after it
+    in_snapshot = submit("Snapshotted")
+    db = SessionLocal()
+    try:
+        SchedulerJournal(db).take_snapshot()
+    finally:
+        db.close()
+    in_tail = submit("Journalled")
+    
+    redis_client = get_redis_client()
+    queue_key = f"deployment_queue_{cluster_id}"
+    redis_client.delete(queue_key, queue_index_key(cluster_id))
+    
+    worker = SchedulerWorker("restorer")
+    worker.tick()
+    assert cluster_id in worker.led
+    worker.shutdown()
+    
+    members = {json.loads(member)["deployment_id"] for member in redis_client.zrange(queue_key, 0, -1)}
+    assert members == {in_snapshot, in_tail}
+
+def _drain_as_worker(worker_id, ready, stop, results):
+    """Child process: join the ring, wait for the others, then tick until the parent sees the queues drained"""
+    worker = SchedulerWorker(worker_id)
+    worker.registry.heartbeat(worker_id)
+    ready.wait()
+    while not stop.is_set():
+        worker.tick()
+    worker.shutdown()
+    results.put((worker_id, worker.decisions))
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason="Four workers need four cores to run side by side")
+def test_decision_throughput_scales_with_worker_count(clean_workers):
+    if get_engine().dialect.name == "sqlite":
+        pytest.skip("SQLite serializes writers across processes")
+    
+    client.post(
+        "/auth/register",
+        json={"username": "scaletest", "email": "scale@example.com", "password": "testpassword", "role": "developer"}
+    )
+    token = client.post("/auth/login", data={"username": "scaletest", "password": "testpassword"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/organizations/", json={"name": "Scale Org"}, headers=headers)
+    user_id = client.get("/auth/me", headers=headers).json()["id"]
+    
+    clusters, per_cluster = 32, 10
+    context = multiprocessing.get_context("spawn")
+    rates = {}
+    for count in (1, 2, 4):
+        # Fresh clusters and queues per round, so every round drains the same amount of work
+        cluster_ids = [
+            client.post(
+                "/clusters/",
+                json={"name": f"Scale {count}-{index}", "total_ram_gb": 64.0, "total_cpu_cores": 64.0},
+                headers=headers
+            ).json()["id"]
+            for index in range(clusters)
+        ]
+        db = SessionLocal()
+        try:
+            deployments = [
+                Deployment(
+                    name=f"Scale {cluster_id}-{index}",
+                    docker_image="test/scale:latest",
+                    cluster_id=cluster_id,
+                    user_id=user_id,
+                    required_ram_gb=1.0,
+                    required_cpu_cores=1.0,
+                    status=DeploymentStatus.QUEUED
+                )
+                for cluster_id in cluster_ids for index in range(per_cluster)
+            ]
+            db.add_all(deployments)
+            db.commit()
+            scheduler = DeploymentScheduler(db)
+            for deployment in deployments:
+                scheduler.add_to_queue(deployment)
+        finally:
+            db.close()
+        
+        workers = [f"scale-{count}-{index}" for index in range(count)]
+        ready = context.Barrier(count + 1)
+        stop = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=_drain_as_worker, args=(worker_id, ready, stop, results)) for worker_id in workers
+        ]
+        for process in processes:
+            process.start()
+        
+        ready.wait()
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            while db.query(Deployment).filter(
+                Deployment.cluster_id.in_(cluster_ids), Deployment.status == DeploymentStatus.QUEUED
+            ).count():
+                db.rollback()
+                time.sleep(0.02)
+            elapsed = time.monotonic() - started
+        finally:
+            db.close()
+        stop.set()
+        decisions = dict(results.get(timeout=30) for _ in processes)
+        for process in processes:
+            process.join(timeout=30)
+        
+        assert set(decisions) == set(workers)
+        rates[count] = clusters * per_cluster / elapsed
+        
+        # The round lasts as long as the busiest worker, so linear scaling is relative to the ring's split
+        ring = HashRing(workers)
+        busiest = max(Counter(ring.owner(cluster_id) for cluster_id in cluster_ids).values())
+        assert rates[count] >= 0.7 * (clusters / busiest) * rates[1], rates
+    
+    assert rates[1] < rates[2] < rates[4]